@@ -1,5 +1,7 @@
 import streamlit as st
 
+from utils.profiling import PROFILE_SESSION_KEY, profile_run
+
 st.set_page_config(page_title="OxidiLily Tools",page_icon="✨", layout="wide")
 
 
@@ -13,12 +15,14 @@ st.markdown("""
 pages = {
     "Home": [
         st.Page("pages/welcome.py", title="Welcome"),
+        st.Page("pages/metrics.py", title="Metrics"),
     ],
     "Tools": [
         st.Page("pages/tiktok_downloader.py", title="TikTok Downloader"),
         st.Page("pages/spotify_downloader.py", title="Spotify Downloader"),
         st.Page("pages/promt_generator.py", title="Prompt Generator Video"),
         st.Page("pages/data.py", title="Data Generator Content"),
+        st.Page("pages/pipeline.py", title="Batch Pipeline"),
     ],
     "Music":[
         st.Page("pages/music.py", title="Music Player"),
@@ -26,4 +30,7 @@ pages = {
 }
 
 pg = st.navigation(pages, position="top",expanded=True)
-pg.run()
+
+# Durasi setiap rerun per halaman (+ sampling profiler kalau dinyalakan di halaman Metrics)
+with profile_run(pg.title, sample=st.session_state.get(PROFILE_SESSION_KEY, False)):
+    pg.run()
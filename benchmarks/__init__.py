@@ -0,0 +1 @@
+"""Benchmark dan load-test untuk OxidiLily Tools."""
@@ -0,0 +1,103 @@
+"""Benchmark analisis audio (durasi, bitrate, loudness EBU R128) dan normalisasi.
+
+Membuat library MP3 sungguhan dengan FFmpeg (noise + nada, volume berbeda
+per lagu) di folder sementara, lalu mengukur:
+- analisis berurutan di satu proses (`analyze_file` satu per satu)
+- analisis lewat worker pool (`AnalysisCache.submit`, ANALYSIS_WORKERS)
+- `get_analysis` untuk seluruh library dari cache (yang dilakukan halaman)
+- loudness varian streaming hasil `transcode` setelah dinormalisasi
+
+Contoh:
+    python -m benchmarks.audio_analysis
+    python -m benchmarks.audio_analysis --tracks 24 --seconds 180 --workers 4
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+VOLUMES_DB = [-24, -18, -12, -6, -3, 0]
+
+
+def make_track(path, seconds, volume_db, frequency):
+    subprocess.run([
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:duration={seconds}:amplitude=0.3",
+        "-filter_complex", f"amix=inputs=2,volume={volume_db}dB",
+        "-ac", "2", "-c:a", "libmp3lame", "-b:a", "192k", path,
+    ], check=True)
+
+
+def wait(cache, tracks):
+    while True:
+        done, total, pending = cache.progress(tracks)
+        if done == total and not pending:
+            return
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background audio analysis benchmark")
+    parser.add_argument("--tracks", type=int, default=12)
+    parser.add_argument("--seconds", type=int, default=120, help="Length of each generated track")
+    parser.add_argument("--workers", type=int, default=0, help="Worker pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.workers:
+        os.environ["ANALYSIS_WORKERS"] = str(args.workers)
+    from utils import audio_analysis
+    from utils.transcode import DEFAULT_PROFILE, DOWNLOADS_DIR, transcode
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="audio_analysis_") as root:
+        # DOWNLOADS_DIR relatif, seperti saat app berjalan
+        os.chdir(root)
+        try:
+            os.makedirs(DOWNLOADS_DIR)
+            tracks = []
+            for i in range(args.tracks):
+                path = os.path.join(DOWNLOADS_DIR, f"Artist - Track {i + 1:02d}.mp3")
+                make_track(path, args.seconds, VOLUMES_DB[i % len(VOLUMES_DB)], 220 + 40 * i)
+                tracks.append(path)
+
+            started = time.perf_counter()
+            sequential = [audio_analysis.analyze_file(path) for path in tracks]
+            sequential_s = time.perf_counter() - started
+
+            cache = audio_analysis.get_cache(DOWNLOADS_DIR)
+            started = time.perf_counter()
+            cache.submit(tracks)
+            wait(cache, tracks)
+            pool_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            cached = [audio_analysis.get_analysis(path, DOWNLOADS_DIR) for path in tracks]
+            cached_s = time.perf_counter() - started
+            same = all(a["loudness"] == b["loudness"] for a, b in zip(sequential, cached))
+
+            errors = []
+            for path in tracks:
+                variant = transcode(path, DEFAULT_PROFILE)
+                measured = audio_analysis.measure_loudness(variant)["loudness"]
+                errors.append(abs(measured - audio_analysis.LOUDNESS_TARGET_LUFS))
+            loudness = [entry["loudness"] for entry in cached]
+        finally:
+            os.chdir(cwd)
+
+    audio_minutes = args.tracks * args.seconds / 60
+    print(f"library: {args.tracks} tracks x {args.seconds}s ({audio_minutes:.0f} min audio), "
+          f"{audio_analysis.ANALYSIS_WORKERS} workers on {os.cpu_count()} CPUs")
+    print(f"{'mode':24} {'sec':>8} {'tracks/s':>9}")
+    print(f"{'sequential':24} {sequential_s:8.2f} {args.tracks / sequential_s:9.1f}")
+    print(f"{'worker pool':24} {pool_s:8.2f} {args.tracks / pool_s:9.1f}")
+    print(f"{'cache read (page rerun)':24} {cached_s:8.4f} {args.tracks / cached_s:9.0f}")
+    print(f"pool results match sequential: {'yes' if same else 'NO'}")
+    print(f"source loudness {min(loudness):.1f} .. {max(loudness):.1f} LUFS -> normalized variants "
+          f"within {statistics.mean(errors):.2f} dB (max {max(errors):.2f}) of {audio_analysis.LOUDNESS_TARGET_LUFS} LUFS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Benchmark change feed n8n.csv vs parse ulang seluruh CSV.
+
+n8n yang polling CSV harus membaca dan mem-parse semua baris setiap kali
+untuk menemukan baris `pending` baru. Dengan change feed cukup membaca entry
+sejak offset terakhir. Benchmark membuat CSV besar, lalu setiap putaran
+menambah beberapa baris (seperti halaman Data Generator) dan mengukur waktu
+satu poll untuk kedua cara.
+
+Webhook dicek terhadap fake n8n lokal (benchmarks.fakes): semua entry harus
+sampai, berurutan, dan offset-nya sama dengan yang dibaca lewat HTTP `--serve`
+(dengan token). Terakhir feed dipadatkan: pembaca generasi lama harus diberi
+`resync` dan isi generasi baru harus sama dengan isi CSV.
+
+Contoh:
+    python -m benchmarks.change_feed
+    python -m benchmarks.change_feed --rows 20000 --rounds 10 --batch 5
+"""
+import argparse
+import csv
+import importlib
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.fakes import FakeConfig, FakeServices
+
+FIELDS = ["row_number", "index", "story", "model", "aspect_ratio", "resolution", "duration", "number_of_scene",
+          "status"] + [f"{name}_{i}" for i in range(1, 6) for name in ("scene", "scene_detail")]
+
+
+def make_row(n):
+    row = {"row_number": n, "index": n - 1, "story": f"Story {n} " + "lorem ipsum " * 20, "model": "lite",
+           "aspect_ratio": "9:16", "resolution": "720p", "duration": 5, "number_of_scene": 5,
+           "status": "done" if n % 10 else "pending"}
+    for i in range(1, 6):
+        row[f"scene_{i}"] = f"Scene {i}"
+        row[f"scene_detail_{i}"] = "camera slowly pans across the scene " * 5
+    return row
+
+
+def append_rows(change_feed, csv_file, rows):
+    """Tambah baris ke CSV seperti halaman Data Generator (tulis ulang file + catat ke feed)"""
+    _, existing = read_csv(csv_file)
+    with open(csv_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(existing + rows)
+    change_feed.record_changes(csv_file, "append", rows)
+
+
+def read_csv(csv_file):
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def poll_full(csv_file):
+    import pandas as pd
+
+    df = pd.read_csv(csv_file)
+    return df[df["status"] == "pending"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change feed vs full CSV polling")
+    parser.add_argument("--rows", type=int, default=5000, help="Rows already in the CSV")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=5, help="Rows appended per round")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="change_feed_")
+    with FakeServices(FakeConfig(latency=0.01)) as fakes:
+        saved = dict(os.environ)
+        os.environ.update(fakes.env())
+        os.environ["CHANGE_FEED_DIR"] = os.path.join(workdir, "feeds")
+        os.environ["SHARED_STATE_URL"] = "sqlite:///" + os.path.join(workdir, "shared_state.db")
+        try:
+            import utils.change_feed
+            import utils.shared_state
+            importlib.reload(utils.shared_state)
+            change_feed = importlib.reload(utils.change_feed)
+
+            csv_file = os.path.join(workdir, "n8n.csv")
+            with open(csv_file, "w", newline="", encoding="utf-8") as f:
+                csv.DictWriter(f, fieldnames=FIELDS).writeheader()
+            append_rows(change_feed, csv_file, [make_row(n) for n in range(1, args.rows + 1)])
+            # Pembaca sudah sinkron dengan isi awal
+            _, offset, generation = change_feed.read_changes(csv_file, 0, limit=None)
+
+            full_times, feed_times = [], []
+            next_row = args.rows + 1
+            for _ in range(args.rounds):
+                append_rows(change_feed, csv_file, [make_row(n) for n in range(next_row, next_row + args.batch)])
+                next_row += args.batch
+
+                started = time.perf_counter()
+                poll_full(csv_file)
+                full_times.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                entries, offset, generation = change_feed.read_changes(csv_file, offset, generation=generation)
+                feed_times.append(time.perf_counter() - started)
+                assert [int(e["row_number"]) for e in entries] == list(range(next_row - args.batch, next_row))
+
+            # Tunggu semua push webhook selesai
+            change_feed._executor.submit(lambda: None).result(timeout=30)
+            webhooks = list(fakes.webhooks)
+
+            server = change_feed.serve("127.0.0.1", 0, csv_file, change_feed.FEED_DIR, token="bench-token")
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_address[1]}/changes"
+            params = {"since": 0, "limit": 1000000, "csv": "n8n.csv"}
+            unauthorized = requests.get(url, params=params, timeout=30).status_code
+            served = requests.get(url, params=params, headers={"Authorization": "Bearer bench-token"},
+                                  timeout=30).json()
+            server.shutdown()
+
+            # Padatkan: baris yang diupdate tinggal satu entry, pembaca lama diminta resync
+            rows = [make_row(n) for n in range(1, 11)]
+            for row in rows:
+                row["status"] = "done"
+            change_feed.record_changes(csv_file, "update", rows)
+            path = change_feed.feed_path(csv_file)
+            size_before = os.path.getsize(path)
+            with change_feed.shared_lock(change_feed.file_lock_name(path)):
+                _, size_after = change_feed.compact(path)
+            resynced, _, new_generation = change_feed.read_changes(csv_file, offset, limit=None, generation=generation)
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+
+        pushed = [entry for payload in webhooks for entry in payload["changes"]]
+        print(f"CSV rows: {next_row - 1}, appended {args.batch} per round, {args.rounds} rounds")
+        print(f"{'poll':14} {'p50 ms':>9} {'max ms':>9}")
+        for name, times in [("full CSV", full_times), ("change feed", feed_times)]:
+            print(f"{name:14} {statistics.median(times) * 1000:9.2f} {max(times) * 1000:9.2f}")
+        offsets = [entry["offset"] for entry in served["changes"]]
+        print(f"webhook: {len(webhooks)} pushes, {len(pushed)} entries, "
+              f"in order: {[e['offset'] for e in pushed] == offsets}, "
+              f"last next_offset matches HTTP: {webhooks[-1]['next_offset'] == served['next_offset']}")
+    print(f"auth: without token {unauthorized}, with token {len(served['changes'])} entries")
+    print(f"compaction: {size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB, generation {generation} -> "
+          f"{new_generation}, resync returns {len(resynced)} entries for {next_row - 1} rows "
+          f"({'ok' if len(resynced) == next_row - 1 else 'MISMATCH'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Benchmark cold start: waktu container siap dan first render per halaman.
+
+First render diukur di proses Python baru untuk setiap halaman, jadi semua
+import (streamlit, pandas, openai, ...) ikut terhitung seperti saat container
+baru dijalankan.
+
+Contoh:
+    python -m benchmarks.cold_start                 # first render per halaman
+    python -m benchmarks.cold_start --docker        # + docker compose up sampai /_stcore/health OK
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dijalankan di subprocess baru untuk tiap halaman
+RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.run()
+first = time.perf_counter()
+at.run()
+second = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "first_render_s": first - imported,
+    "second_render_s": second - first,
+    "exception": [str(e.value) for e in at.exception],
+}))
+"""
+
+
+def measure_page(page_path):
+    """First dan second render satu halaman di proses baru"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", RENDER_SCRIPT, page_path],
+        cwd=ROOT_DIR,
+        env={**os.environ, "PYTHONPATH": ROOT_DIR, "SPOTDL_WORKER": "0"},
+        capture_output=True,
+        text=True,
+    )
+    total = time.perf_counter() - start
+    if result.returncode != 0:
+        return {"page": page_path, "error": result.stderr.strip()[-500:], "process_s": total}
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data.update({"page": page_path, "process_s": total})
+    return data
+
+
+def wait_for_health(url, timeout):
+    """Tunggu sampai endpoint health Streamlit membalas 'ok'"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def measure_docker(health_url, timeout, keep_running):
+    """Waktu dari `docker compose up -d` sampai health check OK"""
+    subprocess.run(["docker", "compose", "down"], cwd=ROOT_DIR, capture_output=True)
+    start = time.perf_counter()
+    subprocess.run(["docker", "compose", "up", "-d"], cwd=ROOT_DIR, check=True, capture_output=True)
+    up = time.perf_counter()
+    healthy = wait_for_health(health_url, timeout)
+    ready = time.perf_counter()
+    if not keep_running:
+        subprocess.run(["docker", "compose", "down"], cwd=ROOT_DIR, capture_output=True)
+    return {
+        "compose_up_s": up - start,
+        "ready_s": ready - start if healthy else None,
+        "healthy": healthy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start and first render benchmark")
+    parser.add_argument("pages", nargs="*", help="Pages to measure (default: pages/*.py)")
+    parser.add_argument("--docker", action="store_true", help="Also measure docker compose up until healthy")
+    parser.add_argument("--health-url", default="http://localhost:8501/_stcore/health")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--keep-running", action="store_true", help="Don't stop the container afterwards")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    if args.docker:
+        results["docker"] = measure_docker(args.health_url, args.timeout, args.keep_running)
+        print(f"docker: {results['docker']}")
+
+    pages = args.pages or sorted(glob.glob(os.path.join("pages", "*.py"), root_dir=ROOT_DIR))
+    results["pages"] = []
+    print(f"{'page':40} {'import':>8} {'first':>8} {'second':>8} {'process':>8}")
+    for page in pages:
+        data = measure_page(page)
+        results["pages"].append(data)
+        if "error" in data:
+            print(f"{page:40} ERROR {data['error'].splitlines()[-1] if data['error'] else ''}")
+        else:
+            print(f"{page:40} {data['import_s']:8.2f} {data['first_render_s']:8.2f} "
+                  f"{data['second_render_s']:8.2f} {data['process_s']:8.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""Fake lokal untuk semua layanan eksternal yang dipakai app.
+
+Satu HTTP server melayani:
+    POST /tikwm/api/                    tikwm.com JSON API
+    GET  /tiklydown/api/download        tiklydown JSON API
+    POST /deepseek/chat/completions     OpenAI-compatible DeepSeek endpoint
+    POST /fal/<app>                     fal queue submit
+    GET  /fal/requests/<id>/status      fal queue status
+    GET  /fal/requests/<id>             fal queue result
+    GET  /media/<name>                  file media (mendukung HEAD dan Range)
+    POST /n8n/webhook                   webhook n8n (payload disimpan di `webhooks`)
+
+Latency dan failure rate bisa diatur. Executable `spotdl` palsu ada di
+benchmarks/bin, dan `ffmpeg` palsu (hanya menyalin input) di benchmarks/fake_ffmpeg.
+
+Contoh (server saja, untuk dicoba manual):
+    python -m benchmarks.fakes --port 8765 --latency 0.2 --failure-rate 0.1
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKE_BIN_DIR = os.path.join(BENCHMARKS_DIR, "bin")
+FAKE_FFMPEG_DIR = os.path.join(BENCHMARKS_DIR, "fake_ffmpeg")
+
+CONTENT_TYPES = {
+    ".mp4": "video/mp4",
+    ".mp3": "audio/mpeg",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+}
+
+
+class FakeConfig:
+    """Pengaturan perilaku fake server"""
+
+    def __init__(self, latency=0.05, jitter=0.0, failure_rate=0.0, fal_polls=1, media_size=256 * 1024,
+                 media_sizes=None, media_bandwidth=0, media_ranges=True, rate_limit=0, rate_window=60):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.fal_polls = fal_polls
+        self.media_size = media_size
+        # Ukuran per nama file (mis. {"tiktok_hd.mp4": 8 * 1024 ** 2}), default media_size
+        self.media_sizes = media_sizes or {}
+        # Bytes/detik per koneksi (0 = tanpa batas), untuk mensimulasikan CDN per-connection throttling
+        self.media_bandwidth = media_bandwidth
+        # False = server mengabaikan Range (menguji fallback single-stream)
+        self.media_ranges = media_ranges
+        # Maks request per `rate_window` detik per route sebelum dibalas 429 + Retry-After (0 = tanpa batas)
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def services(self):
+        return self.server.services
+
+    # --- Helpers -----------------------------------------------------------
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, data, status=200, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate(self, route):
+        """Tambahkan latency dan (kadang) gagal. Returns True kalau request harus gagal."""
+        config = self.services.config
+        self.services.record(route)
+        delay = config.latency + random.uniform(0, config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        retry_after = self.services.over_rate_limit(route)
+        if retry_after:
+            self.services.record(route + ":429")
+            self.send_json({"error": "rate limited"}, status=429, headers={"Retry-After": f"{retry_after:.2f}"})
+            return True
+        if route != "media" and random.random() < config.failure_rate:
+            self.services.record(route + ":failed")
+            if random.random() < 0.5:
+                self.send_json({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+            else:
+                self.send_json({"error": "internal error"}, status=500)
+            return True
+        return False
+
+    # --- Routing -----------------------------------------------------------
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith("/media/"):
+            return self.handle_media(path, head=False)
+        if path == "/tiklydown/api/download":
+            return self.handle_tiklydown()
+        match = re.fullmatch(r"/fal/requests/([^/]+)(/status)?", path)
+        if match:
+            return self.handle_fal_get(match.group(1), status=bool(match.group(2)))
+        self.send_json({"error": "not found"}, status=404)
+
+    def do_HEAD(self):
+        path = urlparse(self.path).path
+        if path.startswith("/media/"):
+            return self.handle_media(path, head=True)
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.read_body()
+        if path == "/tikwm/api/":
+            return self.handle_tikwm()
+        if path == "/deepseek/chat/completions":
+            return self.handle_deepseek(json.loads(body or b"{}"))
+        if path.startswith("/fal/"):
+            return self.handle_fal_submit(path[len("/fal/"):], json.loads(body or b"{}"))
+        if path == "/n8n/webhook":
+            return self.handle_webhook(json.loads(body or b"{}"))
+        self.send_json({"error": "not found"}, status=404)
+
+    def do_PUT(self):
+        self.read_body()
+        self.send_json({})
+
+    # --- n8n ---------------------------------------------------------------
+
+    def handle_webhook(self, payload):
+        if self.simulate("webhook"):
+            return
+        with self.services.lock:
+            self.services.webhooks.append(payload)
+        self.send_json({"received": len(payload.get("changes", []))})
+
+    # --- TikTok ------------------------------------------------------------
+
+    def handle_tikwm(self):
+        if self.simulate("tikwm"):
+            return
+        base = self.services.url
+        self.send_json({
+            "code": 0,
+            "data": {
+                "play": f"{base}/media/tiktok_sd.mp4",
+                "hdplay": f"{base}/media/tiktok_hd.mp4",
+                "cover": f"{base}/media/cover.jpg",
+                "title": "Fake TikTok video",
+                "author": {"unique_id": "fake_user"},
+                "duration": 15,
+            },
+        })
+
+    def handle_tiklydown(self):
+        if self.simulate("tiklydown"):
+            return
+        base = self.services.url
+        self.send_json({
+            "status": "success",
+            "video": {"noWatermark": f"{base}/media/tiktok_sd.mp4"},
+            "cover": f"{base}/media/cover.jpg",
+            "title": "Fake TikTok video",
+            "author": {"username": "fake_user"},
+            "duration": 15,
+        })
+
+    # --- DeepSeek ----------------------------------------------------------
+
+    def handle_deepseek(self, request):
+        if self.simulate("deepseek"):
+            return
+        messages = request.get("messages", [])
+        text = "\n".join(str(m.get("content", "")) for m in messages)
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(self.fake_json(text))
+        else:
+            content = ("VISUAL_PROMPT: A calm lake at sunrise, soft golden light, mist over the water.\n"
+                       "AUDIO_SCRIPT: As the sun rises over the quiet lake, mist drifts across the water "
+                       "and the world slowly wakes up.")
+        tokens = text.split()
+        prompt_tokens = len(tokens)
+        cache_hit = self.services.prompt_cache_hit(tokens)
+        self.send_json({
+            "id": f"chatcmpl-{next(self.services.ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "deepseek-chat"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content.split()),
+                "total_tokens": prompt_tokens + len(content.split()),
+                "prompt_cache_hit_tokens": cache_hit,
+                "prompt_cache_miss_tokens": prompt_tokens - cache_hit,
+            },
+        })
+
+    def fake_json(self, text):
+        def scenes(n):
+            return [{"title": f"Scene {i + 1}", "prompt": f"Realistic shot {i + 1} of a river valley, slow pan"}
+                    for i in range(n)]
+
+        rows = re.search(r"Generate (\d+) rows", text)
+        if rows:
+            # Story berbeda tiap panggilan supaya tidak ditolak sebagai near-duplicate
+            rng = random.Random(next(self.services.ids))
+            words = ("fisherman net dawn river heron mist boat reeds village market bicycle rain "
+                     "lantern harbor gulls cliff meadow horses wind kite grandmother bread oven snow").split()
+            return {"data": [{
+                "story": " ".join(rng.choice(words) for _ in range(16)).capitalize() + ".",
+                "aspect_ratio": "9:16",
+                "resolution": "480p",
+                "duration": 5,
+                "number_of_scene": 3,
+                "status": "pending",
+                "scenes": scenes(3),
+            } for i in range(int(rows.group(1)))]}
+        count = re.search(r"Generate (\d+) scenes", text)
+        return {"scenes": scenes(int(count.group(1)) if count else 3)}
+
+    # --- fal queue ---------------------------------------------------------
+
+    def handle_fal_submit(self, application, arguments):
+        if self.simulate("fal:submit"):
+            return
+        request_id = f"req-{next(self.services.ids)}"
+        with self.services.lock:
+            self.services.fal_requests[request_id] = {
+                "application": application,
+                "arguments": arguments,
+                "polls": 0,
+            }
+        base = f"{self.services.url}/fal/requests/{request_id}"
+        self.send_json({
+            "request_id": request_id,
+            "status_url": base + "/status",
+            "response_url": base,
+            "cancel_url": base + "/cancel",
+        })
+
+    def handle_fal_get(self, request_id, status):
+        if self.simulate("fal:status" if status else "fal:result"):
+            return
+        with self.services.lock:
+            request = self.services.fal_requests.get(request_id)
+            if request is None:
+                return self.send_json({"detail": "Request not found"}, status=404)
+            if status:
+                request["polls"] += 1
+                completed = request["polls"] > self.services.config.fal_polls
+        if status:
+            if completed:
+                return self.send_json({"status": "COMPLETED", "logs": [], "metrics": {}})
+            return self.send_json({"status": "IN_PROGRESS", "logs": [{"message": "working..."}]})
+        self.send_json(self.fal_result(request["application"]))
+
+    def fal_result(self, application):
+        base = self.services.url
+        if "imagen" in application:
+            return {"images": [{"url": f"{base}/media/thumbnail.png"}]}
+        if "seedance" in application:
+            return {"video": {"url": f"{base}/media/video.mp4"}}
+        if "chatterbox" in application:
+            return {"audio": {"url": f"{base}/media/audio.mp3"}}
+        return {}
+
+    # --- Media -------------------------------------------------------------
+
+    def handle_media(self, path, head):
+        self.simulate("media")
+        name = os.path.basename(path)
+        data = self.services.media_bytes(name)
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+
+        config = self.services.config
+        start, end = 0, len(data) - 1
+        status = 200
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match and config.media_ranges:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else end, len(data) - 1)
+            status = 206
+            self.services.record("media:range")
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if config.media_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        if head:
+            return
+        if not config.media_bandwidth:
+            self.wfile.write(data[start:end + 1])
+            return
+        chunk_size = 64 * 1024
+        for offset in range(start, end + 1, chunk_size):
+            chunk = data[offset:min(offset + chunk_size, end + 1)]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / config.media_bandwidth)
+
+
+class FakeServices:
+    """Menjalankan fake server di thread latar belakang.
+
+    Dipakai sebagai context manager:
+        with FakeServices(FakeConfig(latency=0.1)) as fakes:
+            os.environ.update(fakes.env())
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or FakeConfig()
+        self.server = ThreadingHTTPServer((host, port), FakeHandler)
+        self.server.daemon_threads = True
+        self.server.services = self
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.fal_requests = {}
+        self.counts = Counter()
+        self._media = {}
+        self._prompts = []
+        self._request_times = {}
+        self.webhooks = []
+        self._thread = None
+
+    def record(self, route):
+        with self.lock:
+            self.counts[route] += 1
+
+    def over_rate_limit(self, route):
+        """Sliding window per route. Returns detik Retry-After kalau limit terlampaui."""
+        limit, window = self.config.rate_limit, self.config.rate_window
+        if not limit or route == "media":
+            return None
+        now = time.monotonic()
+        with self.lock:
+            times = self._request_times.setdefault(route, deque())
+            while times and now - times[0] >= window:
+                times.popleft()
+            if len(times) >= limit:
+                return window - (now - times[0])
+            times.append(now)
+        return None
+
+    def prompt_cache_hit(self, tokens, unit=64):
+        """Tiru context cache DeepSeek: prefix terpanjang yang sudah pernah dikirim, per blok `unit` token"""
+        with self.lock:
+            best = 0
+            for seen in self._prompts:
+                common = 0
+                for a, b in zip(seen, tokens):
+                    if a != b:
+                        break
+                    common += 1
+                best = max(best, common)
+            self._prompts.append(tokens)
+        return best // unit * unit
+
+    def media_bytes(self, name):
+        """Bytes deterministik per nama file (ukuran sesuai config)"""
+        with self.lock:
+            if name not in self._media:
+                rng = random.Random(name)
+                self._media[name] = rng.randbytes(self.config.media_sizes.get(name, self.config.media_size))
+            return self._media[name]
+
+    def env(self):
+        """Environment variables yang mengarahkan app ke fake ini"""
+        return {
+            "TIKWM_API_URL": f"{self.url}/tikwm/api/",
+            "TIKLYDOWN_API_URL": f"{self.url}/tiklydown/api/download",
+            "DEEPSEEK_BASE_URL": f"{self.url}/deepseek",
+            "DEEPSEEK_API_KEY": "fake-deepseek-key",
+            "FAL_QUEUE_URL": f"{self.url}/fal/",
+            "FAL_KEY": "fake-fal-key",
+            "CHANGE_FEED_WEBHOOK": f"{self.url}/n8n/webhook",
+            "NO_PROXY": "127.0.0.1,localhost",
+            # spotdl palsu ada di PATH (benchmarks/bin), bukan sebagai modul untuk worker
+            "SPOTDL_WORKER": "0",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def fake_path(path=None):
+    """PATH dengan spotdl palsu di depan, dan ffmpeg palsu kalau ffmpeg asli tidak ada"""
+    path = path if path is not None else os.environ.get("PATH", "")
+    parts = [FAKE_BIN_DIR, path]
+    if not shutil.which("ffmpeg", path=path):
+        parts.append(FAKE_FFMPEG_DIR)
+    return os.pathsep.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake external services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeConfig(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate)
+    with FakeServices(config, host=args.host, port=args.port) as fakes:
+        print(f"Fake services running at {fakes.url}")
+        for name, value in fakes.env().items():
+            print(f"export {name}={value}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
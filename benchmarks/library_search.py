@@ -0,0 +1,124 @@
+"""Benchmark pencarian library (index trigram atas tag ID3 + nama file).
+
+Membuat library palsu berisi file MP3 kecil dengan tag ID3v2.3 (title,
+artist, album) lalu mengukur:
+- build index pertama (baca tag semua file) dan load dari index.json
+- sync per rerun tanpa perubahan dan sync setelah beberapa download baru
+- latency query (2 kata judul + nama artist, satu kata salah ketik), serta
+  hit@1 / hit@5 untuk lagu yang dicari
+- pembanding: filter substring nama file (yang bisa dilakukan selectbox lama)
+
+Contoh:
+    python -m benchmarks.library_search
+    python -m benchmarks.library_search --tracks 20000 --queries 500
+"""
+import argparse
+import os
+import random
+import statistics
+import struct
+import tempfile
+import time
+
+SYLLABLES = "ka lo mi ra ne to su vi da re no sa li mo ta ve ri na ko zu be la sho chi gra mar tin el".split()
+
+
+def fake_word(rng):
+    """Kata acak 2-3 suku kata: kosakata besar seperti judul lagu sungguhan"""
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def id3_frame(frame_id, text):
+    data = b"\x00" + text.encode("latin-1", errors="replace")
+    return frame_id.encode() + struct.pack(">I", len(data)) + b"\x00\x00" + data
+
+
+def write_mp3(path, title, artist, album):
+    frames = id3_frame("TIT2", title) + id3_frame("TPE1", artist) + id3_frame("TALB", album)
+    size = len(frames)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    with open(path, "wb") as f:
+        f.write(b"ID3\x03\x00\x00" + syncsafe + frames + b"\xff\xfb\x90\x00" * 64)
+
+
+def make_library(root, count, rng, start=0):
+    tracks = []
+    for i in range(start, start + count):
+        artist = f"{fake_word(rng).title()} {fake_word(rng).title()}"
+        album = " ".join(fake_word(rng) for _ in range(2)).title()
+        title = " ".join(fake_word(rng) for _ in range(rng.randint(2, 4))).title()
+        folder = os.path.join(root, artist)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{artist} - {title}.mp3")
+        write_mp3(path, title, artist, album)
+        tracks.append((path, title, artist, album))
+    return tracks
+
+
+def typo(word, rng):
+    """Satu salah ketik: tukar dua huruf bersebelahan atau hapus satu huruf"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + word[i + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Library tag search benchmark")
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--new", type=int, default=20, help="New downloads before the incremental sync")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    from utils.library_search import LibraryIndex
+    from utils.playlist import list_tracks
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory(prefix="library_") as root:
+        tracks = make_library(root, args.tracks, rng)
+
+        def timed(fn):
+            started = time.perf_counter()
+            result = fn()
+            return result, time.perf_counter() - started
+
+        index, build = timed(lambda: LibraryIndex.load(root))
+        _, load = timed(lambda: LibraryIndex.load(root))
+        # Seperti halaman Music Player: daftar file dari list_tracks diberikan ke sync
+        listed = list_tracks(root)
+        index.sync(listed)
+        _, sync_same = timed(lambda: index.sync(listed))
+        tracks += make_library(root, args.new, rng, start=args.tracks)
+        listed = list_tracks(root)
+        _, sync_new = timed(lambda: index.sync(listed))
+
+        latencies, hit1, hit5, substring_hits = [], 0, 0, 0
+        file_names = [os.path.relpath(t[0], root).lower() for t in tracks]
+        for _ in range(args.queries):
+            path, title, artist, album = rng.choice(tracks)
+            words = title.lower().split()[:2] + [artist.split()[0].lower()]
+            # Satu kata salah ketik
+            wrong = rng.randrange(len(words))
+            query = " ".join(typo(word, rng) if i == wrong else word for i, word in enumerate(words))
+            results, seconds = timed(lambda: index.search(query, limit=5))
+            latencies.append(seconds)
+            ranked = [result[0] for result in results]
+            hit1 += bool(ranked) and ranked[0] == path
+            hit5 += path in ranked
+            target = os.path.relpath(path, root).lower()
+            substring_hits += any(query in name for name in file_names if name == target)
+
+        latencies.sort()
+        print(f"tracks: {len(tracks)}")
+        print(f"build (read all tags) {build:7.2f}s   load from index.json {load:6.2f}s")
+        print(f"sync no changes       {sync_same * 1000:7.1f}ms  sync +{args.new} files {sync_new * 1000:7.1f}ms")
+        print(f"query with typos: p50 {statistics.median(latencies) * 1000:.2f}ms  "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms")
+        print(f"hit@1 {hit1 / args.queries:.0%}  hit@5 {hit5 / args.queries:.0%}  "
+              f"(file name substring match: {substring_hits / args.queries:.0%})")
+
+
+if __name__ == "__main__":
+    main()
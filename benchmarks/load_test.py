@@ -0,0 +1,346 @@
+"""Load-test multi-sesi terhadap server Streamlit asli.
+
+Menjalankan `streamlit run app.py` di direktori kerja sementara, lalu N sesi
+websocket (benchmarks.session_client) menjalankan alur realistis secara
+bersamaan terhadap fake lokal (benchmarks.fakes). Yang diukur:
+
+- RSS server: baseline, peak, pertumbuhan per sesi, dan sisa setelah sesi ditutup
+- Latency script run (p50/p95/p99/max) dan latency per alur
+- Contention: latency probe /_stcore/health selama load (event loop server
+  tertahan -> probe lambat), jumlah thread, dan utilisasi CPU
+
+Hasil disimpan sebagai JSON supaya bisa dibandingkan antar versi:
+    python -m benchmarks.load_test --sessions 8 --label before --output before.json
+    python -m benchmarks.load_test --sessions 8 --label after --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.fakes import FakeConfig, FakeServices, fake_path
+from benchmarks.run_pages import percentile
+from benchmarks.scenarios import SPOTIFY_URL, TIKTOK_URL, prepare_workdir
+from benchmarks.session_client import SessionClient
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Alur per halaman: (aksi, label, nilai)
+FLOWS = {
+    "tiktok_downloader": [
+        ("text", "Paste TikTok video URL here", TIKTOK_URL),
+        ("click", "🚀 Download Video", None),
+    ],
+    "promt_generator": [
+        ("click", "Enhance Prompt", None),
+        ("click", "Generate Thumbnail", None),
+        ("click", "Generate Video", None),
+        ("click", "Generate Audio", None),
+    ],
+    "spotify_downloader": [
+        ("text", "Spotify URL", SPOTIFY_URL),
+        ("click", "Download", None),
+    ],
+    "data": [
+        ("number", "Number of Rows", 3),
+        ("click", "Generate & Append Data", None),
+    ],
+    "music": [],
+    "welcome": [],
+}
+
+DEFAULT_PAGES = ["tiktok_downloader", "promt_generator"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def read_proc_stats(pid):
+    """RSS (MB), jumlah thread, dan CPU time (detik) dari /proc"""
+    stats = {"rss_mb": None, "threads": None, "cpu_s": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_mb"] = int(line.split()[1]) / 1024
+                elif line.startswith("Threads:"):
+                    stats["threads"] = int(line.split()[1])
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+            stats["cpu_s"] = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        pass
+    return stats
+
+
+class Monitor:
+    """Sampling RSS/thread/CPU server dan probe health endpoint secara periodik"""
+
+    def __init__(self, pid, base_url, interval=0.25):
+        self.pid = pid
+        self.health_url = f"{base_url}/_stcore/health"
+        self.interval = interval
+        self.samples = []
+        self.probe_latencies = []
+        self._task = None
+
+    async def _loop(self):
+        async with httpx.AsyncClient(timeout=30) as client:
+            while True:
+                start = time.perf_counter()
+                try:
+                    await client.get(self.health_url)
+                    self.probe_latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    pass
+                stats = read_proc_stats(self.pid)
+                stats["t"] = time.time()
+                self.samples.append(stats)
+                await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def current(self):
+        return read_proc_stats(self.pid)
+
+
+async def run_flow(client, page):
+    start = time.perf_counter()
+    await client.open_page(page)
+    for action, label, value in FLOWS[page]:
+        if action == "click":
+            await client.click(label)
+        elif action == "text":
+            await client.set_text(label, value)
+        elif action == "number":
+            await client.set_number(label, value)
+    return time.perf_counter() - start
+
+
+async def run_session(index, base_url, pages, flows, ramp, all_done, results):
+    await asyncio.sleep(ramp * index)
+    client = SessionClient(base_url)
+    session = {"flow_latencies": [], "run_latencies": [], "errors": [], "done": False}
+    results.append(session)
+    try:
+        await client.connect()
+        for f in range(flows):
+            page = pages[(index + f) % len(pages)]
+            try:
+                session["flow_latencies"].append(await run_flow(client, page))
+            except Exception as e:
+                session["errors"].append(f"{page}: {type(e).__name__}: {e}")
+        session["errors"] += client.exceptions
+        session["run_latencies"] = client.run_latencies
+        session["done"] = True
+        # Tetap terhubung sampai semua sesi selesai, seperti tab browser yang masih terbuka
+        await all_done.wait()
+    except Exception as e:
+        session["errors"].append(f"session: {type(e).__name__}: {e}")
+        session["done"] = True
+    finally:
+        await client.close()
+
+
+async def wait_for_server(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.time() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("Streamlit server exited during startup")
+            try:
+                if (await client.get(f"{base_url}/_stcore/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Streamlit server did not become healthy")
+
+
+async def run_load(args, base_url, pid):
+    monitor = Monitor(pid, base_url)
+
+    # Warmup: satu sesi membuka semua halaman supaya import & cache sudah terisi
+    warmup = SessionClient(base_url)
+    await warmup.connect()
+    for page in args.pages:
+        await warmup.open_page(page)
+    await warmup.close()
+    await asyncio.sleep(1)
+    baseline = monitor.current()
+
+    monitor.start()
+    all_done = asyncio.Event()
+    sessions = []
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(run_session(i, base_url, args.pages, args.flows, args.ramp, all_done, sessions))
+        for i in range(args.sessions)
+    ]
+    while len(sessions) < args.sessions or not all(s["done"] for s in sessions):
+        await asyncio.sleep(0.1)
+    duration = time.perf_counter() - start
+    connected = monitor.current()
+
+    all_done.set()
+    await asyncio.gather(*tasks)
+    await asyncio.sleep(args.settle)
+    after_close = monitor.current()
+    await monitor.stop()
+
+    return compute_metrics(args, baseline, connected, after_close, monitor, sessions, duration)
+
+
+def compute_metrics(args, baseline, connected, after_close, monitor, sessions, duration):
+    run_latencies = [x for s in sessions for x in s["run_latencies"]]
+    flow_latencies = [x for s in sessions for x in s["flow_latencies"]]
+    rss_samples = [s["rss_mb"] for s in monitor.samples if s["rss_mb"] is not None]
+    thread_samples = [s["threads"] for s in monitor.samples if s["threads"] is not None]
+    cpu_used = None
+    if monitor.samples and monitor.samples[0]["cpu_s"] is not None:
+        cpu_used = monitor.samples[-1]["cpu_s"] - monitor.samples[0]["cpu_s"]
+    wall = monitor.samples[-1]["t"] - monitor.samples[0]["t"] if len(monitor.samples) > 1 else None
+
+    def growth(stats):
+        if stats["rss_mb"] is None or baseline["rss_mb"] is None:
+            return None
+        return stats["rss_mb"] - baseline["rss_mb"]
+
+    peak_rss = max(rss_samples + [connected["rss_mb"] or 0]) if rss_samples else connected["rss_mb"]
+    rss_growth = growth(connected)
+    return {
+        "sessions": args.sessions,
+        "flows": len(flow_latencies),
+        "errors": sum(len(s["errors"]) for s in sessions),
+        "duration_s": duration,
+        "flows_per_s": len(flow_latencies) / duration if duration else None,
+        "rss_baseline_mb": baseline["rss_mb"],
+        "rss_peak_mb": peak_rss,
+        "rss_connected_mb": connected["rss_mb"],
+        "rss_after_close_mb": after_close["rss_mb"],
+        "rss_growth_per_session_mb": rss_growth / args.sessions if rss_growth is not None else None,
+        "rss_retained_after_close_mb": growth(after_close),
+        "script_run_p50_s": percentile(run_latencies, 50),
+        "script_run_p95_s": percentile(run_latencies, 95),
+        "script_run_p99_s": percentile(run_latencies, 99),
+        "script_run_max_s": max(run_latencies) if run_latencies else None,
+        "flow_p50_s": percentile(flow_latencies, 50),
+        "flow_p95_s": percentile(flow_latencies, 95),
+        "health_probe_p50_s": percentile(monitor.probe_latencies, 50),
+        "health_probe_p99_s": percentile(monitor.probe_latencies, 99),
+        "health_probe_max_s": max(monitor.probe_latencies) if monitor.probe_latencies else None,
+        "threads_baseline": baseline["threads"],
+        "threads_peak": max(thread_samples) if thread_samples else None,
+        "cpu_utilization": cpu_used / wall if cpu_used is not None and wall else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_metrics(metrics, baseline=None):
+    print(f"{'metric':30} {'value':>12}" + (f" {'baseline':>12} {'delta':>8}" if baseline else ""))
+    for name, value in metrics.items():
+        line = f"{name:30} {format_value(value):>12}"
+        if baseline:
+            old = baseline.get(name)
+            delta = ""
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                delta = f"{(value - old) / old * 100:+.1f}%"
+            line += f" {format_value(old):>12} {delta:>8}"
+        print(line)
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session load test against a real Streamlit server")
+    parser.add_argument("--sessions", type=int, default=5, help="Concurrent sessions")
+    parser.add_argument("--flows", type=int, default=3, help="Flows per session")
+    parser.add_argument("--pages", nargs="+", default=DEFAULT_PAGES, choices=sorted(FLOWS),
+                        help="Pages used by the flows (round-robin per session)")
+    parser.add_argument("--ramp", type=float, default=0.2, help="Delay between session starts (seconds)")
+    parser.add_argument("--settle", type=float, default=3.0, help="Wait after closing sessions before measuring")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake service latency (seconds)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--media-size", type=int, default=2 * 1024 * 1024, help="Fake media size in bytes")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--label", default=None, help="Name of this run (e.g. version)")
+    parser.add_argument("--output", help="Save results as JSON")
+    parser.add_argument("--compare", help="Compare with a previously saved JSON result")
+    args = parser.parse_args()
+
+    config = FakeConfig(latency=args.latency, failure_rate=args.failure_rate, media_size=args.media_size)
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    with FakeServices(config) as fakes, tempfile.TemporaryDirectory(prefix="loadtest_") as workdir:
+        prepare_workdir(workdir)
+        env = {**os.environ, **fakes.env(), "PATH": fake_path(), "PYTHONPATH": ROOT_DIR}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT_DIR, "app.py"),
+             "--server.port", str(port), "--server.address", "127.0.0.1",
+             "--server.headless", "true", "--server.fileWatcherType", "none"],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            async def run():
+                await wait_for_server(base_url, server)
+                return await run_load(args, base_url, server.pid)
+
+            metrics = asyncio.run(run())
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["metrics"]
+    print_metrics(metrics, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "label": args.label,
+                "git_commit": git_commit(),
+                "timestamp": time.time(),
+                "config": vars(args),
+                "metrics": metrics,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
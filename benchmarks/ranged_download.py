@@ -0,0 +1,101 @@
+"""Benchmark pemilihan varian TikTok dan download byte-range paralel.
+
+Fake CDN lokal (benchmarks.fakes) menyajikan tiktok_hd.mp4 / tiktok_sd.mp4
+dengan ukuran dan bandwidth per koneksi yang bisa diatur, lalu
+`save_tiktok_video` dijalankan untuk beberapa skenario: satu stream,
+paralel, server tanpa Range (fallback), dan budget ukuran (pilih SD).
+Setiap hasil dicek byte-per-byte terhadap isi di fake CDN.
+
+Contoh:
+    python -m benchmarks.ranged_download
+    python -m benchmarks.ranged_download --hd-mb 32 --bandwidth-mb 4 --connections 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeConfig, FakeServices
+
+MB = 1024 ** 2
+
+
+def run_scenario(name, config, env, output_dir):
+    """Jalankan satu download di proses ini dengan env tertentu. Returns baris hasil."""
+    import importlib
+
+    import utils.media
+    import utils.tiktok
+
+    with FakeServices(config) as fakes:
+        saved = {key: os.environ.get(key) for key in [*fakes.env(), *env]}
+        os.environ.update(fakes.env())
+        os.environ.update(env)
+        try:
+            # Konstanta modul dibaca dari env saat import
+            importlib.reload(utils.media)
+            importlib.reload(utils.tiktok)
+            started = time.perf_counter()
+            result = utils.tiktok.save_tiktok_video("https://www.tiktok.com/@bench/video/1", output_dir)
+            seconds = time.perf_counter() - started
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+        if not result["success"]:
+            return {"scenario": name, "error": result["error"]}
+        with open(result["path"], "rb") as f:
+            identical = f.read() == fakes.media_bytes(os.path.basename(result["download_url"]))
+        return {
+            "scenario": name,
+            "variant": result["variant"],
+            "size_mb": result["download_size"] / MB if result["download_size"] else None,
+            "seconds": seconds,
+            "range_requests": fakes.counts["media:range"],
+            "identical": identical,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TikTok variant selection and ranged download benchmark")
+    parser.add_argument("--hd-mb", type=float, default=16)
+    parser.add_argument("--sd-mb", type=float, default=3)
+    parser.add_argument("--bandwidth-mb", type=float, default=8, help="Per-connection bandwidth of the fake CDN (MB/s)")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    def config(**overrides):
+        return FakeConfig(
+            latency=args.latency,
+            media_sizes={"tiktok_hd.mp4": int(args.hd_mb * MB), "tiktok_sd.mp4": int(args.sd_mb * MB)},
+            media_bandwidth=args.bandwidth_mb * MB,
+            **overrides,
+        )
+
+    parallel = {"DOWNLOAD_CONNECTIONS": str(args.connections)}
+    scenarios = [
+        ("single stream", config(), {"DOWNLOAD_CONNECTIONS": "1"}),
+        (f"{args.connections} ranges", config(), parallel),
+        ("no Range support", config(media_ranges=False), parallel),
+        ("size budget", config(), {**parallel, "TIKTOK_MAX_BYTES": str(int((args.hd_mb + args.sd_mb) / 2 * MB))}),
+    ]
+
+    print(f"{'scenario':20} {'variant':>7} {'MB':>6} {'sec':>7} {'ranges':>6}  ok")
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, scenario_config, env in scenarios:
+            row = run_scenario(name, scenario_config, env, output_dir)
+            if "error" in row:
+                print(f"{name:20} ERROR {row['error']}")
+                continue
+            print(
+                f"{row['scenario']:20} {row['variant']:>7} {row['size_mb']:6.1f} {row['seconds']:7.2f} "
+                f"{row['range_requests']:6d}  {'yes' if row['identical'] else 'NO'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
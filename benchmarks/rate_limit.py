@@ -0,0 +1,115 @@
+"""Benchmark limiter bersama DeepSeek: bulk fill + beberapa sesi kecil bersamaan.
+
+Fake DeepSeek membatasi N request per window dan membalas 429 + Retry-After
+kalau dilewati. Satu sesi "bulk" mengirim banyak request sekaligus, sesi lain
+hanya beberapa. Dibandingkan dua konfigurasi limiter:
+- unlimited: tanpa rpm/in-flight, hanya retry 429 (mirip perilaku lama)
+- limited: rpm sesuai batas fake + antrian round-robin per sesi
+
+Yang dilihat: jumlah 429 di server, total waktu, dan latency sesi kecil
+(dengan antrian adil, sesi kecil tidak menunggu bulk selesai).
+
+Contoh:
+    python -m benchmarks.rate_limit
+    python -m benchmarks.rate_limit --bulk 60 --small-sessions 4 --limit 10 --window 2
+"""
+import argparse
+import importlib
+import os
+import statistics
+import threading
+import time
+
+from benchmarks.fakes import FakeConfig, FakeServices
+
+
+def run_scenario(name, limits, args):
+    config = FakeConfig(latency=args.latency, rate_limit=args.limit, rate_window=args.window)
+    with FakeServices(config) as fakes:
+        saved = dict(os.environ)
+        os.environ.update(fakes.env())
+        os.environ.update(limits)
+        os.environ["DEEPSEEK_USAGE_LOG"] = ""
+        try:
+            # Konstanta limit dibaca dari env saat import; registry limiter juga ikut baru
+            import utils.clients
+            import utils.rate_limit
+            importlib.reload(utils.rate_limit)
+            importlib.reload(utils.clients)
+            client = utils.clients.get_deepseek_client("bench")
+            latencies = {}
+            errors = []
+
+            def session(session_name, calls):
+                for i in range(calls):
+                    started = time.perf_counter()
+                    try:
+                        utils.rate_limit.call_with_limits(
+                            "deepseek", "deepseek-chat",
+                            lambda: client.chat.completions.create(
+                                model="deepseek-chat",
+                                messages=[{"role": "user", "content": f"Generate 1 scenes for {session_name} {i}"}],
+                                response_format={"type": "json_object"},
+                            ),
+                            session=session_name,
+                        )
+                    except Exception as e:
+                        errors.append(f"{session_name}: {e.__class__.__name__}")
+                    latencies.setdefault(session_name, []).append(time.perf_counter() - started)
+
+            # Semua thread bulk satu sesi (seperti satu user yang bulk fill)
+            threads = [threading.Thread(target=session, args=("bulk", args.bulk // args.bulk_threads))
+                       for _ in range(args.bulk_threads)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(args.small_delay)
+            small = [threading.Thread(target=session, args=(f"small-{s}", args.small_calls))
+                     for s in range(args.small_sessions)]
+            for thread in small:
+                thread.start()
+            for thread in threads + small:
+                thread.join()
+            total = time.perf_counter() - started
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+
+        small_latencies = [v for k, values in latencies.items() if k.startswith("small") for v in values]
+        return {
+            "scenario": name,
+            "seconds": total,
+            "server_429": fakes.counts["deepseek:429"],
+            "errors": len(errors),
+            "small_p50": statistics.median(small_latencies) if small_latencies else 0.0,
+            "small_max": max(small_latencies) if small_latencies else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared DeepSeek limiter benchmark")
+    parser.add_argument("--bulk", type=int, default=40, help="Requests from the bulk session")
+    parser.add_argument("--bulk-threads", type=int, default=8, help="Concurrent threads in the bulk session")
+    parser.add_argument("--small-sessions", type=int, default=3)
+    parser.add_argument("--small-calls", type=int, default=2)
+    parser.add_argument("--small-delay", type=float, default=0.5, help="Seconds before small sessions start")
+    parser.add_argument("--limit", type=int, default=10, help="Fake server: max requests per window")
+    parser.add_argument("--window", type=float, default=2.0, help="Fake server: window in seconds")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rpm = args.limit * 60 / args.window
+    scenarios = [
+        ("unlimited", {"DEEPSEEK_RPM": "0", "DEEPSEEK_MAX_IN_FLIGHT": "0", "RATE_LIMIT_RETRIES": "8"}),
+        ("limited", {"DEEPSEEK_RPM": str(rpm * 0.9), "DEEPSEEK_MAX_IN_FLIGHT": "4", "RATE_LIMIT_RETRIES": "8",
+                     "RATE_LIMIT_BURST_SECONDS": str(args.window)}),
+    ]
+    print(f"{'scenario':12} {'sec':>7} {'429s':>6} {'errors':>6} {'small p50':>10} {'small max':>10}")
+    for name, limits in scenarios:
+        row = run_scenario(name, limits, args)
+        print(f"{row['scenario']:12} {row['seconds']:7.2f} {row['server_429']:6d} {row['errors']:6d} "
+              f"{row['small_p50']:10.2f} {row['small_max']:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
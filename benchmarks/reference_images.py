@@ -0,0 +1,86 @@
+"""Benchmark preprocessing gambar referensi Seedance.
+
+Membuat gambar sintetis seukuran output Imagen4 (PNG 9:16, default
+1536x2752), lalu mengukur untuk tiap resolusi target: ukuran file sebelum
+dan sesudah, waktu preprocessing (pertama dan dari cache), dan perkiraan
+waktu upload di uplink tertentu. Upload ke fal diganti fungsi palsu yang
+menghitung panggilan, untuk memastikan varian yang sama tidak diupload ulang.
+
+Contoh:
+    python -m benchmarks.reference_images
+    python -m benchmarks.reference_images --width 2048 --height 2048 --aspect-ratio 16:9 --uplink-mbps 5
+"""
+import argparse
+import importlib
+import os
+import random
+import tempfile
+import time
+
+
+def make_image(path, width, height):
+    """Gradien + noise + bentuk acak: kira-kira sekompres foto/render, bukan warna polos"""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(0)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(10, width // 6)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    Image.blend(image, noise, 0.15).save(path, "PNG")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seedance reference image preprocessing benchmark")
+    parser.add_argument("--width", type=int, default=1536)
+    parser.add_argument("--height", type=int, default=2752)
+    parser.add_argument("--aspect-ratio", default="9:16")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="Upload bandwidth for the estimate")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="references_")
+    saved = dict(os.environ)
+    os.environ["REFERENCE_DIR"] = os.path.join(workdir, "references")
+    os.environ["SHARED_STATE_URL"] = "sqlite:///" + os.path.join(workdir, "shared_state.db")
+    try:
+        import utils.reference_images
+        import utils.shared_state
+        importlib.reload(utils.shared_state)
+        references = importlib.reload(utils.reference_images)
+
+        source = os.path.join(workdir, "thumb.png")
+        make_image(source, args.width, args.height)
+        uploads = []
+
+        def upload(path):
+            uploads.append(path)
+            return f"https://fal.media/files/{os.path.basename(path)}"
+
+        original = os.path.getsize(source)
+        upload_seconds = lambda size: size * 8 / (args.uplink_mbps * 1e6)
+        print(f"source: {args.width}x{args.height} PNG, {original / 1024:.0f} KB, "
+              f"upload ~{upload_seconds(original):.2f}s at {args.uplink_mbps:g} Mbps")
+        print(f"{'variant':14} {'size KB':>8} {'ratio':>6} {'first ms':>9} {'cached ms':>10} {'upload s':>9} {'uploads':>8}")
+        for resolution in ["480p", "720p", "1080p"]:
+            started = time.perf_counter()
+            references.reference_url(source, upload, resolution, args.aspect_ratio)
+            first = time.perf_counter() - started
+            started = time.perf_counter()
+            url = references.reference_url(source, upload, resolution, args.aspect_ratio)
+            cached = time.perf_counter() - started
+
+            prepared = os.path.join(references.REFERENCE_DIR, os.path.basename(url))
+            size = os.path.getsize(prepared)
+            print(f"{resolution:14} {size / 1024:8.0f} {size / original:6.1%} {first * 1000:9.1f} "
+                  f"{cached * 1000:10.1f} {upload_seconds(size):9.2f} {uploads.count(prepared):8d}")
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Benchmark end-to-end offline untuk semua halaman di pages/.
+
+Setiap halaman dijalankan dengan Streamlit AppTest di proses terpisah
+(supaya peak RSS terukur per halaman) terhadap fake lokal untuk tikwm,
+DeepSeek, fal dan spotdl. Tidak butuh akses jaringan.
+
+Contoh:
+    python -m benchmarks.run_pages --iterations 5
+    python -m benchmarks.run_pages pages/tiktok_downloader.py --latency 0.2 --failure-rate 0.1
+    python -m benchmarks.run_pages --output bench.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+from benchmarks.fakes import FakeConfig, FakeServices, fake_path
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def peak_rss_mb():
+    """Peak RSS proses ini (ru_maxrss dalam KB di Linux, bytes di macOS)"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def run_worker(page, iterations, workdir):
+    """Dijalankan di subprocess: jalankan skenario halaman N kali"""
+    from benchmarks.scenarios import SCENARIOS, new_app, prepare_workdir
+
+    os.chdir(workdir)
+    prepare_workdir(workdir)
+
+    scenario = SCENARIOS[page]
+    latencies, errors, script_runs = [], [], 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        at = new_app(page)
+        run_start = time.perf_counter()
+        try:
+            script_runs += scenario(at)
+            errors += [str(e.value) for e in at.exception]
+        except Exception:
+            errors.append(traceback.format_exc(limit=3))
+        latencies.append(time.perf_counter() - run_start)
+    total = time.perf_counter() - start
+
+    return {
+        "page": page,
+        "iterations": iterations,
+        "script_runs": script_runs,
+        "latencies_s": latencies,
+        "total_s": total,
+        "peak_rss_mb": peak_rss_mb(),
+        "errors": errors,
+    }
+
+
+def summarize(result):
+    latencies = result["latencies_s"]
+    return {
+        "page": result["page"],
+        "iterations": result["iterations"],
+        "errors": len(result["errors"]),
+        "first_s": latencies[0] if latencies else None,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "max_s": max(latencies) if latencies else None,
+        "mean_s": statistics.mean(latencies) if latencies else None,
+        "flows_per_s": result["iterations"] / result["total_s"] if result["total_s"] else None,
+        "script_runs_per_s": result["script_runs"] / result["total_s"] if result["total_s"] else None,
+        "peak_rss_mb": result["peak_rss_mb"],
+    }
+
+
+def run_page(page, iterations, fakes, workdir):
+    """Jalankan worker untuk satu halaman di proses baru"""
+    env = {
+        **os.environ,
+        **fakes.env(),
+        "PATH": fake_path(),
+        "PYTHONPATH": ROOT_DIR,
+    }
+    command = [
+        sys.executable, "-m", "benchmarks.run_pages",
+        "--worker", page,
+        "--iterations", str(iterations),
+        "--workdir", workdir,
+    ]
+    result = subprocess.run(command, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"page": page, "iterations": 0, "script_runs": 0, "latencies_s": [], "total_s": 0,
+                "peak_rss_mb": None, "errors": [result.stderr.strip()[-1000:]]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_table(summaries):
+    print(f"{'page':32} {'runs':>4} {'err':>4} {'first':>7} {'p50':>7} {'p95':>7} {'max':>7} "
+          f"{'flow/s':>7} {'rss MB':>7}")
+    for s in summaries:
+        def fmt(value):
+            return f"{value:7.2f}" if value is not None else f"{'-':>7}"
+        print(f"{s['page']:32} {s['iterations']:4} {s['errors']:4} {fmt(s['first_s'])} {fmt(s['p50_s'])} "
+              f"{fmt(s['p95_s'])} {fmt(s['max_s'])} {fmt(s['flows_per_s'])} {fmt(s['peak_rss_mb'])}")
+
+
+def main():
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Offline end-to-end page benchmark")
+    parser.add_argument("pages", nargs="*", help=f"Pages to run (default: all {len(SCENARIOS)})")
+    parser.add_argument("--iterations", type=int, default=3, help="Sessions per page")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake service latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency (seconds)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of fake requests that fail")
+    parser.add_argument("--spotdl-latency", type=float, default=0.05, help="Fake spotdl latency per track")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Print errors")
+    # Internal: dipakai subprocess worker
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.iterations, args.workdir)))
+        return
+
+    os.environ["FAKE_SPOTDL_LATENCY"] = str(args.spotdl_latency)
+    os.environ["FAKE_SPOTDL_FAILURE_RATE"] = str(args.failure_rate)
+
+    config = FakeConfig(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate)
+    pages = args.pages or list(SCENARIOS)
+    results = []
+    with FakeServices(config) as fakes, tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        for page in pages:
+            results.append(run_page(page, args.iterations, fakes, workdir))
+        requests_served = dict(fakes.counts)
+
+    summaries = [summarize(r) for r in results]
+    print_table(summaries)
+    if args.verbose:
+        for result in results:
+            for error in result["errors"]:
+                print(f"\n[{result['page']}] {error}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": vars(args),
+                "summary": summaries,
+                "results": results,
+                "requests_served": requests_served,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
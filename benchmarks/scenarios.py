@@ -0,0 +1,111 @@
+"""Alur pengguna per halaman untuk benchmark dan load-test (Streamlit AppTest).
+
+Setiap skenario menerima AppTest yang baru dibuat (sesi baru), menjalankan
+alur realistis di halaman tersebut, dan mengembalikan jumlah script run.
+"""
+import os
+import random
+
+from streamlit.testing.v1 import AppTest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIKTOK_URL = "https://www.tiktok.com/@fake_user/video/1234567890"
+SPOTIFY_URL = "https://open.spotify.com/track/fake"
+
+
+def new_app(page, timeout=60):
+    return AppTest.from_file(os.path.join(ROOT_DIR, page), default_timeout=timeout)
+
+
+def click(at, label):
+    """Klik tombol berdasarkan label lalu jalankan ulang script"""
+    button = next(b for b in at.button if b.label == label)
+    button.click().run()
+
+
+def set_text(at, label, value):
+    element = next(e for e in list(at.text_input) + list(at.text_area) if e.label == label)
+    element.input(value)
+
+
+def prepare_workdir(workdir, num_songs=20, song_size=64 * 1024):
+    """Direktori kerja dengan file mp3 palsu untuk Music Player"""
+    downloads_dir = os.path.join(workdir, "downloads")
+    os.makedirs(downloads_dir, exist_ok=True)
+    for i in range(num_songs):
+        path = os.path.join(downloads_dir, f"Fake Artist - Library Song {i}.mp3")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(b"ID3" + random.randbytes(song_size))
+
+
+def run_welcome(at):
+    at.run()
+    return 1
+
+
+def run_metrics(at):
+    at.run()
+    at.toggle[0].set_value(True).run()
+    return 2
+
+
+def run_music(at):
+    at.run()
+    if at.selectbox:
+        at.selectbox[0].select_index(len(at.selectbox[0].options) - 1).run()
+        # Export ZIP: satu album + satu lagu
+        album = at.selectbox(key="export_album")
+        album.select_index(len(album.options) - 1).run()
+        songs = at.multiselect(key="export_songs")
+        songs.select(songs.options[0]).run()
+        return 4
+    return 1
+
+
+def run_tiktok(at):
+    at.run()
+    set_text(at, "Paste TikTok video URL here", TIKTOK_URL)
+    click(at, "🚀 Download Video")
+    return 2
+
+
+def run_spotify(at):
+    at.run()
+    set_text(at, "Spotify URL", SPOTIFY_URL)
+    click(at, "Download")
+    return 2
+
+
+def run_data(at):
+    at.run()
+    at.number_input[0].set_value(3)
+    click(at, "Generate & Append Data")
+    return 2
+
+
+def run_prompt_generator(at):
+    at.run()
+    click(at, "Enhance Prompt")
+    click(at, "Generate Thumbnail")
+    click(at, "Generate Video")
+    click(at, "Generate Audio")
+    return 5
+
+
+def run_pipeline(at):
+    at.run()
+    return 1
+
+
+SCENARIOS = {
+    "pages/welcome.py": run_welcome,
+    "pages/metrics.py": run_metrics,
+    "pages/music.py": run_music,
+    "pages/tiktok_downloader.py": run_tiktok,
+    "pages/spotify_downloader.py": run_spotify,
+    "pages/data.py": run_data,
+    "pages/promt_generator.py": run_prompt_generator,
+    "pages/pipeline.py": run_pipeline,
+}
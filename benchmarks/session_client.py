@@ -0,0 +1,115 @@
+"""Client websocket Streamlit minimal untuk mensimulasikan satu sesi browser.
+
+Client ini berbicara dengan server Streamlit asli lewat /_stcore/stream
+(protobuf BackMsg/ForwardMsg), jadi memori per sesi dan antrean script run
+terukur seperti pada pemakaian nyata. Butuh paket `websockets` (ikut
+terpasang bersama streamlit).
+"""
+import asyncio
+import time
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+EARLY_FOR_RERUN = ForwardMsg.ScriptFinishedStatus.Value("FINISHED_EARLY_FOR_RERUN")
+
+# Jenis element widget yang dicari berdasarkan label
+WIDGET_TYPES = ("button", "text_input", "text_area", "number_input", "selectbox", "checkbox", "download_button")
+
+
+class SessionClient:
+    """Satu sesi Streamlit: buka halaman, isi widget, klik tombol"""
+
+    def __init__(self, base_url):
+        self.ws_url = base_url.replace("http://", "ws://").rstrip("/") + "/_stcore/stream"
+        self.websocket = None
+        self.page_name = ""
+        self.widgets = {}
+        self.values = {}
+        self.exceptions = []
+        self.run_latencies = []
+        self._finished = None
+        self._reader = None
+
+    async def connect(self):
+        self.websocket = await websockets.connect(self.ws_url, subprotocols=["streamlit"], max_size=None)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+        if self.websocket:
+            await self.websocket.close()
+
+    async def _read_loop(self):
+        async for data in self.websocket:
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                self._handle_delta(msg.delta)
+            elif kind == "script_finished":
+                if msg.script_finished != EARLY_FOR_RERUN and self._finished and not self._finished.done():
+                    self._finished.set_result(msg.script_finished)
+
+    def _handle_delta(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.exceptions.append(f"{element.exception.type}: {element.exception.message}")
+        elif kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            self.widgets[(kind, widget.label)] = widget.id
+
+    async def rerun(self, triggers=(), timeout=120):
+        """Kirim rerun_script dan tunggu sampai script selesai. Returns latency (detik)."""
+        msg = BackMsg()
+        client_state = msg.rerun_script
+        client_state.page_name = self.page_name
+        for widget_id, state in self.values.items():
+            client_state.widget_states.widgets.append(state)
+        for widget_id in triggers:
+            client_state.widget_states.widgets.append(WidgetState(id=widget_id, trigger_value=True))
+
+        self._finished = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        await self.websocket.send(msg.SerializeToString())
+        await asyncio.wait_for(self._finished, timeout)
+        latency = time.perf_counter() - start
+        self.run_latencies.append(latency)
+        return latency
+
+    def widget_id(self, kind, label):
+        try:
+            return self.widgets[(kind, label)]
+        except KeyError:
+            raise LookupError(f"{kind} {label!r} not found on page {self.page_name!r}") from None
+
+    async def open_page(self, page_name):
+        self.page_name = page_name
+        self.widgets = {}
+        self.values = {}
+        return await self.rerun()
+
+    async def click(self, label):
+        return await self.rerun(triggers=[self.widget_id("button", label)])
+
+    async def set_text(self, label, value):
+        for kind in ("text_input", "text_area"):
+            if (kind, label) in self.widgets:
+                widget_id = self.widgets[(kind, label)]
+                self.values[widget_id] = WidgetState(id=widget_id, string_value=value)
+                return await self.rerun()
+        raise LookupError(f"text input {label!r} not found on page {self.page_name!r}")
+
+    async def set_number(self, label, value):
+        widget_id = self.widget_id("number_input", label)
+        if isinstance(value, int):
+            self.values[widget_id] = WidgetState(id=widget_id, int_value=value)
+        else:
+            self.values[widget_id] = WidgetState(id=widget_id, double_value=value)
+        return await self.rerun()
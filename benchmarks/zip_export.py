@@ -0,0 +1,98 @@
+"""Benchmark export ZIP Music Player: stream dari disk vs ZIP di memori.
+
+Membuat library palsu berisi file "MP3" besar (sparse file, jadi tidak
+memakan disk), lalu di subprocess terpisah mengukur peak RSS dan throughput:
+- streamed: `stream_zip` (route /exports di server.py), output dibuang
+- in-memory: `zip_in_memory` (fallback tanpa server.py, mirip download_button)
+
+Selain itu ZIP kecil ditulis ke disk dan dicek dengan `zipfile.testzip()`.
+
+Contoh:
+    python -m benchmarks.zip_export
+    python -m benchmarks.zip_export --files 8 --file-mb 768 --memory-files 2
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+MB = 1024 ** 2
+
+
+def make_library(root, files, file_mb):
+    album = os.path.join(root, "Artist - Album")
+    os.makedirs(album, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(album, f"{i + 1:02d} Track.mp3"), "wb") as f:
+            f.write(b"ID3")
+            f.truncate(file_mb * MB)
+    return sorted(glob.glob(os.path.join(album, "*.mp3")))
+
+
+def worker(mode, root, count):
+    """Dijalankan di subprocess supaya peak RSS tiap mode terpisah"""
+    from utils.zip_export import stream_zip, zip_in_memory
+
+    paths = sorted(glob.glob(os.path.join(root, "*", "*.mp3")))[:count]
+    started = time.perf_counter()
+    if mode == "streamed":
+        total = sum(len(chunk) for chunk in stream_zip(paths, root))
+    else:
+        total = len(zip_in_memory(paths, root))
+    seconds = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "files": len(paths), "bytes": total, "seconds": seconds, "peak_mb": peak_mb}))
+
+
+def run_worker(mode, root, count):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.zip_export", "--worker", mode, "--root", root, "--count", str(count)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamed vs in-memory ZIP export benchmark")
+    parser.add_argument("--files", type=int, default=6)
+    parser.add_argument("--file-mb", type=int, default=512, help="Size of each fake MP3 (sparse)")
+    parser.add_argument("--memory-files", type=int, default=1, help="Files for the in-memory run (it holds the ZIP)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    parser.add_argument("--count", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker, args.root, args.count)
+
+    from utils.zip_export import stream_zip
+
+    with tempfile.TemporaryDirectory(prefix="zip_export_") as root:
+        paths = make_library(root, args.files, args.file_mb)
+
+        # Validasi: ZIP kecil ke disk, dibaca ulang dengan zipfile
+        small = os.path.join(root, "check.zip")
+        with open(small, "wb") as f:
+            for chunk in stream_zip(paths[:2], root, chunk_size=MB):
+                f.write(chunk)
+        with zipfile.ZipFile(small) as archive:
+            ok = archive.testzip() is None and all(i.compress_type == zipfile.ZIP_STORED for i in archive.infolist())
+        os.remove(small)
+
+        print(f"library: {args.files} x {args.file_mb} MB, ZIP check: {'ok' if ok else 'FAILED'}")
+        print(f"{'mode':10} {'files':>5} {'ZIP MB':>8} {'sec':>7} {'MB/s':>7} {'peak RSS MB':>12}")
+        for mode, count in [("streamed", args.files), ("in-memory", args.memory_files)]:
+            row = run_worker(mode, root, count)
+            size_mb = row["bytes"] / MB
+            print(f"{row['mode']:10} {row['files']:5d} {size_mb:8.0f} {row['seconds']:7.2f} "
+                  f"{size_mb / row['seconds']:7.0f} {row['peak_mb']:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 import streamlit as st
-import pandas as pd
 import os
-from openai import OpenAI
 import json
 import time
 
+from utils.change_feed import df_rows, record_changes
+from utils.clients import deepseek_chat, get_deepseek_client
+from utils.profiling import timed
+from utils.rate_limit import get_limiter, wait_notice
+from utils.shared_state import file_lock_name, shared_lock, unique_tmp_path
+from utils.story_index import DUPLICATE_THRESHOLD, StoryIndex
+
 # Page Config
 st.set_page_config(page_title="Data Generator", layout="wide")
 
@@ -30,9 +35,15 @@ uploaded_file = st.sidebar.file_uploader("Upload CSV to replace n8n.csv", type=[
 
 if uploaded_file is not None:
     if st.sidebar.button("💾 Replace Local File"):
-        # Save uploaded file to n8n.csv
-        with open("n8n.csv", "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Save uploaded file to n8n.csv (atomic, di bawah lock bersama dengan pipeline/replica lain)
+        with shared_lock(file_lock_name("n8n.csv")):
+            tmp_path = unique_tmp_path("n8n.csv")
+            with open(tmp_path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
+            os.replace(tmp_path, "n8n.csv")
+            # Isi CSV berubah total: kirim ulang semua baris ke change feed
+            import pandas as pd
+            record_changes("n8n.csv", "replace", df_rows(pd.read_csv("n8n.csv")))
         st.sidebar.success("✅ File replaced! Reloading...")
         time.sleep(0.5)  # Give time for file to be written
         st.rerun()
@@ -40,6 +51,23 @@ if uploaded_file is not None:
 # Always use n8n.csv as the main data source
 CSV_FILE = "n8n.csv"
 
+# Story yang mirip dengan yang sudah ada tidak perlu dibuat videonya lagi
+st.sidebar.header("Duplicate Stories")
+duplicate_policy = st.sidebar.selectbox(
+    "Near-duplicate stories",
+    ["Regenerate", "Reject", "Keep"],
+    help="Regenerate replaces near-duplicates with new rows, Reject drops them, Keep appends everything"
+)
+duplicate_threshold = st.sidebar.slider("Similarity threshold", 0.5, 0.95, DUPLICATE_THRESHOLD, 0.05)
+MAX_REGENERATE_ROUNDS = 2
+
+# Limiter DeepSeek dipakai bersama semua sesi; tampilkan antriannya
+deepseek_queue = get_limiter("deepseek", "deepseek-chat").snapshot()
+st.sidebar.caption(
+    f"🚦 DeepSeek: {deepseek_queue['in_flight']} running, {deepseek_queue['queued']} queued, "
+    f"avg wait {deepseek_queue['avg_wait']:.1f}s"
+)
+
 # Input Parameters
 col1, col2 = st.columns(2)
 with col1:
@@ -47,47 +75,101 @@ with col1:
 with col2:
     num_rows = st.number_input("Number of Rows", min_value=1, max_value=20, value=5)
 
+@timed("csv:read")
 def load_existing_data():
+    import pandas as pd
+
     try:
         return pd.read_csv(CSV_FILE)
     except FileNotFoundError:
         return pd.DataFrame(columns=['row_number', 'index', 'story', 'model', 'aspect_ratio', 'resolution', 'duration', 'number_of_scene', 'status'])
 
-def generate_data(api_key, topic, count):
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
-    
-    # More concise prompt to avoid large responses
-    system_prompt = """You are a data generator. Generate ONLY a JSON object with key "data" containing a list.
-
-        RULES:
-        - Output JSON only. No commentary, no code block.
-        - All content must be realistic. NO fantasy, NO mutation, NO biological transformation, NO object transformation.
-
-        Each item MUST contain:
-        - story: string (<= 200 characters, short creative story, realistic nature or human scenes, natural movement)
-        - aspect_ratio: "9:16"
-        - resolution: "480p"
-        - duration: integer (2-12)
-        - number_of_scene: integer (3-5)
-        - status: "pending"
-        - scenes: list of objects with:
-            - title: string (<= 50 characters, realistic)
-            - prompt: string (<= 300 characters, realistic visual description, natural movement, no mutation, no object transformation)
-
-        CRITICAL:
-        - scenes.length MUST equal number_of_scene. If mismatch, JSON is invalid.
-
-        Output ONLY valid JSON."""
+def save_csv(df):
+    """Tulis n8n.csv secara atomic. Panggil di dalam `shared_lock(file_lock_name(CSV_FILE))`."""
+    tmp_path = unique_tmp_path(CSV_FILE)
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, CSV_FILE)
+
+def last_row_numbers(df):
+    """(row_number, index) terakhir di CSV, untuk penomoran baris baru"""
+    import pandas as pd
+
+    if df.empty:
+        return 0, -1
+    try:
+        last_row_num = df['row_number'].max()
+        last_index = df['index'].max()
+        # Handle NaN if file exists but empty columns
+        if pd.isna(last_row_num): last_row_num = 0
+        if pd.isna(last_index): last_index = -1
+    except:
+        return 0, -1
+    return last_row_num, last_index
+
+def drop_duplicate_stories(df, story_index):
+    """Buang baris yang story-nya mirip data lama atau sesama batch. Returns (df unik, story yang dibuang)."""
+    if 'story' not in df.columns:
+        return df, []
+    # Story kosong (NaN) tidak punya shingle dan tidak pernah dianggap duplikat
+    stories = df['story'].fillna('').astype(str).tolist()
+    unique, duplicates = story_index.filter_new(stories)
+    for i, (entry, score) in duplicates.items():
+        st.warning(f"♻️ Skipped near-duplicate story ({score:.0%} similar to row {entry['row']}): {stories[i][:80]}...")
+    return df.iloc[unique].reset_index(drop=True), [stories[i] for i in duplicates]
+
+# System prompt statis: prefix yang sama di setiap panggilan supaya kena context cache
+# DeepSeek. Data per panggilan (jumlah, topik, story) selalu di pesan user, di akhir.
+GENERATE_SYSTEM_PROMPT = """You are a data generator. Generate ONLY a JSON object with key "data" containing a list.
+
+RULES:
+- Output JSON only. No commentary, no code block.
+- All content must be realistic. NO fantasy, NO mutation, NO biological transformation, NO object transformation.
+
+Each item MUST contain:
+- story: string (<= 200 characters, short creative story, realistic nature or human scenes, natural movement)
+- aspect_ratio: "9:16"
+- resolution: "480p"
+- duration: integer (2-12)
+- number_of_scene: integer (3-5)
+- status: "pending"
+- scenes: list of objects with:
+    - title: string (<= 50 characters, realistic)
+    - prompt: string (<= 300 characters, realistic visual description, natural movement, no mutation, no object transformation)
+
+CRITICAL:
+- scenes.length MUST equal number_of_scene. If mismatch, JSON is invalid.
+
+Output ONLY valid JSON."""
+
+FILL_SCENES_SYSTEM_PROMPT = """You write scenes for short realistic video stories.
+Return a JSON object with key 'scenes' containing a list of scene objects, exactly as many as requested.
+Each scene object must have:
+- title: short scene title (max 50 chars)
+- prompt: visual description for the scene (max 300 chars, realistic visuals with natural movement, no mutation, no transformation)
+
+Output ONLY valid JSON."""
+
+def generate_data(api_key, topic, count, avoid=None):
+    import pandas as pd
+
+    client = get_deepseek_client(api_key)
     
     user_prompt = f"Generate {count} rows about '{topic}'."
+    if avoid:
+        user_prompt += "\nEach story must be clearly different from these existing stories:\n" + "\n".join(f"- {story}" for story in avoid)
     
+    # Pacing/backoff 429 ditangani limiter bersama; retry di sini hanya untuk JSON yang rusak
+    queue_status = st.empty()
     max_retries = 2
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
+            response = deepseek_chat(
+                client,
+                "data:generate",
+                on_wait=wait_notice(queue_status, "DeepSeek busy"),
                 model="deepseek-chat",
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": GENERATE_SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
                 ],
                 response_format={ "type": "json_object" },
@@ -95,6 +177,7 @@ def generate_data(api_key, topic, count):
                 max_tokens=6000  # Increased token limit untuk mengakomodasi lebih banyak rows
             )
             
+            queue_status.empty()
             content = response.choices[0].message.content
             
             # Debug: Show response length
@@ -122,7 +205,6 @@ def generate_data(api_key, topic, count):
                 
                 if attempt < max_retries - 1:
                     st.warning("⏳ Retrying with more strict prompt...")
-                    time.sleep(1)
                     continue
                 else:
                     st.error("❌ Failed to parse JSON after retries. **Try reducing 'Number of Rows' or simplifying the topic.**")
@@ -231,7 +313,6 @@ def generate_data(api_key, topic, count):
             st.error(f"❌ Error on attempt {attempt+1}/{max_retries}: {str(e)}")
             if attempt < max_retries - 1:
                 st.warning("⏳ Retrying...")
-                time.sleep(1)
             else:
                 st.error("❌ **Failed after all retries.** Please try again with fewer rows or a simpler topic.")
                 return None
@@ -250,41 +331,58 @@ with col_btn1:
         if not deepseek_key:
             st.error("Please provide a DeepSeek API Key in the sidebar.")
         else:
+            import pandas as pd
+
             with st.spinner(f"Generating {num_rows} rows about '{topic}'..."):
-                # Calculate start indices
-                if not existing_df.empty:
-                    try:
-                        last_row_num = existing_df['row_number'].max()
-                        last_index = existing_df['index'].max()
-                        # Handle NaN if file exists but empty columns
-                        if pd.isna(last_row_num): last_row_num = 0
-                        if pd.isna(last_index): last_index = -1
-                    except:
-                        last_row_num = 0
-                        last_index = -1
-                else:
-                    last_row_num = 0
-                    last_index = -1
-                
                 new_df = generate_data(deepseek_key, topic, num_rows)
-                
+
+                story_index = None
+                if new_df is not None and duplicate_policy != "Keep":
+                    story_index = StoryIndex.load(CSV_FILE, duplicate_threshold)
+                    new_df, rejected = drop_duplicate_stories(new_df, story_index)
+                    rounds = MAX_REGENERATE_ROUNDS if duplicate_policy == "Regenerate" else 0
+                    for _ in range(rounds):
+                        if not rejected:
+                            break
+                        st.info(f"🔁 Regenerating {len(rejected)} row(s) to replace near-duplicates...")
+                        extra_df = generate_data(deepseek_key, topic, len(rejected), avoid=rejected + new_df['story'].astype(str).tolist())
+                        if extra_df is None:
+                            break
+                        combined_df = pd.concat([new_df, extra_df], ignore_index=True)
+                        new_df, rejected = drop_duplicate_stories(combined_df, story_index)
+                    if new_df.empty:
+                        st.error("All generated stories were near-duplicates. Try a different topic.")
+                        new_df = None
+
                 if new_df is not None:
-                    # Add sequential numbers
-                    new_df['row_number'] = range(int(last_row_num) + 1, int(last_row_num) + 1 + len(new_df))
-                    new_df['index'] = range(int(last_index) + 1, int(last_index) + 1 + len(new_df))
-                    
-                    # Reorder columns to match existing if possible
-                    if not existing_df.empty:
-                        final_columns = existing_df.columns.tolist()
-                        # Ensure new_df has all these columns
-                        for col in final_columns:
-                            if col not in new_df.columns:
-                                new_df[col] = None
-                        new_df = new_df[final_columns]
-                    
-                    # Append and Save
-                    updated_df = pd.concat([existing_df, new_df], ignore_index=True)
-                    updated_df.to_csv(CSV_FILE, index=False)
+                    # Baca ulang CSV di bawah lock: pipeline atau sesi/replica lain bisa sudah mengubahnya
+                    with shared_lock(file_lock_name(CSV_FILE)):
+                        current_df = load_existing_data()
+                        last_row_num, last_index = last_row_numbers(current_df)
+
+                        # Add sequential numbers
+                        new_df['row_number'] = range(int(last_row_num) + 1, int(last_row_num) + 1 + len(new_df))
+                        new_df['index'] = range(int(last_index) + 1, int(last_index) + 1 + len(new_df))
+                        
+                        # Reorder columns to match existing if possible
+                        if not current_df.empty:
+                            final_columns = current_df.columns.tolist()
+                            # Ensure new_df has all these columns
+                            for col in final_columns:
+                                if col not in new_df.columns:
+                                    new_df[col] = None
+                            new_df = new_df[final_columns]
+                        
+                        # Append and Save
+                        updated_df = pd.concat([current_df, new_df], ignore_index=True)
+                        save_csv(updated_df)
+                        record_changes(CSV_FILE, "append", df_rows(new_df))
+
+                        # Update index supaya cek berikutnya tidak perlu hash ulang
+                        if story_index is not None and 'story' in new_df.columns:
+                            for story, row_number in zip(new_df['story'], new_df['row_number']):
+                                story_index.add(story, row_number)
+                            story_index.save()
                     
                     st.success(f"Successfully appended {len(new_df)} rows to {CSV_FILE}!")
                     st.rerun()
@@ -296,6 +394,8 @@ with col_btn2:
         elif existing_df.empty:
             st.warning("No data to fill.")
         else:
+            import pandas as pd
+
             with st.spinner("Scanning for missing data..."):
                 # Identify rows with missing scene data
                 rows_to_fix = []
@@ -317,6 +417,8 @@ with col_btn2:
                     st.info("No missing data found!")
                 else:
                     st.write(f"Found {len(rows_to_fix)} rows with missing data. Filling...")
+                    status_text = st.empty()
+                    filled = {}  # idx -> {kolom: nilai}
                     
                     for idx in rows_to_fix:
                         row = existing_df.loc[idx]
@@ -329,24 +431,17 @@ with col_btn2:
                             num_scenes = int(num_scenes_val)
                         
                         # Generate scenes for this story
-                        client = OpenAI(api_key=deepseek_key, base_url="https://api.deepseek.com")
-                        
-                        system_prompt = f"""Generate {num_scenes} scenes for this story. 
-                        Return a JSON object with key 'scenes' containing a list of {num_scenes} scene objects.
-                        Each scene object must have:
-                        - title: short scene title (max 50 chars)
-                        - prompt: visual description for the scene (max 300 chars, realistic visuals with natural movement, no mutation, no transformation)
-                        
-                        Story: {story}
-                        
-                        Output ONLY valid JSON."""
+                        client = get_deepseek_client(deepseek_key)
                         
                         try:
-                            response = client.chat.completions.create(
+                            response = deepseek_chat(
+                                client,
+                                "data:fill_scenes",
+                                on_wait=wait_notice(status_text, "DeepSeek busy"),
                                 model="deepseek-chat",
                                 messages=[
-                                    {"role": "system", "content": system_prompt},
-                                    {"role": "user", "content": f"Generate {num_scenes} scenes"}
+                                    {"role": "system", "content": FILL_SCENES_SYSTEM_PROMPT},
+                                    {"role": "user", "content": f"Generate {num_scenes} scenes for this story.\n\nStory: {story}"}
                                 ],
                                 response_format={ "type": "json_object" },
                                 temperature=0.7
@@ -361,12 +456,27 @@ with col_btn2:
                                     scene_col = f'scene_{i+1}'
                                     prompt_col = f'scene_detail_{i+1}'
                                     if scene_col in existing_df.columns and prompt_col in existing_df.columns:
-                                        existing_df.at[idx, scene_col] = scene.get('title', f'Scene {i+1}')
-                                        existing_df.at[idx, prompt_col] = scene.get('prompt', f'Scene {i+1} description')
+                                        filled.setdefault(idx, {})[scene_col] = scene.get('title', f'Scene {i+1}')
+                                        filled[idx][prompt_col] = scene.get('prompt', f'Scene {i+1} description')
                         except Exception as e:
                             st.warning(f"Failed to fill row {idx}: {e}")
                     
-                    # Save updated data
-                    existing_df.to_csv(CSV_FILE, index=False)
+                    # Save updated data: terapkan hanya kolom yang diisi ke CSV terbaru
+                    # (status dari pipeline atau baris baru dari sesi lain tidak tertimpa)
+                    with shared_lock(file_lock_name(CSV_FILE)):
+                        current_df = load_existing_data()
+                        changed = []
+                        for idx, values in filled.items():
+                            if 'row_number' in current_df.columns:
+                                targets = current_df.index[current_df['row_number'] == existing_df.at[idx, 'row_number']]
+                            else:
+                                targets = [idx] if idx in current_df.index else []
+                            for target in targets:
+                                for col, value in values.items():
+                                    if col in current_df.columns:
+                                        current_df.at[target, col] = value
+                                changed.append(target)
+                        save_csv(current_df)
+                        record_changes(CSV_FILE, "update", df_rows(current_df.loc[changed]))
                     st.success(f"Successfully filled {len(rows_to_fix)} rows!")
                     st.rerun()
\ No newline at end of file
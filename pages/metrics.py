@@ -0,0 +1,59 @@
+import streamlit as st
+
+from utils.profiling import PROFILE_SESSION_KEY, SLOW_RUN_LOG, SLOW_RUN_SECONDS, metrics, recent_slow_runs
+
+st.title("📈 Metrics")
+st.write("Durasi rerun per halaman sejak server start, dan rerun yang lambat")
+
+# Sampling profiler hanya untuk sesi ini; berlaku untuk rerun berikutnya di halaman mana pun
+st.toggle(
+    "Sampling profiler for this session",
+    key=PROFILE_SESSION_KEY,
+    help="Samples the script thread's stack during every rerun of this session and logs the top functions",
+)
+
+page_metrics = metrics()
+if page_metrics:
+    st.subheader("Reruns per page")
+    st.dataframe(
+        [
+            {
+                "page": page,
+                "runs": data["runs"],
+                "avg s": data["avg"],
+                "p50 s": data["p50"],
+                "p95 s": data["p95"],
+                "max s": data["max"],
+                f"slow (≥{SLOW_RUN_SECONDS:g}s)": data["slow"],
+                "top sections": ", ".join(f"{name} {value:.2f}s" for name, value in data["top_sections"].items()),
+            }
+            for page, data in page_metrics.items()
+        ],
+        hide_index=True,
+    )
+else:
+    st.caption("Belum ada rerun yang tercatat.")
+
+st.subheader("Slow & profiled runs")
+slow_runs = recent_slow_runs(20)
+if not slow_runs:
+    st.caption(f"Belum ada run lambat di {SLOW_RUN_LOG}")
+for entry in slow_runs:
+    profiled = " · profiled" if entry.get("profile") else ""
+    with st.expander(f"{entry['page']} — {entry['seconds']:.2f}s ({entry['outcome']}){profiled}"):
+        if entry["sections"]:
+            st.write("**Sections**")
+            st.json(entry["sections"])
+        if entry.get("profile"):
+            profile = entry["profile"]
+            st.write(f"**Top functions** ({profile['samples']} samples)")
+            st.dataframe(
+                [{"function": label, "seconds": value} for label, value in profile["inclusive"]],
+                hide_index=True,
+            )
+            st.write("**Hottest lines**")
+            st.dataframe(
+                [{"line": label, "seconds": value} for label, value in profile["self"]],
+                hide_index=True,
+            )
+st.caption(f"Log: {SLOW_RUN_LOG} (rotating)")
@@ -1,54 +1,353 @@
 import streamlit as st
 import os
-import glob
+import time
+
+from utils.dedup import POLICIES, submit_dedup
+from utils.library_search import describe, get_library_index
+from utils.media import check_ffmpeg
+from utils.playlist import (
+    REPEAT_MODES, PlayQueue, group_tracks, list_tracks, load_queue, load_track, prefetch,
+    save_queue, track_duration,
+)
+from utils.transcode import DEFAULT_PROFILE, PROFILES, get_cached_variant, prewarm_recent, submit_transcode
+from utils import audio_analysis, zip_export
 
 st.title("Music Player")
 
 # Define the downloads directory
 DOWNLOADS_DIR = "downloads"
 
+
+def track_name(path):
+    return os.path.relpath(path, DOWNLOADS_DIR)
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+@st.cache_data(show_spinner=False)
+def cached_groups(by, tracks, mtimes):
+    """Grouping album membaca tag tiap file; di-cache selama library tidak berubah"""
+    return group_tracks(list(tracks), by, DOWNLOADS_DIR)
+
+
+def store_queue(queue, listener):
+    st.session_state[f"queue:{listener}"] = queue
+    save_queue(queue, listener, DOWNLOADS_DIR)
+
+
+@st.fragment(run_every=1)
+def auto_advance(queue, listener):
+    """Pindah ke lagu berikutnya saat durasi lagu habis, dihitung dari waktu mulai di sesi ini.
+
+    Hanya timer di server: pause/seek di browser tidak ikut terhitung, jadi opt-in.
+    """
+    duration = track_duration(queue.current)
+    if not duration or queue.started_at is None:
+        return
+    elapsed = time.time() - queue.started_at
+    st.progress(min(elapsed / duration, 1.0), text=f"{format_time(min(elapsed, duration))} / {format_time(duration)}")
+    if elapsed >= duration + 0.5:
+        queue.advance(auto=True)
+        store_queue(queue, listener)
+        st.rerun()
+
+
 # Ensure the directory exists
 if not os.path.exists(DOWNLOADS_DIR):
     st.error(f"Please download some music first.")
 else:
     # Get list of mp3 files
-    mp3_files = glob.glob(os.path.join(DOWNLOADS_DIR, "*.mp3"))
-    
+    mp3_files = list_tracks(DOWNLOADS_DIR)
+
     if not mp3_files:
         st.warning("No MP3 files found in the downloads folder.")
     else:
         # Extract just the filenames for the selectbox
-        file_names = [os.path.basename(f) for f in mp3_files]
-        
-        # Let user select a file
-        selected_file = st.selectbox("Select a song to play", file_names)
-        
-        if selected_file:
-            file_path = os.path.join(DOWNLOADS_DIR, selected_file)
-            
-            # Display audio player
-            st.write(f"**Now Playing:** {selected_file}")
-            st.audio(file_path, format='audio/mp3')
-            
-            # Create columns for buttons
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Add a download button for the selected file
-                with open(file_path, "rb") as f:
-                    st.download_button(
-                        label="Download MP3",
-                        data=f,
-                        file_name=selected_file,
-                        mime="audio/mp3"
+        file_names = [track_name(f) for f in mp3_files]
+
+        # Streaming quality (varian kecil untuk didengarkan lewat koneksi HP)
+        quality_options = ["original"] + list(PROFILES)
+        quality = st.sidebar.selectbox(
+            "Streaming quality",
+            quality_options,
+            index=quality_options.index("original"),
+            help=f"Streams are prepared in the background; the original MP3 plays until then "
+                 f"({PROFILES[DEFAULT_PROFILE]['label']} is the smallest)",
+            format_func=lambda q: "Original MP3" if q == "original" else PROFILES[q]["label"]
+        )
+        if quality != "original" and not check_ffmpeg():
+            st.sidebar.warning("FFmpeg not found, playing original files.")
+            quality = "original"
+
+        # Transcode lagu terbaru di background supaya pemutaran langsung mulai
+        if quality != "original":
+            prewarm_recent(DOWNLOADS_DIR, quality)
+
+        # Analisis durasi/bitrate/loudness lagu baru di background (worker pool);
+        # halaman hanya membaca hasil dari cache
+        audio_analysis.submit_analysis(mp3_files, DOWNLOADS_DIR)
+        analyzed, total, pending = audio_analysis.get_cache(DOWNLOADS_DIR).progress(mp3_files)
+        if analyzed < total:
+            st.sidebar.caption(f"🔊 Analyzing loudness: {analyzed}/{total} tracks ({pending} queued)")
+
+        # Deduplikasi library (hash audio, tag diabaikan) di background
+        with st.sidebar.expander("🧹 Duplicates"):
+            dedup_policy = st.selectbox(
+                "Policy", POLICIES, index=POLICIES.index("report"),
+                help="report only lists duplicates; hardlink keeps every file name but stores the audio once "
+                     "(the duplicate takes the kept file's tags); remove deletes duplicates"
+            )
+            if st.button("Scan library"):
+                st.session_state['dedup_job'] = submit_dedup(DOWNLOADS_DIR, dedup_policy)
+
+            dedup_job = st.session_state.get('dedup_job')
+            if dedup_job is not None and not dedup_job.done():
+                @st.fragment(run_every=2)
+                def wait_for_dedup():
+                    if st.session_state['dedup_job'].done():
+                        st.rerun()
+                    st.info("⏳ Scanning library...")
+
+                wait_for_dedup()
+            elif dedup_job is not None:
+                if dedup_job.exception() is not None:
+                    st.error(f"Dedup failed: {dedup_job.exception()}")
+                else:
+                    result = dedup_job.result()
+                    st.caption(
+                        f"{result['files_total']} files, {result['duplicates']} duplicates "
+                        f"({result['policy']}), {result['bytes_saved'] / 1024 ** 2:.1f} MB saved"
                     )
-            
-            with col2:
-                # Add delete button
-                if st.button("Delete File", type="primary", key="delete_btn"):
-                    try:
-                        os.remove(file_path)
-                        st.success(f"Deleted {selected_file}")
+                    for group in result['groups'][:20]:
+                        st.text("\n  ".join(group))
+                    for error in result['errors']:
+                        st.warning(error)
+
+        # Radio, bukan st.tabs: st.tabs menjalankan isi semua tab setiap rerun, jadi
+        # player queue (autoplay) ikut diputar walau user sedang di Library
+        view = st.radio("View", ["🎵 Library", "📻 Queue"], horizontal=True, label_visibility="collapsed", key="music_view")
+
+        if view == "🎵 Library":
+            # Cari lagu lewat index tag (typo-tolerant); tanpa query tampilkan lagu terbaru
+            library_index = get_library_index(DOWNLOADS_DIR, mp3_files)
+            search_query = st.text_input("🔎 Search title, artist, album or file name", key="library_search")
+            if search_query.strip():
+                matches = library_index.search(search_query)
+                if not matches:
+                    st.caption("No matches.")
+            else:
+                matches = library_index.recent()
+                st.caption(f"{len(mp3_files)} tracks · showing the {len(matches)} most recent")
+            match_labels = {track_name(path): describe(entry) for path, _, entry in matches}
+
+            # Let user select a file
+            selected_file = st.selectbox(
+                "Select a song to play", list(match_labels), format_func=lambda name: match_labels[name]
+            )
+
+            if selected_file:
+                file_path = os.path.join(DOWNLOADS_DIR, selected_file)
+
+                # Display audio player
+                st.write(f"**Now Playing:** {selected_file}")
+                # Varian streaming tidak pernah di-transcode di jalur request: selama belum
+                # ada di cache, transcode diantrekan di background dan file asli yang diputar
+                stream_path = None
+                if quality != "original":
+                    stream_path = get_cached_variant(file_path, quality)
+                    if stream_path is None:
+                        transcode_job = submit_transcode(file_path, quality)
+                        if transcode_job.done() and transcode_job.exception() is not None:
+                            st.warning(f"Could not transcode, playing original: {transcode_job.exception()}")
+                        else:
+                            st.caption(f"⏳ Preparing {PROFILES[quality]['label']} stream, playing the original for now.")
+
+                analysis = audio_analysis.get_analysis(file_path, DOWNLOADS_DIR)
+                if analysis:
+                    gain = audio_analysis.playback_gain(file_path, DOWNLOADS_DIR)
+                    # Normalisasi hanya diterapkan di varian streaming (st.audio tidak punya kontrol volume)
+                    if gain and stream_path:
+                        st.caption(f"{audio_analysis.describe(analysis)} · normalized {gain:+.1f} dB")
+                    else:
+                        st.caption(audio_analysis.describe(analysis))
+                if stream_path:
+                    st.audio(stream_path, format=PROFILES[quality]["mime"])
+                else:
+                    st.audio(file_path, format='audio/mp3')
+
+                # Create columns for buttons
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    # Add a download button for the selected file
+                    with open(file_path, "rb") as f:
+                        st.download_button(
+                            label="Download MP3",
+                            data=f,
+                            file_name=os.path.basename(selected_file),
+                            mime="audio/mp3"
+                        )
+
+                with col2:
+                    # Add delete button
+                    if st.button("Delete File", type="primary", key="delete_btn"):
+                        try:
+                            os.remove(file_path)
+                            st.success(f"Deleted {selected_file}")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Error deleting file: {e}")
+
+            # Download banyak lagu sekaligus sebagai satu ZIP (di-stream dari disk lewat server.py)
+            with st.expander("📦 Download multiple songs as ZIP"):
+                mtimes = tuple(os.path.getmtime(f) for f in mp3_files)
+                albums = cached_groups("album", tuple(mp3_files), mtimes)
+                export_album = st.selectbox("Whole album", ["(none)"] + list(albums), key="export_album")
+                export_songs = st.multiselect("Songs", file_names, key="export_songs")
+
+                export_paths = list(albums.get(export_album, []))
+                for name in export_songs:
+                    path = os.path.join(DOWNLOADS_DIR, name)
+                    if path not in export_paths:
+                        export_paths.append(path)
+                export_bytes = sum(os.path.getsize(p) for p in export_paths if os.path.exists(p))
+                zip_name = f"{export_album if export_album != '(none)' else 'songs'}.zip".replace("/", "_")
+                st.caption(f"{len(export_paths)} files, {export_bytes / 1024 ** 2:.1f} MB")
+
+                # Token berlaku untuk pilihan saat "Prepare ZIP" diklik; pilihan berubah = token dibuang
+                prepared = st.session_state.get("export_prepared")
+                if prepared and (prepared["paths"], prepared["name"]) != (export_paths, zip_name):
+                    prepared = st.session_state["export_prepared"] = None
+
+                if export_paths:
+                    if zip_export.route_enabled:
+                        if st.button("Prepare ZIP"):
+                            prepared = st.session_state["export_prepared"] = {
+                                "paths": export_paths,
+                                "name": zip_name,
+                                "token": zip_export.create_export(export_paths, DOWNLOADS_DIR, zip_name),
+                            }
+                        if prepared:
+                            st.link_button("⬇️ Download ZIP", zip_export.export_url(prepared["token"]))
+                    elif export_bytes <= zip_export.EXPORT_MEMORY_LIMIT:
+                        st.download_button(
+                            "⬇️ Download ZIP",
+                            data=lambda: zip_export.zip_in_memory(export_paths, DOWNLOADS_DIR),
+                            file_name=zip_name,
+                            mime="application/zip",
+                        )
+                    else:
+                        st.warning(
+                            f"Selections over {zip_export.EXPORT_MEMORY_LIMIT / 1024 ** 2:.0f} MB need the streaming "
+                            "export route: start the app with `streamlit run server.py`."
+                        )
+
+        else:
+            # Queue disimpan per listener (juga di URL, ?listener=...) supaya tidak hilang saat reload
+            listener = st.text_input(
+                "Listener",
+                value=st.query_params.get("listener", "default"),
+                help="Each listener has their own saved queue"
+            ).strip() or "default"
+            if st.query_params.get("listener", "default") != listener:
+                st.query_params["listener"] = listener
+
+            queue_key = f"queue:{listener}"
+            # Player queue baru dirender setelah user menekan play di sesi ini
+            active_key = f"queue_active:{listener}"
+            if queue_key not in st.session_state:
+                st.session_state[queue_key] = load_queue(listener, DOWNLOADS_DIR)
+            queue = st.session_state[queue_key]
+
+            def play(action=None):
+                """Aksi user pada queue: mulai ulang timer lagu, aktifkan player, simpan"""
+                if action:
+                    action()
+                queue.started_at = time.time() if queue.current else None
+                st.session_state[active_key] = True
+                store_queue(queue, listener)
+                st.rerun()
+
+            with st.expander("➕ New queue", expanded=queue is None or queue.current is None):
+                source_type = st.radio("Play", ["Whole library", "Album", "Folder"], horizontal=True)
+                source_tracks, source_name = mp3_files, "Library"
+                if source_type != "Whole library":
+                    mtimes = tuple(os.path.getmtime(f) for f in mp3_files)
+                    groups = cached_groups(source_type.lower(), tuple(mp3_files), mtimes)
+                    source_name = st.selectbox(source_type, list(groups))
+                    source_tracks = groups[source_name]
+                option_col1, option_col2 = st.columns(2)
+                with option_col1:
+                    new_shuffle = st.checkbox("Shuffle", key="new_queue_shuffle")
+                with option_col2:
+                    new_repeat = st.selectbox("Repeat", REPEAT_MODES, key="new_queue_repeat")
+                if st.button(f"▶️ Play {len(source_tracks)} tracks", type="primary"):
+                    queue = PlayQueue(source_tracks, shuffle=new_shuffle, repeat=new_repeat, source=source_name)
+                    play()
+
+            if queue is not None:
+                queue.remove_missing()
+
+            if queue is not None and queue.current and not st.session_state.get(active_key):
+                # Queue tersimpan dari sesi sebelumnya: tunggu user sebelum memutar
+                st.write(f"**Up now:** {track_name(queue.current)}")
+                st.caption(f"Saved queue: {queue.source} · {queue.position + 1}/{len(queue.order)}")
+                if st.button("▶️ Resume queue", type="primary"):
+                    play()
+            elif queue is not None and queue.current:
+                current = queue.current
+                st.write(f"**Now Playing:** {track_name(current)}")
+                st.caption(f"Queue: {queue.source} · {queue.position + 1}/{len(queue.order)}")
+
+                data, mime = load_track(current, quality)
+                next_track = queue.peek_next()
+                # Satu lagu yang diulang cukup di-loop oleh browser
+                loop = next_track == current
+                st.audio(data, format=mime, autoplay=True, loop=loop)
+
+                # Siapkan lagu berikutnya selagi lagu ini diputar
+                if next_track and not loop:
+                    prefetch(next_track, quality)
+
+                control_col1, control_col2, control_col3, control_col4 = st.columns(4)
+                with control_col1:
+                    if st.button("⏮️ Previous", use_container_width=True, disabled=queue.position == 0):
+                        play(queue.previous)
+                with control_col2:
+                    if st.button("⏭️ Next", use_container_width=True):
+                        play(queue.advance)
+                with control_col3:
+                    shuffle = st.toggle("Shuffle", value=queue.shuffle, key=f"shuffle:{listener}")
+                    if shuffle != queue.shuffle:
+                        queue.set_shuffle(shuffle)
+                        store_queue(queue, listener)
+                        st.rerun()
+                with control_col4:
+                    repeat = st.selectbox(
+                        "Repeat", REPEAT_MODES, index=REPEAT_MODES.index(queue.repeat),
+                        key=f"repeat:{listener}", label_visibility="collapsed"
+                    )
+                    if repeat != queue.repeat:
+                        queue.repeat = repeat
+                        store_queue(queue, listener)
                         st.rerun()
-                    except Exception as e:
-                        st.error(f"Error deleting file: {e}")
\ No newline at end of file
+
+                auto = st.toggle(
+                    "Auto-advance", key=f"auto_advance:{listener}",
+                    help="Moves to the next track when the track's length has passed since it started in this "
+                         "session. It is a server timer: pausing or seeking in the player is not taken into account."
+                )
+                if auto and not loop:
+                    auto_advance(queue, listener)
+
+                upcoming = queue.upcoming()
+                if upcoming:
+                    st.markdown("**Up next**")
+                    for index, path in enumerate(upcoming):
+                        if st.button(track_name(path), key=f"jump:{index}:{path}"):
+                            play(lambda: queue.jump(path))
+            elif queue is not None:
+                st.info("Queue finished. Start a new one above.")
@@ -0,0 +1,97 @@
+import streamlit as st
+import subprocess
+import sys
+import os
+import time
+from collections import Counter
+
+from utils.pipeline import CSV_FILE, OUTPUT_DIR, read_progress, read_rows
+
+st.title("🏭 Batch Pipeline")
+st.markdown("Proses baris `pending` di `n8n.csv`: thumbnail → video → audio → mux, tanpa klik satu per satu.")
+
+# Sidebar Configuration
+st.sidebar.header("Configuration")
+fal_key = st.sidebar.text_input("FAL_KEY", type="password", value=os.environ.get("FAL_KEY", ""))
+
+st.sidebar.header("Concurrency")
+max_rows = st.sidebar.number_input("Rows in parallel", min_value=1, max_value=10, value=2)
+thumbnail_concurrency = st.sidebar.number_input("Imagen4 (thumbnail)", min_value=1, max_value=10, value=2)
+video_concurrency = st.sidebar.number_input("Seedance (video)", min_value=1, max_value=10, value=1)
+audio_concurrency = st.sidebar.number_input("Chatterbox (audio)", min_value=1, max_value=10, value=2)
+limit = st.sidebar.number_input("Max rows (0 = all)", min_value=0, value=0)
+retry_failed = st.sidebar.checkbox("Retry failed rows", value=False)
+
+progress = read_progress()
+
+if st.button("▶️ Start Pipeline", type="primary", disabled=progress["running"]):
+    if not fal_key:
+        st.error("Please provide FAL_KEY in the sidebar.")
+    elif not os.path.exists(CSV_FILE):
+        st.error(f"{CSV_FILE} not found. Generate data first.")
+    else:
+        command = [
+            sys.executable, "-m", "utils.pipeline",
+            "--max-rows", str(max_rows),
+            "--thumbnail-concurrency", str(thumbnail_concurrency),
+            "--video-concurrency", str(video_concurrency),
+            "--audio-concurrency", str(audio_concurrency),
+        ]
+        if limit:
+            command += ["--limit", str(limit)]
+        if retry_failed:
+            command.append("--retry-failed")
+
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        with open(os.path.join(OUTPUT_DIR, "runner.log"), "a") as log_file:
+            subprocess.Popen(
+                command,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                env={**os.environ, "FAL_KEY": fal_key},
+                start_new_session=True
+            )
+        st.success("Pipeline started!")
+        time.sleep(1)
+        st.rerun()
+
+
+@st.fragment(run_every=5)
+def show_progress():
+    progress = read_progress()
+
+    st.subheader("Status")
+    if progress["running"]:
+        st.info("⏳ Pipeline is running...")
+    elif progress.get("finished_at"):
+        st.success("✅ Last run finished.")
+    else:
+        st.write("Pipeline is not running.")
+
+    if progress.get("total") is not None:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total", progress["total"])
+        col2.metric("Done", progress["done"])
+        col3.metric("Failed", progress["failed"])
+        col4.metric("Rows / hour", progress.get("rows_per_hour", 0))
+        if progress.get("skipped"):
+            st.caption(f"{progress['skipped']} row(s) skipped: already claimed by another runner")
+        if progress["total"]:
+            st.progress((progress["done"] + progress["failed"] + progress.get("skipped", 0)) / progress["total"])
+        if progress.get("in_progress"):
+            st.write(f"**In progress:** rows {', '.join(progress['in_progress'])}")
+
+    if os.path.exists(CSV_FILE):
+        _, rows = read_rows(CSV_FILE)
+        counts = Counter((row.get("status") or "pending").strip() for row in rows)
+        st.subheader(f"{CSV_FILE} status")
+        st.write(dict(counts))
+
+    log_path = os.path.join(OUTPUT_DIR, "runner.log")
+    if os.path.exists(log_path):
+        with st.expander("📜 Runner log"):
+            with open(log_path, encoding="utf-8", errors="replace") as f:
+                st.code("".join(f.readlines()[-30:]))
+
+
+show_progress()
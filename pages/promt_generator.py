@@ -1,12 +1,18 @@
 import streamlit as st
-import fal_client
 import os
 import requests
-from openai import OpenAI
 import base64
+import hashlib
+import tempfile
 from io import BytesIO
 import time
 
+from utils.clients import deepseek_chat, fal_subscribe, get_deepseek_client, get_fal_client
+from utils.media import check_ffmpeg, download_to_file, submit_mux
+from utils.media_store import current_session_id, deferred_file, get_media_store
+from utils.rate_limit import wait_notice
+from utils.reference_images import reference_urls
+
 # Page config
 st.set_page_config(page_title="Fal.ai Creative Studio", layout="wide")
 
@@ -54,16 +60,18 @@ st.title("Fal.ai Creative Studio")
 
 # Helper function to save uploaded file to temp
 def save_uploaded_file(uploaded_file):
+    # Nama unik per upload: sesi/replica lain tidak saling menimpa file yang sama
     try:
-        with open(os.path.join("temp_image.jpg"), "wb") as f:
+        suffix = os.path.splitext(uploaded_file.name)[1] or ".jpg"
+        with tempfile.NamedTemporaryFile(prefix="upload_", suffix=suffix, delete=False) as f:
             f.write(uploaded_file.getbuffer())
-        return "temp_image.jpg"
+        return f.name
     except Exception as e:
         return None
 
 # Helper function to upload file to fal
 def upload_to_fal(file_path):
-    url = fal_client.upload_file(file_path)
+    url = get_fal_client(fal_key).upload_file(file_path)
     return url
 
 # Helper function to sanitize filename
@@ -80,6 +88,19 @@ def sanitize_filename(text, max_length=50):
     text = text.rstrip('_')
     return text or "generated"
 
+# Helper function to get local copy of a generated asset
+def get_local_asset(url_key, path_key, filename):
+    """Return local path of generated asset, downloading it if not saved yet"""
+    path = st.session_state.get(path_key)
+    if path and os.path.exists(path):
+        return path
+    url = st.session_state[url_key]
+    path = os.path.join(save_dir, "muxed", "sources", f"{hashlib.sha1(url.encode()).hexdigest()[:12]}_{filename}")
+    if not os.path.exists(path):
+        download_to_file(url, path)
+    st.session_state[path_key] = path
+    return path
+
 # Helper function to save file from URL
 def save_file_from_url(url, filename, subfolder=""):
     """Download and save file from URL to local directory"""
@@ -102,6 +123,46 @@ def save_file_from_url(url, filename, subfolder=""):
         st.warning(f"Could not save file: {e}")
     return None
 
+# System prompt statis (prefix yang di-cache DeepSeek); data per panggilan ada di pesan user
+ENHANCE_SYSTEM_PROMPT = """You are a creative assistant specialized in creating prompts for AI video generation.
+
+IMPORTANT RULES:
+- Keep VISUAL_PROMPT under 100 words
+- Use simple, clear descriptions
+- Avoid complex camera movements
+- Focus on main subject, lighting, and mood
+- Use concrete visual terms, avoid abstract concepts
+- Make AUDIO_SCRIPT longer and more detailed (50-75 words / ~20-30 seconds)
+
+Create two parts:
+1. VISUAL_PROMPT: A concise, clear prompt for video generation (max 100 words). Focus on: main subject, setting, lighting, colors, and overall mood.
+2. AUDIO_SCRIPT: A detailed, engaging voiceover script (50-75 words, ~20-30 seconds). Should be complete narration with intro, body, and conclusion. Include specific details and descriptions that bring the visual to life.
+
+Separate with labels 'VISUAL_PROMPT:' and 'AUDIO_SCRIPT:'.
+
+If the user message starts with a THEME line, follow that theme."""
+
+ENHANCE_THEMES = {
+    "Storytelling": "Storytelling - Simple narrative scene with clear emotional tone. Audio should tell a brief story.",
+    "Mini Investigation": "Investigation - Detective-style scene with mystery atmosphere. Audio should be investigative and curious.",
+    "Did You Know?": "Educational - Clean, bright educational setting. Audio should present an interesting fact clearly.",
+    "Mystery": "Mystery - Dark, intriguing atmosphere with shadows. Audio should be mysterious and captivating.",
+    "Horror": "Horror - Dark, eerie setting with ominous mood. Audio should be suspenseful and chilling.",
+    "Cinematic": "Cinematic - Professional movie-quality scene with dramatic lighting. Audio should be like a powerful movie trailer.",
+}
+
+EXPAND_SYSTEM_PROMPT = """You are a professional scriptwriter for video narrations.
+
+Expand the user's audio script to the requested target length. Create a more detailed, engaging narration that:
+- Maintains the same theme and tone
+- Adds more descriptive details
+- Includes specific examples or imagery
+- Has a clear beginning, middle, and end
+- Is suitable for text-to-speech voiceover
+- Matches the target word count
+
+Provide ONLY the expanded script, no explanations."""
+
 # Prompt Enhancement Section
 st.header("1. Prompt Enhancer (DeepSeek)")
 with st.expander("Enhance your prompt"):
@@ -117,48 +178,27 @@ with st.expander("Enhance your prompt"):
             st.error("Please provide DEEPSEEK_API_KEY in the sidebar.")
         else:
             try:
-                client = OpenAI(api_key=deepseek_key, base_url="https://api.deepseek.com")
-                
-                # System prompt yang lebih fokus dan ringkas
-                system_prompt = """You are a creative assistant specialized in creating prompts for AI video generation.
-
-IMPORTANT RULES:
-- Keep VISUAL_PROMPT under 100 words
-- Use simple, clear descriptions
-- Avoid complex camera movements
-- Focus on main subject, lighting, and mood
-- Use concrete visual terms, avoid abstract concepts
-- Make AUDIO_SCRIPT longer and more detailed (50-75 words / ~20-30 seconds)
-
-Create two parts:
-1. VISUAL_PROMPT: A concise, clear prompt for video generation (max 100 words). Focus on: main subject, setting, lighting, colors, and overall mood.
-2. AUDIO_SCRIPT: A detailed, engaging voiceover script (50-75 words, ~20-30 seconds). Should be complete narration with intro, body, and conclusion. Include specific details and descriptions that bring the visual to life.
-
-Separate with labels 'VISUAL_PROMPT:' and 'AUDIO_SCRIPT:'."""
+                client = get_deepseek_client(deepseek_key)
                 
-                if content_theme == "Storytelling":
-                    system_prompt += "\n\nTHEME: Storytelling - Simple narrative scene with clear emotional tone. Audio should tell a brief story."
-                elif content_theme == "Mini Investigation":
-                    system_prompt += "\n\nTHEME: Investigation - Detective-style scene with mystery atmosphere. Audio should be investigative and curious."
-                elif content_theme == "Did You Know?":
-                    system_prompt += "\n\nTHEME: Educational - Clean, bright educational setting. Audio should present an interesting fact clearly."
-                elif content_theme == "Mystery":
-                    system_prompt += "\n\nTHEME: Mystery - Dark, intriguing atmosphere with shadows. Audio should be mysterious and captivating."
-                elif content_theme == "Horror":
-                    system_prompt += "\n\nTHEME: Horror - Dark, eerie setting with ominous mood. Audio should be suspenseful and chilling."
-                elif content_theme == "Cinematic":
-                    system_prompt += "\n\nTHEME: Cinematic - Professional movie-quality scene with dramatic lighting. Audio should be like a powerful movie trailer."
-
                 with st.spinner("Enhancing prompt..."):
-                    response = client.chat.completions.create(
+                    # Tema dan ide user di pesan user (akhir prompt), system prompt tetap sama
+                    theme = ENHANCE_THEMES.get(content_theme)
+                    user_prompt = f"THEME: {theme}\n\n" if theme else ""
+                    user_prompt += f"Create a video prompt for: {simple_prompt}\n\nIMPORTANT: Keep VISUAL_PROMPT simple and under 100 words!"
+                    rate_status = st.empty()
+                    response = deepseek_chat(
+                        client,
+                        "prompt:enhance",
+                        on_wait=wait_notice(rate_status, "DeepSeek busy"),
                         model="deepseek-chat",
                         messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": f"Create a video prompt for: {simple_prompt}\n\nIMPORTANT: Keep VISUAL_PROMPT simple and under 100 words!"}
+                            {"role": "system", "content": ENHANCE_SYSTEM_PROMPT},
+                            {"role": "user", "content": user_prompt}
                         ],
                         temperature=0.7,
                         max_tokens=500  # Batasi output
                     )
+                    rate_status.empty()
                     full_response = response.choices[0].message.content
                     
                     # Parse response
@@ -201,6 +241,8 @@ with tab1:
         else:
             try:
                 with st.spinner("Generating thumbnail..."):
+                    import fal_client
+
                     def on_queue_update(update):
                         if isinstance(update, fal_client.InProgress):
                             for log in update.logs:
@@ -209,8 +251,11 @@ with tab1:
                     generated_images = []
                     for i in range(num_images):
                         st.write(f"Generating thumbnail {i+1}/{num_images}...")
-                        result = fal_client.subscribe(
+                        rate_status = st.empty()
+                        result = fal_subscribe(
+                            fal_key,
                             "fal-ai/imagen4/preview",
+                            on_wait=wait_notice(rate_status, "fal busy"),
                             arguments={
                                 "prompt": tema,
                                 "aspect_ratio": aspect_ratio
@@ -218,6 +263,7 @@ with tab1:
                             with_logs=True,
                             on_queue_update=on_queue_update,
                         )
+                        rate_status.empty()
                         
                         if result and 'images' in result and len(result['images']) > 0:
                             image_url = result['images'][0]['url']
@@ -266,48 +312,70 @@ with tab2:
             for idx, url in enumerate(selected_image_urls[:4]):
                 with cols[idx]:
                     st.image(url, caption=f"Ref {idx+1}", width=100)
+
+    uploaded_references = st.file_uploader(
+        "Upload Reference Images", type=["png", "jpg", "jpeg", "webp"], accept_multiple_files=True
+    )
     
     # Editable Video Prompt
-    col_dur, col_warn = st.columns([1, 3])
+    col_dur, col_ratio, col_warn = st.columns([1, 1, 2])
     with col_dur:
         durasi = st.number_input("Durasi Video (detik)", min_value=2, max_value=12, value=5, step=1)
+    with col_ratio:
+        # Default sama dengan rasio thumbnail, supaya referensi di-crop ke rasio yang sama
+        video_ratio_options = ["9:16", "16:9", "1:1", "4:3", "3:4", "21:9", "auto"]
+        video_aspect_ratio = st.selectbox(
+            "Video Aspect Ratio", video_ratio_options, index=video_ratio_options.index(aspect_ratio),
+            key="video_aspect_ratio",
+        )
     with col_warn:
         st.info("ℹ️ Seedance API hanya mendukung durasi 2-12 detik")
     
-    default_video_prompt = f"Video rasio 9:16, durasi {durasi} detik. {final_prompt}"
+    default_video_prompt = f"Video rasio {video_aspect_ratio}, durasi {durasi} detik. {final_prompt}"
     video_prompt = st.text_area("Video Prompt:", value=default_video_prompt, height=100)
 
     if st.button("Generate Video"):
         if not fal_key:
             st.error("Please provide FAL_KEY in the sidebar.")
         else:
+            uploaded_paths = []
             try:
                 with st.spinner("Generating video..."):
                     # Build video arguments
                     video_args = {
                         "prompt": video_prompt,
-                        "aspect_ratio": "auto",
+                        "aspect_ratio": video_aspect_ratio,
                         "resolution": "720p",
                         "duration": durasi  # Use user-specified duration
                     }
                     
                     # Add reference images - they are required for Seedance
-                    if selected_image_urls:
-                        video_args["reference_image_urls"] = selected_image_urls
+                    uploaded_paths.extend(path for path in map(save_uploaded_file, uploaded_references or []) if path)
+                    if selected_image_urls or uploaded_paths:
+                        reference_sources = selected_image_urls + uploaded_paths
                     elif 'generated_image_urls' in st.session_state and st.session_state['generated_image_urls']:
                         # Use first generated image as fallback
-                        video_args["reference_image_urls"] = [st.session_state['generated_image_urls'][0]]
+                        reference_sources = [st.session_state['generated_image_urls'][0]]
                         st.warning("⚠️ No images selected. Using first generated thumbnail as reference.")
                     else:
                         st.error("❌ Seedance requires at least one reference image. Please generate thumbnails first!")
                         st.stop()
+
+                    # Perkecil ke resolusi video + JPEG, di-cache per isi file (upload ulang tidak perlu)
+                    video_args["reference_image_urls"] = reference_urls(
+                        reference_sources, upload_to_fal, video_args["resolution"], video_args["aspect_ratio"]
+                    )
                     
-                    result = fal_client.subscribe(
+                    rate_status = st.empty()
+                    result = fal_subscribe(
+                        fal_key,
                         "fal-ai/bytedance/seedance/v1/lite/reference-to-video",
+                        on_wait=wait_notice(rate_status, "fal busy"),
                         arguments=video_args,
                         with_logs=False,
 
                     )
+                    rate_status.empty()
                     
                     if result and 'video' in result:
                         video_url = result['video']['url']
@@ -315,6 +383,7 @@ with tab2:
                         
                         # Store video URL for potential audio combination
                         st.session_state['generated_video_url'] = video_url
+                        st.session_state.pop('generated_video_path', None)
                         
                         # Save locally
                         if auto_save:
@@ -326,20 +395,21 @@ with tab2:
                             )
                             if saved_path:
                                 st.success(f"💾 Video saved: {saved_path}")
+                                st.session_state['generated_video_path'] = saved_path
                         
-                        # Download button
-                        video_content = requests.get(video_url).content
+                        # Download button (bytes disimpan di media store, bukan di memori sesi)
+                        store = get_media_store()
+                        video_key = store.put_url(video_url, current_session_id(), suffix=".mp4")
                         st.download_button(
                             label="Download Video",
-                            data=video_content,
+                            data=store.opener(video_key),
                             file_name="generated_video.mp4",
                             mime="video/mp4"
                         )
                         
                         # Show info if audio is available
                         if 'generated_audio_url' in st.session_state:
-                            st.info("💡 Video dan audio telah di-generate. Untuk menggabungkan audio ke video, Anda bisa menggunakan editor video atau tools seperti FFmpeg.")
-                            st.code(f"ffmpeg -i video.mp4 -i audio.mp3 -c:v copy -c:a aac -shortest output.mp4", language="bash")
+                            st.info("💡 Video dan audio telah di-generate. Gabungkan keduanya di bagian **Combine Video + Audio** di bawah.")
                         
                         st.success("Video generated successfully!")
                     else:
@@ -348,6 +418,13 @@ with tab2:
 
             except Exception as e:
                 st.error(f"Error generating video: {e}")
+            finally:
+                # Upload sementara dihapus juga kalau preprocessing/upload gagal atau st.stop()
+                for path in uploaded_paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
 
 with tab3:
     st.header("Audio Generation (Chatterbox)")
@@ -364,33 +441,23 @@ with tab3:
             else:
                 try:
                     with st.spinner("Expanding audio script..."):
-                        client = OpenAI(api_key=deepseek_key, base_url="https://api.deepseek.com")
+                        client = get_deepseek_client(deepseek_key)
                         target_words = int(target_duration * 2.5)  # ~2.5 words per second
                         
-                        expansion_prompt = f"""Expand this audio script to approximately {target_words} words (~{target_duration} seconds).
-
-Original script:
-{audio_prompt}
-
-Create a more detailed, engaging narration that:
-- Maintains the same theme and tone
-- Adds more descriptive details
-- Includes specific examples or imagery
-- Has a clear beginning, middle, and end
-- Is suitable for text-to-speech voiceover
-- Target length: {target_words} words
-
-Provide ONLY the expanded script, no explanations."""
-                        
-                        response = client.chat.completions.create(
+                        rate_status = st.empty()
+                        response = deepseek_chat(
+                            client,
+                            "prompt:expand",
+                            on_wait=wait_notice(rate_status, "DeepSeek busy"),
                             model="deepseek-chat",
                             messages=[
-                                {"role": "system", "content": "You are a professional scriptwriter for video narrations."},
-                                {"role": "user", "content": expansion_prompt}
+                                {"role": "system", "content": EXPAND_SYSTEM_PROMPT},
+                                {"role": "user", "content": f"Target length: {target_words} words (~{target_duration} seconds).\n\nOriginal script:\n{audio_prompt}"}
                             ],
                             temperature=0.7,
                             max_tokens=500
                         )
+                        rate_status.empty()
                         
                         expanded_script = response.choices[0].message.content.strip()
                         st.session_state['expanded_audio_script'] = expanded_script
@@ -412,14 +479,18 @@ Provide ONLY the expanded script, no explanations."""
             try:
                 with st.spinner("Generating audio..."):
 
-                    result = fal_client.subscribe(
+                    rate_status = st.empty()
+                    result = fal_subscribe(
+                        fal_key,
                         "fal-ai/chatterbox/text-to-speech",
+                        on_wait=wait_notice(rate_status, "fal busy"),
                         arguments={
                             "text": audio_prompt,
                             "voice": "Jennifer" if "Jennifer" in voice else "Rigon"
                         },
                         with_logs=False,
                     )
+                    rate_status.empty()
                     
                     if result and 'audio' in result:
                         audio_url = result['audio']['url']
@@ -427,6 +498,7 @@ Provide ONLY the expanded script, no explanations."""
                         
                         # Store audio URL
                         st.session_state['generated_audio_url'] = audio_url
+                        st.session_state.pop('generated_audio_path', None)
                         
                         # Save locally
                         if auto_save:
@@ -438,12 +510,14 @@ Provide ONLY the expanded script, no explanations."""
                             )
                             if saved_path:
                                 st.success(f"💾 Audio saved: {saved_path}")
+                                st.session_state['generated_audio_path'] = saved_path
                         
-                        # Download button
-                        audio_content = requests.get(audio_url).content
+                        # Download button (bytes disimpan di media store, bukan di memori sesi)
+                        store = get_media_store()
+                        audio_key = store.put_url(audio_url, current_session_id(), suffix=".mp3")
                         st.download_button(
                             label="Download Audio",
-                            data=audio_content,
+                            data=store.opener(audio_key),
                             file_name="generated_audio.mp3",
                             mime="audio/mpeg"
                         )
@@ -454,3 +528,43 @@ Provide ONLY the expanded script, no explanations."""
 
             except Exception as e:
                 st.error(f"Error generating audio: {e}")
+
+# Combine Section
+if 'generated_video_url' in st.session_state and 'generated_audio_url' in st.session_state:
+    st.divider()
+    st.header("Combine Video + Audio (FFmpeg)")
+    st.caption("Video tidak di-encode ulang (stream copy), audio dikonversi ke AAC. Hasil di-cache berdasarkan isi file.")
+
+    if not check_ffmpeg():
+        st.error("⚠️ FFmpeg is not installed or not found in PATH.")
+    elif st.button("🎬 Combine Video + Audio"):
+        try:
+            with st.spinner("Preparing files..."):
+                video_path = get_local_asset('generated_video_url', 'generated_video_path', "video.mp4")
+                audio_path = get_local_asset('generated_audio_url', 'generated_audio_path', "audio.mp3")
+            st.session_state['mux_job'] = submit_mux(video_path, audio_path, os.path.join(save_dir, "muxed"))
+        except Exception as e:
+            st.error(f"Error preparing files: {e}")
+
+    mux_job = st.session_state.get('mux_job')
+    if mux_job is not None and not mux_job.done():
+        @st.fragment(run_every=2)
+        def wait_for_mux():
+            if st.session_state['mux_job'].done():
+                st.rerun()
+            st.info("⏳ Combining video and audio in background...")
+
+        wait_for_mux()
+    elif mux_job is not None:
+        if mux_job.exception() is not None:
+            st.error(f"Error combining video and audio: {mux_job.exception()}")
+        else:
+            muxed_path = mux_job.result()
+            st.video(muxed_path)
+            st.caption(f"💾 Saved: {muxed_path}")
+            st.download_button(
+                label="Download Combined Video",
+                data=deferred_file(muxed_path),
+                file_name="generated_video_with_audio.mp4",
+                mime="video/mp4"
+            )
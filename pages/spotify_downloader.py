@@ -1,33 +1,13 @@
 import streamlit as st
-import subprocess
-import shutil
 import os
-import glob
 
-def check_ffmpeg():
-    """Check if ffmpeg is installed and available in PATH.
-    Also checks local directories and updates PATH if found.
-    """
-    # Check if ffmpeg is already in PATH
-    if shutil.which("ffmpeg"):
-        return True
-        
-    # Check local directories
-    current_dir = os.getcwd()
-    possible_paths = [
-        os.path.join(current_dir, "ffmpeg.exe"),
-        os.path.join(current_dir, ".spotdl", "ffmpeg.exe"),
-        os.path.join(os.path.expanduser("~"), ".spotdl", "ffmpeg.exe"),
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            # Add directory to PATH
-            ffmpeg_dir = os.path.dirname(path)
-            os.environ["PATH"] += os.pathsep + ffmpeg_dir
-            return True
-            
-    return False
+from utils.dedup import submit_dedup
+from utils.log_stream import OutputStreamer, recent_logs, tail_file
+from utils.media import check_ffmpeg
+from utils.media_store import deferred_file
+from utils.spotdl_worker import warm_up
+from utils.spotify import DOWNLOAD_DIR, latest_download, run_spotdl
+from utils.transcode import prewarm_recent
 
 st.title("Spotify Downloader")
 
@@ -35,56 +15,44 @@ if not check_ffmpeg():
     st.error("⚠️ FFmpeg is not installed or not found in PATH. Please install FFmpeg to use this downloader.")
     st.info("You can download FFmpeg from [ffmpeg.org](https://ffmpeg.org/download.html) or install it using a package manager (e.g., `winget install ffmpeg`).")
 else:
+    # Load spotdl di worker selagi user mengisi URL
+    warm_up()
+
     st.write("Enter a Spotify URL (Song, Album, or Playlist) to download.")
 
     spotify_url = st.text_input("Spotify URL", placeholder="https://open.spotify.com/track/...")
+    refresh_matches = st.checkbox(
+        "Re-resolve tracks",
+        help="Matches are cached per URL so re-runs and retries skip the Spotify/YouTube lookup. Tick this if the playlist changed."
+    )
 
     if st.button("Download"):
         if spotify_url:
             try:
                 with st.spinner("Downloading... This may take a while depending on the playlist size."):
-                    # Create a downloads directory if it doesn't exist
-                    download_dir = "downloads"
-                    os.makedirs(download_dir, exist_ok=True)
-
-                    # Run spotdl command
-                    # We run it in the downloads directory so files are saved there
-                    command = ["spotdl", spotify_url]
-                    
-                    process = subprocess.Popen(
-                        command,
-                        cwd=download_dir,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True
-                    )
-                    
-                    # Stream output to UI
+                    # Stream output to UI: 10 baris terakhir, di-render maksimal 2x per detik;
+                    # log lengkap disimpan ke file
                     output_container = st.empty()
-                    logs = []
-                    
-                    while True:
-                        output = process.stdout.readline()
-                        if output == '' and process.poll() is not None:
-                            break
-                        if output:
-                            logs.append(output.strip())
-                            # Update the last few lines of logs
-                            output_container.code("\n".join(logs[-10:]))
-                            
-                    rc = process.poll()
-                    
+                    with OutputStreamer(output_container.code, prefix="spotdl") as show_output:
+                        rc = run_spotdl(spotify_url, DOWNLOAD_DIR, on_output=show_output, refresh=refresh_matches)
+                    st.caption(f"{show_output.line_count} log lines · full log: {show_output.log_path}")
+
                     if rc == 0:
                         st.success("Download completed successfully!")
-                        
+
+                        # Siapkan varian streaming untuk lagu baru di background
+                        prewarm_recent(DOWNLOAD_DIR)
+                        # Playlist yang overlap sering menghasilkan lagu duplikat: hash lagu baru
+                        # dan laporkan saja; hardlink/remove hanya lewat expander Duplicates
+                        submit_dedup(DOWNLOAD_DIR, policy="report")
+
                         # Find the most recently created mp3 file
-                        list_of_files = glob.glob(os.path.join(download_dir, '*.mp3'))
-                        if list_of_files:
-                            latest_file = max(list_of_files, key=os.path.getctime)
+                        latest_file = latest_download(DOWNLOAD_DIR)
+                        if latest_file:
                             file_name = os.path.splitext(os.path.basename(latest_file))[0]
-                            
+
                             st.audio(latest_file, format="audio/mp3")
-                            
+
                             with open(latest_file, "rb") as f:
                                 st.download_button(
                                     label=f"Download {file_name}",
@@ -99,3 +67,16 @@ else:
                 st.error(f"An unexpected error occurred: {e}")
         else:
             st.warning("Please enter a Spotify URL.")
+
+    # Log download sebelumnya
+    previous_logs = recent_logs("spotdl")
+    if previous_logs:
+        with st.expander("📜 Previous download logs"):
+            log_path = st.selectbox("Log", previous_logs, format_func=os.path.basename)
+            st.code(tail_file(log_path, lines=200))
+            st.download_button(
+                label="Download full log",
+                data=deferred_file(log_path),
+                file_name=os.path.basename(log_path),
+                mime="text/plain",
+            )
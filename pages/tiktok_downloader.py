@@ -1,8 +1,10 @@
 import streamlit as st
-import requests
 import json
 from urllib.parse import urlparse
 
+from utils.media_store import current_session_id, get_media_store
+from utils.tiktok import download_tiktok_video, video_file_name
+
 # Page Config
 st.set_page_config(page_title="TikTok Downloader - No Watermark", layout="wide", page_icon="🎵")
 
@@ -33,104 +35,13 @@ with col2:
     5. Download your video!
     """)
 
-# Function to extract video ID from TikTok URL
-def extract_video_id(url):
-    """Extract video ID from TikTok URL"""
-    try:
-        # Handle different TikTok URL formats
-        if "vm.tiktok.com" in url or "vt.tiktok.com" in url:
-            return url
-        elif "/video/" in url:
-            return url
-        else:
-            return url
-    except:
-        return None
-
-# Function to download TikTok video without watermark
-def download_tiktok_video(url):
-    """Download TikTok video without watermark using API"""
-    try:
-        # Using TikTok scraper API (free service)
-        api_url = "https://tiktok-video-no-watermark2.p.rapidapi.com/"
-        
-        # Alternative free API endpoints
-        alternatives = [
-            "https://www.tikwm.com/api/",
-            "https://api.tiklydown.eu.org/api/download"
-        ]
-        
-        # Try the first free API (tikwm.com)
-        try:
-            response = requests.post(
-                alternatives[0],
-                data={
-                    "url": url,
-                    "hd": 1
-                },
-                headers={
-                    "Content-Type": "application/x-www-form-urlencoded"
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("code") == 0:
-                    return {
-                        "success": True,
-                        "video_url": data["data"]["play"],
-                        "cover": data["data"]["cover"],
-                        "title": data["data"]["title"],
-                        "author": data["data"]["author"]["unique_id"],
-                        "duration": data["data"]["duration"],
-                        "download_url": data["data"]["hdplay"] if "hdplay" in data["data"] else data["data"]["play"]
-                    }
-        except Exception as e:
-            st.warning(f"Primary API failed, trying alternative...")
-        
-        # Try second alternative API
-        try:
-            response = requests.get(
-                alternatives[1],
-                params={"url": url},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("status") == "success":
-                    video_data = data.get("video", {})
-                    return {
-                        "success": True,
-                        "video_url": video_data.get("noWatermark"),
-                        "cover": data.get("cover"),
-                        "title": data.get("title", "TikTok Video"),
-                        "author": data.get("author", {}).get("username", "Unknown"),
-                        "duration": data.get("duration", 0),
-                        "download_url": video_data.get("noWatermark")
-                    }
-        except Exception as e:
-            pass
-        
-        return {
-            "success": False,
-            "error": "All API endpoints failed. Please try again later."
-        }
-        
-    except Exception as e:
-        return {
-            "success": False,
-            "error": f"Error: {str(e)}"
-        }
-
 # Main download logic
 if download_button and tiktok_url:
     if not tiktok_url.strip():
         st.error("❌ Please enter a valid TikTok URL!")
     else:
         with st.spinner("🔄 Processing your request... Please wait..."):
-            result = download_tiktok_video(tiktok_url)
+            result = download_tiktok_video(tiktok_url, on_warning=st.warning)
             
             if result["success"]:
                 st.success("✅ Video processed successfully!")
@@ -147,6 +58,9 @@ if download_button and tiktok_url:
                 
                 with info_col2:
                     st.markdown(f"**⏱️ Duration:** {result['duration']} seconds")
+                    if result.get("variant"):
+                        size = f" · {result['download_size'] / 1024 ** 2:.1f} MB" if result.get("download_size") else ""
+                        st.markdown(f"**🎞️ Quality:** {result['variant']}{size}")
                 
                 # Display video preview
                 st.markdown("### 🎬 Video Preview")
@@ -165,18 +79,20 @@ if download_button and tiktok_url:
                 st.markdown("### 💾 Download")
                 
                 try:
-                    video_response = requests.get(result["download_url"], timeout=30)
-                    if video_response.status_code == 200:
-                        st.download_button(
-                            label="⬇️ Download Video (No Watermark)",
-                            data=video_response.content,
-                            file_name=f"tiktok_{result['author']}_{result['duration']}s.mp4",
-                            mime="video/mp4",
-                            use_container_width=True,
-                            type="primary"
-                        )
-                    else:
-                        st.error("Failed to fetch video for download. Please try the video player above.")
+                    # Video disimpan di media store (disk), bukan di memori sesi
+                    store = get_media_store()
+                    video_key = store.put_url(
+                        result["download_url"], current_session_id(), suffix=".mp4",
+                        probe=result.get("download_probe")
+                    )
+                    st.download_button(
+                        label="⬇️ Download Video (No Watermark)",
+                        data=store.opener(video_key),
+                        file_name=video_file_name(result, tiktok_url),
+                        mime="video/mp4",
+                        use_container_width=True,
+                        type="primary"
+                    )
                 except Exception as e:
                     st.warning("⚠️ Direct download failed. You can right-click the video above and select 'Save video as...'")
                     st.markdown(f"**Direct Link:** [Click here to download]({result['download_url']})")
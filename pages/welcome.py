@@ -23,4 +23,42 @@ with st.expander("About Tools"):
     st.write("")
     st.title("Music Player")
     st.write("Tools yang digunakan untuk memutar lagu dari file mp3 yang diunduh dari Spotify")
-    
\ No newline at end of file
+
+with st.expander("📦 Media Store"):
+    from utils.media_store import get_media_store
+
+    metrics = get_media_store().metrics()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Stored", f"{metrics['bytes_stored'] / 1024 ** 2:.1f} MB")
+    col2.metric("Budget", f"{metrics['max_bytes'] / 1024 ** 2:.0f} MB")
+    col3.metric("Hit rate", f"{metrics['hit_rate']:.0%}" if metrics["hit_rate"] is not None else "-")
+    col4.metric("Evicted", f"{metrics['bytes_evicted'] / 1024 ** 2:.1f} MB")
+    st.json(metrics)
+
+with st.expander("🧠 DeepSeek Prompt Cache"):
+    from utils.clients import DEEPSEEK_USAGE_LOG, usage_summary
+
+    summary = usage_summary()
+    if summary:
+        hit = sum(totals["cache_hit_tokens"] for totals in summary.values())
+        miss = sum(totals["cache_miss_tokens"] for totals in summary.values())
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Cache hit tokens", f"{hit:,}")
+        col2.metric("Cache miss tokens", f"{miss:,}")
+        col3.metric("Hit rate", f"{hit / (hit + miss):.0%}" if hit + miss else "-")
+        st.json(summary)
+    else:
+        st.caption("Belum ada panggilan DeepSeek di proses ini.")
+    st.caption(f"Log per panggilan: {DEEPSEEK_USAGE_LOG}")
+
+with st.expander("🚦 API Rate Limits"):
+    from utils.rate_limit import all_limiters
+
+    limiters = all_limiters()
+    if limiters:
+        st.dataframe(
+            [{"limiter": key, **snapshot} for key, snapshot in limiters.items()],
+            hide_index=True,
+        )
+    else:
+        st.caption("Belum ada panggilan API di proses ini.")
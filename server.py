@@ -0,0 +1,13 @@
+"""Entry point dengan route HTTP tambahan di samping app Streamlit.
+
+Jalankan:
+    streamlit run server.py
+
+Sama seperti `streamlit run app.py`, plus:
+    GET /exports/<token>   ZIP lagu yang di-stream dari disk (utils.zip_export)
+"""
+import streamlit as st
+
+from utils.zip_export import export_routes
+
+app = st.App("app.py", routes=export_routes())
@@ -0,0 +1 @@
+"""Helper bersama untuk halaman-halaman OxidiLily Tools."""
@@ -0,0 +1,285 @@
+"""Analisis audio di background: durasi, bitrate, loudness (EBU R128) dan ReplayGain.
+
+Lagu baru di library dianalisis di background (satu proses ffmpeg per core):
+durasi/bitrate dari header MP3 (`mp3_info`), integrated loudness dan true
+peak dari filter `ebur128` FFmpeg. Hasil disimpan di
+downloads/.analysis/index.json per path + ukuran + mtime, jadi setiap file
+hanya dianalisis sekali. Halaman hanya membaca cache (`get_analysis`),
+tidak pernah menganalisis di jalur request.
+
+Gain normalisasi (`playback_gain`) dipakai utils.transcode saat membuat
+varian streaming: loudness disamakan ke LOUDNESS_TARGET_LUFS tanpa membuat
+true peak lewat dari -1 dBTP.
+
+Contoh:
+    python -m utils.audio_analysis --download-dir downloads
+    python -m utils.audio_analysis --show "downloads/Artist - Title.mp3"
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.media import check_ffmpeg
+from utils.mp3 import mp3_info
+from utils.shared_state import file_lock_name, get_state, shared_lock, unique_tmp_path
+from utils.transcode import DOWNLOADS_DIR
+
+ANALYSIS_DIR_NAME = ".analysis"
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "0")) or os.cpu_count() or 1
+LOUDNESS_TARGET_LUFS = float(os.environ.get("LOUDNESS_TARGET_LUFS", "-14"))
+REPLAYGAIN_REFERENCE_LUFS = -18.0  # ReplayGain 2.0
+MAX_TRUE_PEAK = -1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def analyze_file(path):
+    """Analisis satu file (dijalankan di worker pool). Returns dict hasil."""
+    result = {"duration": None, "bitrate": None, "loudness": None, "peak": None, "replaygain": None}
+    info = mp3_info(path)
+    if info:
+        result["duration"] = round(info["duration"], 3)
+        result["bitrate"] = info["bitrate"]
+    if check_ffmpeg():
+        result.update(measure_loudness(path))
+    return result
+
+
+def measure_loudness(path):
+    """Integrated loudness (LUFS) dan true peak (dBTP) lewat filter ebur128 FFmpeg"""
+    command = [
+        "ffmpeg", "-hide_banner", "-nostats", "-threads", "1",
+        "-i", path, "-map", "0:a:0",
+        "-af", "ebur128=peak=true:framelog=verbose",
+        "-f", "null", "-",
+    ]
+    completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        return {}
+    loudness = re.findall(r"I:\s+(-?[\d.]+) LUFS", completed.stderr)
+    peak = re.findall(r"Peak:\s+(-?[\d.]+|-inf) dBFS", completed.stderr)
+    if not loudness:
+        return {}
+    result = {"loudness": float(loudness[-1])}
+    result["replaygain"] = round(REPLAYGAIN_REFERENCE_LUFS - result["loudness"], 2)
+    if peak and peak[-1] != "-inf":
+        result["peak"] = float(peak[-1])
+    return result
+
+
+def _get_executor():
+    """Pool dibuat saat pertama dipakai.
+
+    Thread, bukan ProcessPoolExecutor: kerja beratnya di proses ffmpeg (satu per
+    worker, jadi tetap paralel di semua core), dan worker spawn akan menjalankan
+    ulang script halaman karena Streamlit mengganti modul __main__.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="audio_analysis")
+        return _executor
+
+
+class AnalysisCache:
+    """Hasil analisis per file di satu library, disimpan di downloads/.analysis/index.json
+
+    Index ada di volume bersama: setiap file dianalisis oleh satu replica saja
+    (lock per file), dan index disimpan di bawah lock file lalu digabung dengan
+    isi di disk, jadi hasil replica lain tidak tertimpa.
+    """
+
+    def __init__(self, download_dir=DOWNLOADS_DIR):
+        self.download_dir = download_dir
+        self.path = os.path.join(download_dir, ANALYSIS_DIR_NAME, "index.json")
+        self.entries = {}  # path relatif -> {"size", "mtime", "duration", "bitrate", "loudness", "peak", ...}
+        self.inflight = {}  # path relatif -> Future
+        self.lock = threading.Lock()
+        self._disk_mtime = None
+        self.refresh()
+
+    def key(self, path):
+        return os.path.relpath(path, self.download_dir)
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("entries", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def refresh(self):
+        """Gabungkan entry yang ditulis replica lain (hanya kalau index.json berubah)"""
+        try:
+            disk_mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if disk_mtime == self._disk_mtime:
+            return
+        entries = self._read()
+        with self.lock:
+            self._disk_mtime = disk_mtime
+            self.entries.update(entries)
+
+    def record(self, key, entry):
+        """Simpan satu hasil: digabung dengan index di disk di bawah lock file bersama.
+
+        Isi disk yang jadi dasar (bukan salinan di memori), supaya hasil yang lebih
+        baru dari replica lain tidak ditimpa entry lama di memori proses ini.
+        """
+        with shared_lock(file_lock_name(self.path), ttl=30):
+            entries = self._read()
+            with self.lock:
+                entries[key] = entry
+                self.entries = entries
+                data = json.dumps({"entries": entries})
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = unique_tmp_path(self.path)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+            self._disk_mtime = os.stat(self.path).st_mtime_ns
+
+    def get(self, path):
+        """Hasil analisis kalau sudah ada dan file belum berubah, selain itu None (tanpa menganalisis)"""
+        entry = self.entries.get(self.key(path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+            self.submit([path], force=True)
+            return None
+        return entry
+
+    def submit(self, paths, force=False):
+        """Antrekan file yang belum dianalisis ke worker pool. Returns jumlah yang diantrekan."""
+        self.refresh()
+        queued = 0
+        with self.lock:
+            for path in paths:
+                key = self.key(path)
+                if key in self.inflight or (key in self.entries and not force):
+                    continue
+                future = _get_executor().submit(self._analyze, key, path, force)
+                self.inflight[key] = future
+                future.add_done_callback(lambda f, key=key: self._done(key))
+                queued += 1
+        return queued
+
+    def _analyze(self, key, path, force):
+        """Dijalankan di worker: analisis satu file kecuali replica lain sedang/sudah menganalisisnya"""
+        lease = get_state().try_lock(f"analysis:{os.path.abspath(path)}", ttl=120)
+        if lease is None:
+            return
+        with lease.keepalive():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return
+            self.refresh()
+            entry = self.entries.get(key)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime and not force:
+                return
+            try:
+                result = analyze_file(path)
+            except Exception as e:
+                # Dicatat juga, supaya file rusak tidak diantrekan ulang setiap rerun
+                result = {"error": str(e)}
+            self.record(key, {"size": stat.st_size, "mtime": stat.st_mtime, **result})
+
+    def _done(self, key):
+        with self.lock:
+            self.inflight.pop(key, None)
+
+    def progress(self, tracks):
+        """(sudah dianalisis, total, sedang diantrekan) untuk daftar lagu"""
+        with self.lock:
+            done = sum(1 for path in tracks if self.key(path) in self.entries)
+            return done, len(tracks), len(self.inflight)
+
+
+def get_cache(download_dir=DOWNLOADS_DIR):
+    """Cache analisis bersama untuk satu proses"""
+    with _caches_lock:
+        cache = _caches.get(download_dir)
+        if cache is None:
+            cache = _caches[download_dir] = AnalysisCache(download_dir)
+        return cache
+
+
+def submit_analysis(tracks, download_dir=DOWNLOADS_DIR):
+    """Analisis lagu yang belum ada di cache di background. Returns jumlah yang diantrekan."""
+    return get_cache(download_dir).submit(tracks)
+
+
+def get_analysis(path, download_dir=DOWNLOADS_DIR):
+    return get_cache(download_dir).get(path)
+
+
+def playback_gain(path, download_dir=DOWNLOADS_DIR, target=LOUDNESS_TARGET_LUFS):
+    """Gain (dB) untuk menyamakan loudness ke target, dibatasi true peak. None kalau belum dianalisis."""
+    entry = get_analysis(path, download_dir)
+    if not entry or entry.get("loudness") is None or entry["loudness"] <= -70:
+        return None
+    gain = target - entry["loudness"]
+    if entry.get("peak") is not None:
+        gain = min(gain, MAX_TRUE_PEAK - entry["peak"])
+    # Dibulatkan supaya varian transcode tidak berubah karena selisih kecil
+    return round(gain * 2) / 2
+
+
+def describe(entry):
+    """Ringkasan untuk UI: '3:45 · 320 kbps · -9.8 LUFS'"""
+    if entry.get("error"):
+        return "analysis failed"
+    parts = []
+    if entry.get("duration"):
+        seconds = int(entry["duration"])
+        parts.append(f"{seconds // 60}:{seconds % 60:02d}")
+    if entry.get("bitrate"):
+        parts.append(f"{entry['bitrate'] // 1000} kbps")
+    if entry.get("loudness") is not None:
+        parts.append(f"{entry['loudness']:.1f} LUFS")
+    return " · ".join(parts)
+
+
+def main():
+    from utils.playlist import list_tracks
+
+    parser = argparse.ArgumentParser(description="Analyze duration, bitrate and loudness of the music library")
+    parser.add_argument("--download-dir", default=DOWNLOADS_DIR)
+    parser.add_argument("--show", help="Print the cached analysis of one file")
+    args = parser.parse_args()
+
+    cache = AnalysisCache(args.download_dir)
+    if args.show:
+        print(json.dumps(cache.get(args.show), indent=2))
+        return
+
+    tracks = [path for path in list_tracks(args.download_dir) if cache.key(path) not in cache.entries]
+    print(f"Analyzing {len(tracks)} files with {ANALYSIS_WORKERS} workers", flush=True)
+    started = time.perf_counter()
+    executor = _get_executor()
+    futures = {executor.submit(cache._analyze, cache.key(path), path, False): path for path in tracks}
+    for i, future in enumerate(as_completed(futures), 1):
+        future.result()
+        key = cache.key(futures[future])
+        entry = cache.entries.get(key)
+        print(f"[{i}/{len(tracks)}] {describe(entry) if entry else 'skipped (locked by another replica)'}  {key}",
+              flush=True)
+    print(f"Done in {time.perf_counter() - started:.1f}s ({cache.path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""Change feed untuk n8n.csv: log JSONL baris yang ditambah/diubah.
+
+Setiap penulis n8n.csv (halaman Data Generator, pipeline) mencatat baris yang
+berubah ke generated_files/feeds/<nama csv>.changes.jsonl. Baris pertama file
+adalah header generasi, setelah itu satu entry per baris. Offset tiap entry
+adalah posisi byte entry itu di file, jadi selalu naik dalam satu generasi dan
+pembaca bisa langsung seek tanpa parse ulang seluruh CSV:
+
+    {"generation": 3, "created": ...}
+    {"offset": 41, "op": "append", "time": ..., "row_number": "1", "row": {...}}
+
+op: "append" (baris baru), "update" (isi/status berubah), "replace" (CSV
+diganti lewat upload; semua baris dikirim ulang). Pembaca cukup upsert per
+row_number dan menyimpan `generation` + `next_offset` untuk request berikutnya.
+
+Feed tidak tumbuh tanpa batas: "replace" memulai generasi baru yang hanya
+berisi baris hasil upload, dan feed yang lewat CHANGE_FEED_MAX_BYTES
+dipadatkan (entry terakhir per row_number) ke generasi baru. Pembaca dengan
+generasi lama mendapat `resync: true` dan entry dari awal generasi baru:
+buang salinan lokal lalu bangun ulang dari entry tersebut.
+
+n8n bisa mengambil perubahan lewat HTTP (`--serve`, GET /changes?since=N&generation=G)
+atau menerima push ke webhook kalau CHANGE_FEED_WEBHOOK diisi. Push gagal
+tidak apa-apa: pembaca tetap bisa menyusul dari offset terakhirnya. Endpoint
+HTTP berisi baris CSV lengkap (termasuk prompt): default hanya 127.0.0.1,
+dan kalau CHANGE_FEED_TOKEN diisi setiap request butuh
+`Authorization: Bearer <token>`.
+
+Contoh:
+    python -m utils.change_feed --since 0
+    python -m utils.change_feed --serve --port 8502
+    CHANGE_FEED_TOKEN=... python -m utils.change_feed --serve --host 0.0.0.0
+"""
+import argparse
+import hmac
+import ipaddress
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from utils.shared_state import file_lock_name, shared_lock, unique_tmp_path
+
+FEED_DIR = os.environ.get("CHANGE_FEED_DIR", os.path.join("generated_files", "feeds"))
+CHANGE_FEED_WEBHOOK = os.environ.get("CHANGE_FEED_WEBHOOK", "")
+CHANGE_FEED_TOKEN = os.environ.get("CHANGE_FEED_TOKEN", "")
+CHANGE_FEED_MAX_BYTES = int(os.environ.get("CHANGE_FEED_MAX_BYTES", str(64 * 1024 ** 2)))
+WEBHOOK_TIMEOUT = 10
+DEFAULT_LIMIT = 500
+OPS = ["append", "update", "replace"]
+
+# Satu worker supaya push ke webhook tetap berurutan sesuai offset
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feed-webhook")
+
+
+def feed_path(csv_file, feed_dir=None):
+    return os.path.join(feed_dir or FEED_DIR, f"{os.path.basename(csv_file)}.changes.jsonl")
+
+
+def record_changes(csv_file, op, rows, feed_dir=None):
+    """Tambahkan `rows` (list dict per baris CSV) ke feed. Returns entry yang ditulis.
+
+    Dipanggil setelah CSV ditulis, masih di dalam lock CSV, supaya urutan
+    feed sama dengan urutan perubahan di file. "replace" memulai generasi baru.
+    """
+    if op not in OPS:
+        raise ValueError(f"Unknown change op: {op}")
+    if not rows:
+        return []
+    path = feed_path(csv_file, feed_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    now = time.time()
+    with shared_lock(file_lock_name(path)):
+        generation, _ = _read_header(path)
+        if op == "replace":
+            # Isi lama tidak relevan lagi setelah CSV diganti: mulai generasi baru
+            generation = 0 if generation is None else generation + 1
+            entries, offset = _rewrite(path, generation, [
+                {"op": op, "time": now, "row_number": _row_number(row), "row": row} for row in rows
+            ])
+        else:
+            if generation is None:
+                generation = 0
+                _rewrite(path, generation, [])
+            entries, offset = _append(path, op, rows, now)
+            if offset > CHANGE_FEED_MAX_BYTES:
+                # Penerima webhook sudah punya semua baris ini, jadi cukup lanjut dari generasi baru
+                generation, offset = compact(path)
+    if CHANGE_FEED_WEBHOOK:
+        _executor.submit(push_webhook, CHANGE_FEED_WEBHOOK, os.path.basename(csv_file), entries, offset, generation)
+    return entries
+
+
+def _encode(entry):
+    return (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def _read_header(path):
+    """(generasi, panjang header dalam bytes), (None, 0) kalau feed belum ada.
+
+    Feed lama tanpa header dianggap generasi 0.
+    """
+    try:
+        with open(path, "rb") as f:
+            line = f.readline()
+    except FileNotFoundError:
+        return None, 0
+    try:
+        header = json.loads(line)
+    except json.JSONDecodeError:
+        return 0, 0
+    if "generation" in header and "op" not in header:
+        return header["generation"], len(line)
+    return 0, 0
+
+
+def _append(path, op, rows, now):
+    with open(path, "ab") as f:
+        offset = f.seek(0, os.SEEK_END)
+        lines, entries = [], []
+        for row in rows:
+            entry = {"offset": offset, "op": op, "time": now, "row_number": _row_number(row), "row": row}
+            line = _encode(entry)
+            offset += len(line)
+            entries.append(entry)
+            lines.append(line)
+        f.write(b"".join(lines))
+    return entries, offset
+
+
+def _rewrite(path, generation, entries):
+    """Tulis feed baru (header + entries, offset dihitung ulang) secara atomic. Returns (entries, ukuran)."""
+    header = _encode({"generation": generation, "created": time.time()})
+    offset = len(header)
+    lines = [header]
+    for entry in entries:
+        line = _encode({"offset": offset, **{k: v for k, v in entry.items() if k != "offset"}})
+        offset += len(line)
+        lines.append(line)
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(lines))
+    os.replace(tmp_path, path)
+    return [json.loads(line) for line in lines[1:]], offset
+
+
+def compact(path):
+    """Padatkan feed ke generasi baru: hanya entry terakhir per row_number. Panggil di dalam lock feed.
+
+    Returns (generasi baru, ukuran feed).
+    """
+    generation, header_size = _read_header(path)
+    latest = {}
+    with open(path, "rb") as f:
+        f.seek(header_size)
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            key = entry.get("row_number")
+            latest[key if key is not None else ("offset", entry["offset"])] = entry
+    entries = sorted(latest.values(), key=lambda entry: entry["offset"])
+    _, size = _rewrite(path, (generation or 0) + 1, entries)
+    return (generation or 0) + 1, size
+
+
+def _row_number(row):
+    value = row.get("row_number")
+    if value is None or value == "":
+        value = row.get("index")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return None if value is None else str(value)
+
+
+def read_changes(csv_file, since=0, limit=DEFAULT_LIMIT, feed_dir=None, generation=None):
+    """Entry sejak offset `since`. Returns (entries, next_offset, generation feed).
+
+    Kalau `generation` pembaca bukan generasi feed saat ini (feed diganti/dipadatkan),
+    atau offset di luar file, entry dibaca dari awal generasi saat ini: pembaca harus
+    resync (lihat docstring modul).
+    """
+    path = feed_path(csv_file, feed_dir)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return [], 0, None
+    entries = []
+    with f:
+        # Header dibaca dari file yang sama yang sedang dibuka (feed diganti lewat os.replace)
+        line = f.readline()
+        try:
+            header = json.loads(line)
+        except json.JSONDecodeError:
+            header = {}
+        if "generation" in header and "op" not in header:
+            current, header_size = header["generation"], len(line)
+        else:
+            current, header_size = 0, 0
+        size = f.seek(0, os.SEEK_END)
+        stale = generation is not None and generation != current
+        next_offset = since if not stale and header_size <= since <= size else header_size
+        f.seek(next_offset)
+        while limit is None or len(entries) < limit:
+            line = f.readline()
+            # Baris terakhir yang belum selesai ditulis dibaca di request berikutnya
+            if not line.endswith(b"\n"):
+                break
+            next_offset += len(line)
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return entries, next_offset, current
+
+
+def feed_position(csv_file, feed_dir=None):
+    """(generasi, offset akhir) feed saat ini, untuk pembaca yang baru sinkron dari CSV penuh.
+
+    Diambil di dalam lock feed supaya offset tidak jatuh di tengah entry yang sedang ditulis.
+    """
+    path = feed_path(csv_file, feed_dir)
+    with shared_lock(file_lock_name(path)):
+        generation, header_size = _read_header(path)
+        if generation is None:
+            return None, 0
+        return generation, max(os.path.getsize(path), header_size)
+
+
+def df_rows(df):
+    """DataFrame -> list dict yang aman untuk JSON (NaN jadi null, tipe numpy jadi Python)"""
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+def push_webhook(url, csv_name, entries, next_offset, generation=None):
+    try:
+        response = requests.post(
+            url,
+            json={"csv": csv_name, "changes": entries, "next_offset": next_offset, "generation": generation},
+            timeout=WEBHOOK_TIMEOUT,
+        )
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        print(f"Change feed webhook failed ({url}): {e}", flush=True)
+        return False
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """GET /changes?since=<offset>&generation=<g>&limit=<n>&csv=<nama csv>"""
+
+    csv_file = "n8n.csv"
+    feed_dir = None
+    token = ""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if self.token and not hmac.compare_digest(
+            self.headers.get("Authorization", ""), f"Bearer {self.token}"
+        ):
+            return self.send_json({"error": "unauthorized"}, status=401)
+        if url.path != "/changes":
+            return self.send_json({"error": "not found"}, status=404)
+        query = parse_qs(url.query)
+        try:
+            since = int(query.get("since", ["0"])[0])
+            limit = int(query.get("limit", [str(DEFAULT_LIMIT)])[0])
+            generation = int(query["generation"][0]) if query.get("generation") else None
+        except ValueError:
+            return self.send_json({"error": "since, generation and limit must be integers"}, status=400)
+        csv_file = os.path.basename(query.get("csv", [self.csv_file])[0])
+        entries, next_offset, current = read_changes(csv_file, since, limit, self.feed_dir, generation)
+        self.send_json({
+            "csv": csv_file,
+            "changes": entries,
+            "next_offset": next_offset,
+            "generation": current,
+            "resync": (generation is not None and generation != current) or next_offset < since,
+        })
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def serve(host="127.0.0.1", port=8502, csv_file="n8n.csv", feed_dir=None, token=CHANGE_FEED_TOKEN):
+    """Server HTTP feed. Di luar loopback wajib pakai token (feed berisi baris CSV lengkap)."""
+    if not token and not is_loopback(host):
+        raise ValueError(f"Refusing to serve the change feed on {host} without CHANGE_FEED_TOKEN")
+    FeedHandler.csv_file = csv_file
+    FeedHandler.feed_dir = feed_dir
+    FeedHandler.token = token
+    server = ThreadingHTTPServer((host, port), FeedHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the n8n.csv change feed")
+    parser.add_argument("--csv", default="n8n.csv")
+    parser.add_argument("--feed-dir", default=FEED_DIR)
+    parser.add_argument("--since", type=int, default=0, help="Byte offset from the previous next_offset")
+    parser.add_argument("--generation", type=int, help="Generation from the previous response")
+    parser.add_argument("--compact", action="store_true", help="Compact the feed into a new generation")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--serve", action="store_true", help="Serve GET /changes over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Other hosts require CHANGE_FEED_TOKEN")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    if args.compact:
+        path = feed_path(args.csv, args.feed_dir)
+        with shared_lock(file_lock_name(path)):
+            generation, size = compact(path)
+        print(f"Compacted {path} to generation {generation} ({size} bytes)")
+        return
+
+    if args.serve:
+        try:
+            server = serve(args.host, args.port, args.csv, args.feed_dir)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Change feed for {args.csv} at http://{args.host}:{args.port}/changes?since=0", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    entries, next_offset, generation = read_changes(args.csv, args.since, args.limit, args.feed_dir, args.generation)
+    print(json.dumps({
+        "changes": entries,
+        "next_offset": next_offset,
+        "generation": generation,
+        "resync": (args.generation is not None and args.generation != generation) or next_offset < args.since,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Client API yang di-cache per proses, satu instance per API key.
+
+Modul berat (openai, fal_client) baru di-import saat client pertama dibuat,
+jadi halaman yang belum memanggil API tidak ikut membayar biaya import-nya.
+
+Panggilan DeepSeek lewat `deepseek_chat()` mencatat token prompt yang kena
+context cache (`prompt_cache_hit_tokens`) vs yang tidak, supaya bisa dicek
+apakah prefix prompt (system prompt statis) benar-benar dipakai ulang.
+
+`deepseek_chat()` dan `fal_subscribe()` lewat limiter bersama per
+provider/endpoint (utils.rate_limit), termasuk retry 429 dengan Retry-After
+serta 5xx/error koneksi dengan backoff. Untuk fal, slot in-flight hanya
+dipegang selama submit ke queue: FAL_MAX_IN_FLIGHT membatasi submit yang
+berjalan bersamaan, bukan job yang sedang antri/generate di fal.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+from utils.profiling import timed
+from utils.rate_limit import call_with_limits
+
+DEEPSEEK_BASE_URL = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+DEEPSEEK_USAGE_LOG = os.environ.get(
+    "DEEPSEEK_USAGE_LOG", os.path.join("generated_files", "logs", "deepseek_usage.jsonl")
+)
+
+_usage_lock = threading.Lock()
+_usage_totals = {}  # label -> {"calls", "prompt_tokens", "cache_hit_tokens", "cache_miss_tokens", "seconds"}
+
+
+@functools.lru_cache(maxsize=8)
+def get_deepseek_client(api_key):
+    """OpenAI-compatible client untuk DeepSeek"""
+    from openai import OpenAI
+
+    # Semua retry (429, 5xx, koneksi) ditangani limiter bersama (utils.rate_limit), bukan per client,
+    # supaya retry tetap lewat bucket rpm dan cooldown Retry-After
+    return OpenAI(api_key=api_key, base_url=DEEPSEEK_BASE_URL, max_retries=0)
+
+
+@functools.lru_cache(maxsize=8)
+def get_fal_client(api_key):
+    """fal.ai client dengan key eksplisit (tidak bergantung pada os.environ)"""
+    import fal_client
+    import fal_client.client
+
+    # fal_client selalu memakai https://queue.fal.run/, override untuk benchmark offline
+    queue_url = os.environ.get("FAL_QUEUE_URL")
+    if queue_url:
+        fal_client.client.QUEUE_URL_FORMAT = queue_url
+
+    return fal_client.SyncClient(key=api_key)
+
+
+def record_usage(label, response, seconds=0.0, log_path=DEEPSEEK_USAGE_LOG):
+    """Catat usage satu response (hit/miss cache) ke total per proses dan ke log JSONL"""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    hit = getattr(usage, "prompt_cache_hit_tokens", None)
+    miss = getattr(usage, "prompt_cache_miss_tokens", None)
+    # Provider tanpa field cache: anggap semua token prompt miss
+    hit = hit or 0
+    miss = miss if miss is not None else prompt_tokens - hit
+    entry = {
+        "time": time.time(),
+        "label": label,
+        "model": getattr(response, "model", None),
+        "prompt_tokens": prompt_tokens,
+        "cache_hit_tokens": hit,
+        "cache_miss_tokens": miss,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "seconds": round(seconds, 3),
+    }
+    with _usage_lock:
+        totals = _usage_totals.setdefault(label, {
+            "calls": 0, "prompt_tokens": 0, "cache_hit_tokens": 0, "cache_miss_tokens": 0, "seconds": 0.0,
+        })
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["cache_hit_tokens"] += hit
+        totals["cache_miss_tokens"] += miss
+        totals["seconds"] += seconds
+        if log_path:
+            try:
+                os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+                with open(log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                pass
+    return entry
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Perkiraan kasar token satu request (~4 karakter per token) untuk bucket tpm"""
+    prompt = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    return prompt + (max_tokens or 1000)
+
+
+@timed("network:deepseek")
+def deepseek_chat(client, label, on_wait=None, **kwargs):
+    """`client.chat.completions.create(**kwargs)` lewat limiter DeepSeek + catat hit/miss cache dengan nama `label`"""
+    started = time.perf_counter()
+    response = call_with_limits(
+        "deepseek",
+        kwargs.get("model", ""),
+        lambda: client.chat.completions.create(**kwargs),
+        tokens=estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens")),
+        used_tokens=lambda response: getattr(getattr(response, "usage", None), "total_tokens", None),
+        on_wait=on_wait,
+    )
+    record_usage(label, response, time.perf_counter() - started)
+    return response
+
+
+@timed("network:fal")
+def fal_subscribe(api_key, endpoint, arguments, on_wait=None, with_logs=False, on_queue_update=None, **kwargs):
+    """Seperti `get_fal_client(api_key).subscribe(...)`, tapi submit lewat limiter fal per endpoint.
+
+    Slot limiter dilepas begitu request masuk queue fal; menunggu hasil tidak
+    menahan slot, jadi job yang lama tidak memblokir submit sesi lain.
+    """
+    client = get_fal_client(api_key)
+    handle = call_with_limits("fal", endpoint, lambda: client.submit(endpoint, arguments, **kwargs), on_wait=on_wait)
+    if on_queue_update is not None:
+        for event in handle.iter_events(with_logs=with_logs):
+            on_queue_update(event)
+    return handle.get()
+
+
+def usage_summary():
+    """Total usage per label sejak proses start, plus hit rate cache"""
+    with _usage_lock:
+        summary = {label: dict(totals) for label, totals in _usage_totals.items()}
+    for totals in summary.values():
+        cached = totals["cache_hit_tokens"] + totals["cache_miss_tokens"]
+        totals["hit_rate"] = totals["cache_hit_tokens"] / cached if cached else None
+    return summary
@@ -0,0 +1,220 @@
+"""Deduplikasi library musik berdasarkan hash audio.
+
+Hash dihitung dari audio payload saja (tag ID3v2/ID3v1/APE diabaikan), jadi
+file yang sama dengan tag/nama berbeda tetap terdeteksi. Hash disimpan di
+downloads/.dedup/index.json (per path + ukuran + mtime) sehingga scan
+berikutnya hanya meng-hash file baru.
+
+Policy:
+    report   - hanya laporkan grup duplikat
+    hardlink - ganti duplikat dengan hardlink ke file yang disimpan (nama tetap ada)
+    remove   - hapus duplikat
+
+Contoh:
+    python -m utils.dedup --policy report
+    python -m utils.dedup --policy hardlink --download-dir /mnt/nas/music
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.mp3 import audio_payload_range
+from utils.playlist import list_tracks
+from utils.shared_state import shared_lock, unique_tmp_path
+from utils.transcode import DOWNLOADS_DIR
+
+POLICIES = ["report", "hardlink", "remove"]
+# Default hanya laporan: hardlink/remove mengubah file di library (tag duplikat hilang),
+# jadi hanya dijalankan kalau dipilih user
+DEDUP_POLICY = os.environ.get("DEDUP_POLICY", "report")
+INDEX_DIR_NAME = ".dedup"
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def payload_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 dari audio payload (tanpa tag)"""
+    start, end = audio_payload_range(path)
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            sha256.update(chunk)
+            remaining -= len(chunk)
+    return sha256.hexdigest()
+
+
+def index_path(download_dir=DOWNLOADS_DIR):
+    return os.path.join(download_dir, INDEX_DIR_NAME, "index.json")
+
+
+def load_index(download_dir=DOWNLOADS_DIR):
+    try:
+        with open(index_path(download_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_index(index, download_dir=DOWNLOADS_DIR):
+    path = index_path(download_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def scan(download_dir=DOWNLOADS_DIR):
+    """Update index hash. Returns (index, jumlah file yang di-hash)."""
+    old_index = load_index(download_dir)
+    index = {}
+    by_inode = {}
+    hashed = 0
+    for path in list_tracks(download_dir):
+        rel_path = os.path.relpath(path, download_dir)
+        stat = os.stat(path)
+        entry = old_index.get(rel_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            index[rel_path] = entry
+            continue
+        inode = (stat.st_dev, stat.st_ino)
+        if inode not in by_inode:
+            by_inode[inode] = payload_hash(path)
+            hashed += 1
+        index[rel_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": by_inode[inode]}
+    save_index(index, download_dir)
+    return index, hashed
+
+
+def duplicate_groups(index):
+    """Grup path dengan hash audio sama. Returns [[keeper, dup, ...], ...]."""
+    groups = {}
+    for rel_path, entry in index.items():
+        groups.setdefault(entry["hash"], []).append(rel_path)
+    # File yang disimpan: nama terpendek (biasanya tanpa suffix " (1)"), lalu urut abjad
+    return [sorted(paths, key=lambda p: (len(p), p)) for paths in groups.values() if len(paths) > 1]
+
+
+def _hardlink(keeper, duplicate):
+    tmp_path = unique_tmp_path(duplicate, ".link")
+    os.link(keeper, tmp_path)
+    os.replace(tmp_path, duplicate)
+
+
+def dedup(download_dir=DOWNLOADS_DIR, policy="report"):
+    """Scan library lalu terapkan policy ke duplikat.
+
+    Returns dict dengan groups, bytes_saved, files_hashed, dan errors.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy}")
+    # Index dan hardlink ada di volume bersama: satu scan per library di semua replica
+    with shared_lock(f"dedup:{os.path.abspath(download_dir)}", ttl=120).keepalive():
+        return _dedup(download_dir, policy)
+
+
+def _dedup(download_dir, policy):
+    started = time.time()
+    index, hashed = scan(download_dir)
+    groups = duplicate_groups(index)
+
+    bytes_saved = 0
+    errors = []
+    for group in groups:
+        keeper = os.path.join(download_dir, group[0])
+        try:
+            keeper_stat = os.stat(keeper)
+        except OSError as e:
+            errors.append(f"{group[0]}: {e}")
+            continue
+        for rel_path in group[1:]:
+            duplicate = os.path.join(download_dir, rel_path)
+            try:
+                # File bisa hilang selama scan: cukup dicatat, job tetap jalan
+                stat = os.stat(duplicate)
+                linked = (stat.st_dev, stat.st_ino) == (keeper_stat.st_dev, keeper_stat.st_ino)
+                if policy == "hardlink" and not linked:
+                    _hardlink(keeper, duplicate)
+                    index[rel_path] = dict(index[group[0]])
+                elif policy == "remove":
+                    os.remove(duplicate)
+                    del index[rel_path]
+                else:
+                    continue
+                if not linked:
+                    bytes_saved += stat.st_size
+            except OSError as e:
+                errors.append(f"{rel_path}: {e}")
+
+    if policy != "report":
+        # mtime/ukuran berubah setelah hardlink; simpan ulang supaya scan berikutnya tidak hash ulang
+        for rel_path in list(index):
+            try:
+                stat = os.stat(os.path.join(download_dir, rel_path))
+            except OSError:
+                del index[rel_path]
+                continue
+            index[rel_path].update({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+        save_index(index, download_dir)
+
+    return {
+        "policy": policy,
+        "groups": groups,
+        "duplicates": sum(len(group) - 1 for group in groups),
+        "bytes_saved": bytes_saved,
+        "files_hashed": hashed,
+        "files_total": len(index),
+        "errors": errors,
+        "seconds": round(time.time() - started, 2),
+    }
+
+
+def submit_dedup(download_dir=DOWNLOADS_DIR, policy=DEDUP_POLICY):
+    """Jalankan dedup di background. Job yang masih berjalan untuk folder dan policy yang sama dipakai ulang.
+
+    Policy lain untuk folder yang sama diantrekan sebagai job sendiri (worker hanya satu,
+    jadi dijalankan setelah job sebelumnya selesai).
+    """
+    key = (os.path.abspath(download_dir), policy)
+    with _jobs_lock:
+        future = _jobs.get(key)
+        if future is not None and not future.done():
+            return future
+        future = _executor.submit(dedup, download_dir, policy)
+        _jobs[key] = future
+        return future
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and collapse duplicate tracks in the music library")
+    parser.add_argument("--download-dir", default=DOWNLOADS_DIR)
+    parser.add_argument("--policy", default="report", choices=POLICIES)
+    args = parser.parse_args()
+
+    result = dedup(args.download_dir, args.policy)
+    for group in result["groups"]:
+        print(f"KEEP {group[0]}")
+        for rel_path in group[1:]:
+            print(f"  {args.policy.upper():8} {rel_path}")
+    for error in result["errors"]:
+        print(f"ERROR {error}")
+    print(
+        f"{result['files_total']} files ({result['files_hashed']} hashed), "
+        f"{result['duplicates']} duplicates, {result['bytes_saved'] / 1024 ** 2:.1f} MB saved "
+        f"in {result['seconds']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Pencarian lagu di library berdasarkan tag (title, artist, album) dan nama file.
+
+Index trigram: setiap kata dinormalisasi (casefold, tanpa aksen/tanda baca;
+huruf non-latin seperti kiril/CJK tetap dipakai) dan dipecah jadi potongan 3
+huruf. Query dicocokkan lewat trigram yang sama,
+jadi salah ketik ("beatels", "bohemain") tetap ketemu. Hasil diurutkan dari
+proporsi trigram query yang cocok (plus sedikit bobot untuk tag yang lebih
+pendek/spesifik), ditambah bonus kalau setiap kata query jadi awal kata di
+title/artist/album.
+
+Tag disimpan di downloads/.search/index.json per path + ukuran + mtime, jadi
+sync hanya membaca tag file baru atau yang berubah. Index di memori dipakai
+bersama semua sesi dalam satu proses (`get_library_index`).
+
+Contoh:
+    python -m utils.library_search "bohemian rapsody"
+    python -m utils.library_search --rebuild
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from utils.mp3 import read_tags
+from utils.playlist import list_tracks
+from utils.profiling import section
+from utils.shared_state import unique_tmp_path
+from utils.transcode import DOWNLOADS_DIR
+
+INDEX_DIR_NAME = ".search"
+FIELDS = ["title", "artist", "album", "name"]
+# Bonus kalau setiap kata query jadi awal kata di field ini
+FIELD_BOOSTS = {"title": 0.3, "artist": 0.2, "album": 0.1, "name": 0.05}
+MIN_SCORE = 0.35
+# Daftar file sama seperti sync sebelumnya: stat ulang (cek tag berubah) paling sering sekali per interval
+RESTAT_INTERVAL = 30
+DEFAULT_LIMIT = 50
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize(text):
+    """Casefold, tanpa aksen (tanda diakritik dibuang), hanya huruf/angka semua aksara dipisah spasi"""
+    text = "".join(c for c in unicodedata.normalize("NFKD", str(text)) if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[^\W_]+", text.casefold()))
+
+
+def trigrams(text):
+    """Trigram per kata dengan padding ("  ab", " abc", ...), supaya awal kata lebih berbobot"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index_path(download_dir=DOWNLOADS_DIR):
+    return os.path.join(download_dir, INDEX_DIR_NAME, "index.json")
+
+
+class LibraryIndex:
+    """Index trigram untuk tag lagu, disinkronkan dengan isi folder downloads"""
+
+    def __init__(self, download_dir=DOWNLOADS_DIR):
+        self.download_dir = download_dir
+        self.path = index_path(download_dir)
+        self.entries = {}  # path relatif -> {"size", "mtime", "title", "artist", "album", "name", "words"}
+        self.postings = {}  # trigram -> set(path relatif)
+        self.lock = threading.Lock()
+        self._synced_tracks = None
+        self._synced_at = 0.0
+
+    # --- Persistensi -------------------------------------------------------
+
+    @classmethod
+    def load(cls, download_dir=DOWNLOADS_DIR, tracks=None):
+        """Load index dari disk lalu sinkronkan dengan library saat ini (`tracks` kalau sudah di-list)"""
+        index = cls(download_dir)
+        try:
+            with open(index.path, "r", encoding="utf-8") as f:
+                for key, entry in json.load(f).get("entries", {}).items():
+                    index._insert(key, entry)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        index.sync(tracks)
+        return index
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = unique_tmp_path(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # "words" dan "grams" dihitung ulang saat load
+            json.dump({"entries": {key: {k: v for k, v in entry.items() if k not in ("words", "grams")}
+                                   for key, entry in self.entries.items()}}, f)
+        os.replace(tmp_path, self.path)
+
+    def sync(self, tracks=None):
+        """Baca tag file baru/berubah, buang file yang hilang. Returns True kalau index berubah.
+
+        Di antara full check (tiap RESTAT_INTERVAL) hanya path yang baru muncul yang di-stat.
+        """
+        with section("library_search:sync"), self.lock:
+            tracks = list_tracks(self.download_dir) if tracks is None else list(tracks)
+            now = time.monotonic()
+            full = self._synced_tracks is None or now - self._synced_at >= RESTAT_INTERVAL
+            if not full and tracks == self._synced_tracks:
+                return False
+            unchanged = set() if full else set(self._synced_tracks)
+            if full:
+                self._synced_at = now
+            self._synced_tracks = tracks
+
+            current = {self._key(path): path for path in tracks}
+            changed = False
+            for key in set(self.entries) - set(current):
+                self._remove(key)
+                changed = True
+            for key, path in current.items():
+                if path in unchanged:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entry = self.entries.get(key)
+                if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                    continue
+                if entry:
+                    self._remove(key)
+                tags = read_tags(path)
+                self._insert(key, {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "title": tags.get("title", ""),
+                    "artist": tags.get("artist", ""),
+                    "album": tags.get("album", ""),
+                    "name": os.path.splitext(key)[0],
+                })
+                changed = True
+            if changed:
+                self.save()
+            return changed
+
+    def _key(self, path):
+        """Path relatif terhadap library (tanpa os.path.relpath yang lambat untuk ribuan file)"""
+        prefix = self.download_dir.rstrip(os.sep) + os.sep
+        return path[len(prefix):] if path.startswith(prefix) else os.path.relpath(path, self.download_dir)
+
+    # --- Index -------------------------------------------------------------
+
+    def _insert(self, key, entry):
+        entry["words"] = {field: normalize(entry.get(field, "")) for field in FIELDS}
+        grams = trigrams(" ".join(entry["words"].values()))
+        entry["grams"] = len(grams)
+        self.entries[key] = entry
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        for gram in trigrams(" ".join(entry["words"].values())):
+            keys = self.postings.get(gram)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def search(self, query, limit=DEFAULT_LIMIT, min_score=MIN_SCORE):
+        """Lagu yang cocok, paling relevan duluan. Returns list (path, score, entry)."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        query_words = normalize(query).split()
+        with self.lock:
+            hits = Counter()
+            for gram in query_grams:
+                hits.update(self.postings.get(gram, ()))
+            results = []
+            for key, count in hits.items():
+                score = count / len(query_grams)
+                if score < min_score:
+                    continue
+                entry = self.entries[key]
+                # Dari yang sama-sama cocok, yang tag-nya lebih pendek (lebih spesifik) duluan
+                score += 0.5 * count / entry["grams"]
+                words = entry["words"]
+                for field, boost in FIELD_BOOSTS.items():
+                    field_words = words[field].split()
+                    if field_words and all(any(w.startswith(q) for w in field_words) for q in query_words):
+                        score += boost
+                results.append((key, score))
+            results.sort(key=lambda item: (-item[1], item[0]))
+            return [(os.path.join(self.download_dir, key), round(score, 3), self.entries[key])
+                    for key, score in results[:limit]]
+
+    def recent(self, limit=DEFAULT_LIMIT):
+        """Lagu terbaru (mtime), untuk ditampilkan sebelum ada query"""
+        with self.lock:
+            keys = sorted(self.entries, key=lambda key: self.entries[key]["mtime"], reverse=True)[:limit]
+            return [(os.path.join(self.download_dir, key), 0.0, self.entries[key]) for key in keys]
+
+
+def get_library_index(download_dir=DOWNLOADS_DIR, tracks=None):
+    """Index bersama untuk satu proses, disinkronkan setiap dipanggil (hanya file yang berubah dibaca)"""
+    with _indexes_lock:
+        index = _indexes.get(download_dir)
+        if index is None:
+            index = _indexes[download_dir] = LibraryIndex.load(download_dir, tracks)
+            return index
+    index.sync(tracks)
+    return index
+
+
+def describe(entry):
+    """Label hasil pencarian: 'Title — Artist · Album'"""
+    label = entry.get("title") or os.path.basename(entry["name"])
+    if entry.get("artist"):
+        label += f" — {entry['artist']}"
+    if entry.get("album"):
+        label += f" · {entry['album']}"
+    return label
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the music library by tags and file name")
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--download-dir", default=DOWNLOADS_DIR)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="Re-read tags of every file")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(index_path(args.download_dir)):
+        os.remove(index_path(args.download_dir))
+    started = time.perf_counter()
+    index = LibraryIndex.load(args.download_dir)
+    print(f"{len(index.entries)} tracks indexed in {time.perf_counter() - started:.2f}s ({index.path})")
+    if args.query:
+        started = time.perf_counter()
+        results = index.search(args.query, args.limit)
+        print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for path, score, entry in results:
+            print(f"{score:5.2f}  {describe(entry)}  [{os.path.relpath(path, args.download_dir)}]")
+
+
+if __name__ == "__main__":
+    main()
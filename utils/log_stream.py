@@ -0,0 +1,105 @@
+"""Streaming output subprocess ke UI tanpa membanjiri websocket.
+
+`OutputStreamer` dipakai sebagai callback `on_output`: setiap baris ditulis
+lengkap ke file log per job, tapi yang ditampilkan hanya N baris terakhir
+(ring buffer) dan UI di-render paling sering sekali per `flush_interval`
+detik. Log lengkap bisa dibuka lagi nanti lewat `recent_logs()`.
+
+Contoh:
+    with OutputStreamer(output_container.code, prefix="spotdl") as streamer:
+        run_spotdl(url, on_output=streamer)
+"""
+import glob
+import os
+import re
+import time
+from collections import deque
+
+JOB_LOG_DIR = os.environ.get("JOB_LOG_DIR", os.path.join("generated_files", "logs"))
+MAX_LOG_FILES = 50
+
+
+def new_log_path(prefix, log_dir=JOB_LOG_DIR):
+    """Path file log baru untuk satu job: <prefix>-<YYYYmmdd-HHMMSS>-<ms>.log"""
+    os.makedirs(log_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", prefix)
+    return os.path.join(log_dir, f"{slug}-{stamp}.log")
+
+
+def recent_logs(prefix="", log_dir=JOB_LOG_DIR, limit=20):
+    """File log terbaru (yang paling baru duluan)"""
+    files = glob.glob(os.path.join(log_dir, f"{prefix}*.log"))
+    return sorted(files, key=os.path.getmtime, reverse=True)[:limit]
+
+
+def prune_logs(log_dir=JOB_LOG_DIR, keep=MAX_LOG_FILES):
+    """Hapus log lama, sisakan `keep` file terbaru"""
+    for path in recent_logs(log_dir=log_dir, limit=None)[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def tail_file(path, lines=200, block_size=64 * 1024):
+    """N baris terakhir dari file tanpa membaca seluruh file"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        data = b""
+        while end > 0 and data.count(b"\n") <= lines:
+            start = max(0, end - block_size)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+    return "\n".join(data.decode("utf-8", errors="replace").splitlines()[-lines:])
+
+
+class OutputStreamer:
+    """Callback `on_output` dengan ring buffer, flush berbasis waktu, dan log file lengkap"""
+
+    def __init__(self, render, max_lines=10, flush_interval=0.5, prefix="job", log_dir=JOB_LOG_DIR):
+        self.render = render
+        self.lines = deque(maxlen=max_lines)
+        self.flush_interval = flush_interval
+        self.log_path = new_log_path(prefix, log_dir) if log_dir else None
+        self.log_file = open(self.log_path, "a", encoding="utf-8") if self.log_path else None
+        self.line_count = 0
+        self.flush_count = 0
+        self.last_flush = 0.0
+        self.dirty = False
+        if self.log_path:
+            prune_logs(log_dir)
+
+    def __call__(self, line):
+        self.lines.append(line)
+        self.line_count += 1
+        self.dirty = True
+        if self.log_file:
+            self.log_file.write(line + "\n")
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Render isi ring buffer ke UI (kalau ada baris baru)"""
+        if not self.dirty:
+            return
+        self.render("\n".join(self.lines))
+        self.last_flush = time.monotonic()
+        self.flush_count += 1
+        self.dirty = False
+        if self.log_file:
+            self.log_file.flush()
+
+    def close(self):
+        self.flush()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
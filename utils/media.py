@@ -0,0 +1,257 @@
+"""Helper untuk file media: hashing, unduhan, dan FFmpeg."""
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils.profiling import timed
+from utils.shared_state import unique_tmp_path
+
+# Download paralel (byte-range) untuk file besar
+DOWNLOAD_CONNECTIONS = int(os.environ.get("DOWNLOAD_CONNECTIONS", "4"))
+RANGED_MIN_BYTES = int(os.environ.get("RANGED_MIN_BYTES", str(4 * 1024 ** 2)))
+
+# Worker latar belakang untuk pekerjaan ffmpeg (mux, dll)
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media")
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def check_ffmpeg():
+    """Check if ffmpeg is installed and available in PATH.
+    Also checks local directories and updates PATH if found.
+    """
+    # Check if ffmpeg is already in PATH
+    if shutil.which("ffmpeg"):
+        return True
+
+    # Check local directories
+    current_dir = os.getcwd()
+    possible_paths = [
+        os.path.join(current_dir, "ffmpeg.exe"),
+        os.path.join(current_dir, ".spotdl", "ffmpeg.exe"),
+        os.path.join(os.path.expanduser("~"), ".spotdl", "ffmpeg.exe"),
+    ]
+
+    for path in possible_paths:
+        if os.path.exists(path):
+            # Add directory to PATH
+            ffmpeg_dir = os.path.dirname(path)
+            os.environ["PATH"] += os.pathsep + ffmpeg_dir
+            return True
+
+    return False
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash SHA-256 isi file, dibaca per chunk"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_url(url, timeout=10):
+    """Cek ukuran dan dukungan Range tanpa mengunduh isi.
+
+    Returns dict {"url", "size", "ranges"}; size None kalau server tidak memberi tahu.
+    """
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=timeout)
+        if response.status_code < 400 and response.headers.get("Content-Length"):
+            return {
+                "url": response.url,
+                "size": int(response.headers["Content-Length"]),
+                "ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+            }
+    except requests.RequestException:
+        pass
+
+    # Sebagian CDN menolak HEAD; minta 1 byte pertama saja
+    try:
+        with requests.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout) as response:
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code == 206 and "/" in content_range and not content_range.endswith("*"):
+                return {"url": response.url, "size": int(content_range.rsplit("/", 1)[1]), "ranges": True}
+            length = response.headers.get("Content-Length")
+            return {"url": response.url, "size": int(length) if length else None, "ranges": False}
+    except requests.RequestException:
+        return {"url": url, "size": None, "ranges": False}
+
+
+def _download_range(url, path, start, end, timeout):
+    """Download bytes [start, end] ke posisi yang sama di file"""
+    headers = {"Range": f"bytes={start}-{end}"}
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        if response.status_code != 206 or not response.headers.get("Content-Range", "").startswith(f"bytes {start}-{end}/"):
+            raise IOError(f"Server ignored range {start}-{end}")
+        written = 0
+        with open(path, "r+b") as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+                written += len(chunk)
+    if written != end - start + 1:
+        raise IOError(f"Range {start}-{end} incomplete ({written} bytes)")
+
+
+def _download_ranged(url, tmp_path, size, connections, timeout):
+    """Download paralel dengan beberapa koneksi byte-range, disusun langsung di file"""
+    with open(tmp_path, "wb") as f:
+        f.truncate(size)
+    part_size = -(-size // connections)
+    ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="range") as executor:
+        futures = [executor.submit(_download_range, url, tmp_path, start, end, timeout) for start, end in ranges]
+        for future in futures:
+            future.result()
+
+
+@timed("network:download")
+def download_to_file(url, path, timeout=60, connections=DOWNLOAD_CONNECTIONS, probe=None):
+    """Download URL ke file secara streaming (tanpa menampung semua bytes di memori).
+
+    File besar (>= RANGED_MIN_BYTES) dari server yang mendukung Range diunduh
+    dengan beberapa koneksi paralel; kalau gagal, fallback ke satu stream.
+    Header dari GET pertama dipakai untuk memutuskan, jadi file kecil tidak
+    butuh request tambahan; `probe` (hasil `probe_url`) bisa diberikan kalau
+    sudah ada.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = unique_tmp_path(path, ".part")
+    try:
+        return _download_to_tmp(url, path, tmp_path, timeout, connections, probe)
+    finally:
+        # Download gagal (mis. salah satu koneksi range putus): jangan tinggalkan .part
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _download_to_tmp(url, path, tmp_path, timeout, connections, probe):
+    def ranged(info):
+        if connections <= 1 or not info["ranges"] or not info["size"] or info["size"] < RANGED_MIN_BYTES:
+            return False
+        try:
+            _download_ranged(info["url"], tmp_path, info["size"], connections, timeout)
+            return True
+        except (requests.RequestException, IOError):
+            return False
+
+    if probe is not None and ranged(probe):
+        os.replace(tmp_path, path)
+        return path
+
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        # Header GET biasa sudah cukup sebagai probe; file kecil langsung di-stream
+        length = response.headers.get("Content-Length")
+        info = {
+            "url": response.url,
+            "size": int(length) if length else None,
+            "ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+        }
+        if probe is None and info["ranges"] and info["size"] and info["size"] >= RANGED_MIN_BYTES:
+            response.close()
+            if ranged(info):
+                os.replace(tmp_path, path)
+                return path
+            response = requests.get(url, stream=True, timeout=timeout)
+            response.raise_for_status()
+        with response, open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+
+def mux_video_audio(video_path, audio_path, output_dir):
+    """Gabungkan video dan audio. Video di-stream copy (tidak di-encode ulang).
+
+    Hasil di-cache berdasarkan hash kedua input, jadi pasangan file yang sama
+    tidak diproses dua kali.
+    """
+    if not check_ffmpeg():
+        raise RuntimeError("FFmpeg is not installed or not found in PATH.")
+
+    key = hashlib.sha256(
+        (file_sha256(video_path) + file_sha256(audio_path)).encode()
+    ).hexdigest()[:16]
+    output_path = os.path.join(output_dir, f"muxed_{key}.mp4")
+    if os.path.exists(output_path):
+        return output_path
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Unik per proses/thread: mux bersamaan untuk key yang sama tidak saling menimpa
+    tmp_path = unique_tmp_path(output_path, ".part.mp4")
+    command = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-shortest",
+        "-movflags", "+faststart",
+        tmp_path,
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+
+def submit_mux(video_path, audio_path, output_dir):
+    """Jalankan mux di worker latar belakang. Mengembalikan Future.
+
+    Request yang sama (file dan ukuran/mtime sama) selama masih berjalan
+    akan memakai Future yang sama.
+    """
+    inflight_key = tuple(
+        (os.path.abspath(p), os.path.getsize(p), os.path.getmtime(p))
+        for p in (video_path, audio_path)
+    ) + (os.path.abspath(output_dir),)
+
+    with _inflight_lock:
+        future = _inflight.get(inflight_key)
+        if future is not None and not future.done():
+            return future
+        future = _executor.submit(mux_video_audio, video_path, audio_path, output_dir)
+        _inflight[inflight_key] = future
+        future.add_done_callback(lambda f: _discard_inflight(inflight_key, f))
+        return future
+
+
+def _discard_inflight(key, future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Media helpers (ffmpeg)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    mux_parser = subparsers.add_parser("mux", help="Gabungkan video + audio (video stream copy)")
+    mux_parser.add_argument("video")
+    mux_parser.add_argument("audio")
+    mux_parser.add_argument("--output-dir", default=os.path.join("generated_files", "muxed"))
+
+    args = parser.parse_args()
+    if args.command == "mux":
+        print(mux_video_audio(args.video, args.audio, args.output_dir))
+
+
+if __name__ == "__main__":
+    main()
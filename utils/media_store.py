@@ -0,0 +1,251 @@
+"""Media store bersama: payload download disimpan di disk, bukan di memori sesi.
+
+Halaman menyimpan video/audio ke store lalu memberi Streamlit referensi
+ringan (callable untuk `st.download_button`), jadi bytes baru dibaca dari
+disk saat user benar-benar klik download. Store memakai budget byte global
+dengan eviction LRU, mencatat pemakaian per sesi, dan menyediakan metrics
+(hit rate, bytes evicted).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.media import download_to_file
+
+MEDIA_STORE_DIR = os.environ.get("MEDIA_STORE_DIR", "media_cache")
+MEDIA_STORE_MAX_BYTES = int(os.environ.get("MEDIA_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+class MediaEntry:
+    def __init__(self, key, path, size, source_url=None):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.source_url = source_url
+        self.sessions = set()
+        self.last_access = time.time()
+
+
+class MediaStore:
+    """Store file media dengan budget byte global dan eviction LRU"""
+
+    def __init__(self, root=MEDIA_STORE_DIR, max_bytes=MEDIA_STORE_MAX_BYTES, is_session_active=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.is_session_active = is_session_active
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_evicted": 0, "bytes_written": 0}
+        os.makedirs(root, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Index file yang sudah ada di disk (urut dari yang paling lama dipakai)"""
+        files = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".part") or not os.path.isfile(path):
+                continue
+            files.append((os.path.getmtime(path), name, path))
+        for _, name, path in sorted(files):
+            entry = MediaEntry(name, path, os.path.getsize(path))
+            self.entries[name] = entry
+            self.total_bytes += entry.size
+        with self.lock:
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    # --- Menyimpan ---------------------------------------------------------
+
+    def _add(self, key, size, session_id, source_url=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = MediaEntry(key, self._path(key), size, source_url)
+                self.entries[key] = entry
+                self.total_bytes += size
+                self.stats["bytes_written"] += size
+            self._touch(entry)
+            if session_id:
+                entry.sessions.add(session_id)
+        # Lepas sesi yang sudah tidak aktif dulu, supaya file mereka bisa di-evict
+        if self.is_session_active:
+            self.prune_sessions(self.is_session_active)
+        with self.lock:
+            self._evict(keep=key)
+        return key
+
+    def put_bytes(self, data, session_id=None, suffix=""):
+        """Simpan bytes. Key berdasarkan hash isi, jadi isi yang sama hanya disimpan sekali."""
+        key = hashlib.sha256(data).hexdigest()[:32] + suffix
+        if self._lookup(key) is None:
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        return self._add(key, len(data), session_id)
+
+    def put_url(self, url, session_id=None, suffix="", timeout=30, probe=None):
+        """Download URL langsung ke disk (streaming, paralel untuk file besar).
+        URL yang sama memakai entry yang sama."""
+        key = hashlib.sha256(url.encode()).hexdigest()[:32] + suffix
+        entry = self._lookup(key)
+        if entry is not None:
+            return self._add(key, entry.size, session_id)
+
+        download_to_file(url, self._path(key), timeout=timeout, probe=probe)
+        return self._add(key, os.path.getsize(self._path(key)), session_id, source_url=url)
+
+    # --- Membaca -----------------------------------------------------------
+
+    def _lookup(self, key):
+        """Entry untuk key kalau file-nya masih ada; dihitung sebagai hit/miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and os.path.exists(entry.path):
+                self.stats["hits"] += 1
+                self._touch(entry)
+                return entry
+            if entry is not None:
+                self._remove(entry)
+            self.stats["misses"] += 1
+            return None
+
+    def get_path(self, key):
+        """Path file untuk key, atau None kalau sudah di-evict"""
+        entry = self._lookup(key)
+        return entry.path if entry is not None else None
+
+    def read(self, key):
+        path = self.get_path(key)
+        if path is None:
+            raise KeyError(f"Media {key} is no longer available")
+        with open(path, "rb") as f:
+            return f.read()
+
+    def opener(self, key):
+        """Callable untuk `st.download_button(data=...)`: bytes baru dibaca saat diklik.
+
+        Kalau entry berasal dari URL dan sudah di-evict, file diunduh ulang.
+        """
+        entry = self.entries.get(key)
+        source_url = entry.source_url if entry is not None else None
+
+        def load():
+            if source_url and self.get_path(key) is None:
+                self.put_url(source_url, suffix=key[32:])
+            return self.read(key)
+        return load
+
+    # --- LRU & sesi --------------------------------------------------------
+
+    def _touch(self, entry):
+        entry.last_access = time.time()
+        self.entries.move_to_end(entry.key)
+
+    def _remove(self, entry):
+        self.entries.pop(entry.key, None)
+        self.total_bytes -= entry.size
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep=None):
+        """Hapus entry paling lama dipakai sampai total di bawah budget.
+
+        Entry yang masih direferensikan sesi aktif dilewati, kecuali yang bisa
+        diunduh ulang dari URL (lihat `opener`); entry dari `put_bytes` milik
+        sesi aktif tidak pernah dihapus, jadi budget bisa terlampaui sementara.
+        """
+        for evict_referenced in (False, True):
+            for key in list(self.entries):
+                if self.total_bytes <= self.max_bytes:
+                    return
+                entry = self.entries[key]
+                if key == keep or (entry.sessions and not (evict_referenced and entry.source_url)):
+                    continue
+                self._remove(entry)
+                self.stats["evictions"] += 1
+                self.stats["bytes_evicted"] += entry.size
+
+    def release_session(self, session_id):
+        """Lepas referensi sesi. File tetap ada sampai tergeser LRU."""
+        with self.lock:
+            for entry in self.entries.values():
+                entry.sessions.discard(session_id)
+
+    def prune_sessions(self, is_active):
+        """Lepas semua sesi yang `is_active(session_id)` bernilai False"""
+        with self.lock:
+            sessions = {s for entry in self.entries.values() for s in entry.sessions}
+        for session_id in sessions:
+            if not is_active(session_id):
+                self.release_session(session_id)
+
+    def session_bytes(self):
+        """Byte yang direferensikan tiap sesi"""
+        with self.lock:
+            usage = {}
+            for entry in self.entries.values():
+                for session_id in entry.sessions:
+                    usage[session_id] = usage.get(session_id, 0) + entry.size
+            return usage
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            metrics = dict(self.stats)
+            metrics.update({
+                "entries": len(self.entries),
+                "bytes_stored": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": self.stats["hits"] / lookups if lookups else None,
+            })
+        metrics["sessions"] = len(self.session_bytes())
+        return metrics
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_media_store():
+    """Media store bersama untuk satu proses"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MediaStore(is_session_active=is_session_active)
+        return _store
+
+
+def current_session_id():
+    """Session id Streamlit saat ini (None kalau di luar Streamlit)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def is_session_active(session_id):
+    """True kalau sesi Streamlit masih terhubung"""
+    try:
+        from streamlit import runtime
+    except ImportError:
+        return False
+    return runtime.exists() and runtime.get_instance().is_active_session(session_id)
+
+
+def deferred_file(path):
+    """Callable untuk `st.download_button(data=...)` yang membaca file saat diklik"""
+    def load():
+        with open(path, "rb") as f:
+            return f.read()
+    return load
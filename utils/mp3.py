@@ -0,0 +1,216 @@
+"""Parser MP3 ringan: tag ID3, posisi audio payload, dan estimasi durasi.
+
+Tanpa dependency tambahan; cukup untuk file hasil spotdl (ID3v2.3/2.4 +
+MPEG-1 Layer III). Kalau parsing gagal, fungsi mengembalikan fallback
+(nama file / None), bukan exception.
+"""
+import os
+import re
+import struct
+
+# kbps, index [version_key][layer][bitrate_index]
+BITRATES = {
+    "1": {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    "2": {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+SAMPLE_RATES = {
+    "1": [44100, 48000, 32000],
+    "2": [22050, 24000, 16000],
+    "2.5": [11025, 12000, 8000],
+}
+TEXT_FRAMES = {
+    "TIT2": "title", "TPE1": "artist", "TALB": "album",
+    "TT2": "title", "TP1": "artist", "TAL": "album",
+}
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def id3v2_size(header):
+    """Ukuran total tag ID3v2 (termasuk header) dari 10 byte pertama file, atau 0"""
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = 10 + _syncsafe(header[6:10])
+    if header[5] & 0x10:  # footer
+        size += 10
+    return size
+
+
+def audio_payload_range(path):
+    """(start, end) byte audio tanpa tag ID3v2 di awal dan ID3v1/APE di akhir"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = id3v2_size(f.read(10))
+        end = file_size
+        if end - start >= 128:
+            f.seek(end - 128)
+            if f.read(3) == b"TAG":
+                end -= 128
+        if end - start >= 32:
+            f.seek(end - 32)
+            footer = f.read(32)
+            if footer[:8] == b"APETAGEX":
+                tag_size = struct.unpack("<I", footer[12:16])[0]
+                has_header = struct.unpack("<I", footer[20:24])[0] & 0x80000000
+                end -= tag_size + (32 if has_header else 0)
+    return start, max(start, end)
+
+
+def _decode_text(data):
+    if not data:
+        return ""
+    encoding, text = data[0], data[1:]
+    try:
+        if encoding == 0:
+            value = text.decode("latin-1")
+        elif encoding == 1:
+            value = text.decode("utf-16")
+        elif encoding == 2:
+            value = text.decode("utf-16-be")
+        else:
+            value = text.decode("utf-8")
+    except UnicodeDecodeError:
+        value = text.decode("latin-1", errors="replace")
+    # Multi-value (ID3v2.4) dipisah null; ambil sebagai "a / b"
+    return " / ".join(part for part in value.split("\x00") if part).strip()
+
+
+def read_id3_tags(path):
+    """Tag title/artist/album dari ID3v2 (dict kosong kalau tidak ada)"""
+    tags = {}
+    try:
+        with open(path, "rb") as f:
+            header = f.read(10)
+            size = id3v2_size(header)
+            if not size or header[5] & 0x80:  # unsynchronisation tidak didukung
+                return tags
+            data = f.read(size - 10)
+    except OSError:
+        return tags
+
+    version = header[3]
+    pos = 0
+    if version >= 3 and header[5] & 0x40:  # extended header
+        ext_size = _syncsafe(data[:4]) if version == 4 else struct.unpack(">I", data[:4])[0] + 4
+        pos = ext_size
+
+    while pos < len(data):
+        if version == 2:
+            frame_id = data[pos:pos + 3].decode("latin-1", errors="replace")
+            frame_size = int.from_bytes(data[pos + 3:pos + 6], "big")
+            header_size = 6
+        else:
+            frame_id = data[pos:pos + 4].decode("latin-1", errors="replace")
+            raw_size = data[pos + 4:pos + 8]
+            if len(raw_size) < 4:
+                break
+            frame_size = _syncsafe(raw_size) if version == 4 else struct.unpack(">I", raw_size)[0]
+            header_size = 10
+        if not frame_id.strip("\x00") or frame_size <= 0:
+            break
+        if frame_id in TEXT_FRAMES and TEXT_FRAMES[frame_id] not in tags:
+            tags[TEXT_FRAMES[frame_id]] = _decode_text(data[pos + header_size:pos + header_size + frame_size])
+        pos += header_size + frame_size
+    return {key: value for key, value in tags.items() if value}
+
+
+def parse_filename(path):
+    """Fallback dari nama file spotdl: '{artists} - {title}.mp3'"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if " - " in name:
+        artist, title = name.split(" - ", 1)
+        return {"artist": artist.strip(), "title": title.strip()}
+    return {"title": name}
+
+
+def read_tags(path):
+    """Tag lagu dengan fallback ke nama file"""
+    tags = parse_filename(path)
+    tags.update(read_id3_tags(path))
+    return tags
+
+
+def _parse_frame_header(header):
+    """Info frame MPEG audio dari 4 byte header, atau None"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    version = {0: "2.5", 2: "2", 3: "1"}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = BITRATES["1" if version == "1" else "2"][layer][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    if layer == 1:
+        samples = 384
+    elif layer == 2 or version == "1":
+        samples = 1152
+    else:
+        samples = 576
+    mono = (header[3] >> 6) & 0x03 == 3
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "samples_per_frame": samples,
+        "mono": mono,
+    }
+
+
+def mp3_info(path):
+    """Durasi (detik) dan bitrate (bps) dari header MP3; VBR dibaca dari header Xing/Info/VBRI.
+
+    Returns dict {"duration", "bitrate"} atau None kalau bukan MP3 yang valid.
+    """
+    try:
+        start, end = audio_payload_range(path)
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(64 * 1024)
+    except OSError:
+        return None
+
+    match = None
+    for m in re.finditer(rb"\xff[\xe0-\xff]", data):
+        info = _parse_frame_header(data[m.start():m.start() + 4])
+        if info:
+            match, frame = m.start(), info
+            break
+    if match is None:
+        return None
+
+    # Header Xing/Info (VBR) atau VBRI
+    if frame["version"] == "1":
+        xing_offset = 4 + (17 if frame["mono"] else 32)
+    else:
+        xing_offset = 4 + (9 if frame["mono"] else 17)
+    frames = None
+    xing = data[match + xing_offset:match + xing_offset + 12]
+    if xing[:4] in (b"Xing", b"Info") and struct.unpack(">I", xing[4:8])[0] & 0x01:
+        frames = struct.unpack(">I", xing[8:12])[0]
+    vbri = data[match + 36:match + 36 + 18]
+    if vbri[:4] == b"VBRI":
+        frames = struct.unpack(">I", vbri[14:18])[0]
+
+    audio_bytes = end - start - match
+    if frames:
+        duration = frames * frame["samples_per_frame"] / frame["sample_rate"]
+        bitrate = int(audio_bytes * 8 / duration) if duration else frame["bitrate"]
+    else:
+        bitrate = frame["bitrate"]
+        duration = audio_bytes * 8 / bitrate
+    return {"duration": duration, "bitrate": bitrate}
@@ -0,0 +1,335 @@
+"""Pipeline headless untuk baris `pending` di n8n.csv.
+
+Setiap baris diproses: thumbnail (Imagen4) -> video (Seedance) -> audio
+(Chatterbox) -> mux (FFmpeg). Hasil tiap tahap disimpan di file state,
+jadi kalau proses crash, baris yang belum selesai dilanjutkan dari tahap
+terakhir yang berhasil.
+
+Contoh:
+    python -m utils.pipeline --csv n8n.csv --max-rows 2 --video-concurrency 1
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.change_feed import record_changes
+from utils.clients import fal_subscribe, get_fal_client
+from utils.media import download_to_file, mux_video_audio
+from utils.profiling import timed
+from utils.reference_images import reference_url
+from utils.shared_state import file_lock_name, get_state, shared_lock, unique_tmp_path
+
+CSV_FILE = "n8n.csv"
+OUTPUT_DIR = os.path.join("generated_files", "pipeline")
+
+THUMBNAIL_ENDPOINT = "fal-ai/imagen4/preview"
+VIDEO_ENDPOINT = "fal-ai/bytedance/seedance/v1/lite/reference-to-video"
+AUDIO_ENDPOINT = "fal-ai/chatterbox/text-to-speech"
+
+DEFAULT_CONCURRENCY = {
+    THUMBNAIL_ENDPOINT: 2,
+    VIDEO_ENDPOINT: 1,
+    AUDIO_ENDPOINT: 2,
+}
+
+STAGES = ["thumbnail", "video", "audio", "mux"]
+
+
+def state_path(output_dir):
+    return os.path.join(output_dir, "state.json")
+
+
+def progress_path(output_dir):
+    return os.path.join(output_dir, "progress.json")
+
+
+def lock_name(output_dir):
+    """Lock bersama (utils.shared_state) untuk satu output dir, berlaku di semua replica"""
+    return f"pipeline:{os.path.abspath(output_dir)}"
+
+
+def write_json(path, data):
+    """Tulis JSON secara atomic (tmp file + rename)"""
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+@timed("csv:read")
+def read_rows(csv_file):
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames or [], list(reader)
+
+
+def row_key(row):
+    return str(row.get("row_number") or row.get("index"))
+
+
+def read_progress(output_dir=OUTPUT_DIR):
+    """Progress terakhir dari runner (dipakai halaman monitor)"""
+    progress = read_json(progress_path(output_dir), {}) or {}
+    progress["running"] = get_state().lock_holder(lock_name(output_dir)) is not None
+    return progress
+
+
+class PipelineRunner:
+    """Menjalankan baris pending dengan batas concurrency per endpoint fal"""
+
+    def __init__(self, csv_file=CSV_FILE, output_dir=OUTPUT_DIR, max_rows=2,
+                 concurrency=None, limit=None, retry_failed=False, voice="Jennifer"):
+        self.csv_file = csv_file
+        self.output_dir = output_dir
+        self.max_rows = max_rows
+        self.limit = limit
+        self.retry_failed = retry_failed
+        self.voice = voice
+
+        limits = dict(DEFAULT_CONCURRENCY)
+        limits.update(concurrency or {})
+        self.semaphores = {endpoint: threading.BoundedSemaphore(n) for endpoint, n in limits.items()}
+
+        self.csv_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.state = {}
+        self.progress = {}
+
+    # --- CSV & state -------------------------------------------------------
+
+    def update_status(self, key, status):
+        """Update kolom status satu baris. File dibaca ulang tiap kali supaya
+        perubahan dari halaman Data Generator tidak tertimpa."""
+        with self.csv_lock, shared_lock(file_lock_name(self.csv_file)):
+            fieldnames, rows = read_rows(self.csv_file)
+            changed = []
+            for row in rows:
+                if row_key(row) == key:
+                    row["status"] = status
+                    changed.append(row)
+            tmp_path = unique_tmp_path(self.csv_file)
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(tmp_path, self.csv_file)
+            record_changes(self.csv_file, "update", changed)
+
+    def save_stage(self, key, stage, value):
+        with self.state_lock:
+            self.state.setdefault(key, {})[stage] = value
+            write_json(state_path(self.output_dir), self.state)
+
+    def save_progress(self, **changes):
+        with self.state_lock:
+            self.progress.update(changes)
+            elapsed_hours = max(time.time() - self.progress["started_at"], 1) / 3600
+            self.progress["rows_per_hour"] = round(self.progress["done"] / elapsed_hours, 2)
+            self.progress["updated_at"] = time.time()
+            write_json(progress_path(self.output_dir), self.progress)
+
+    # --- fal ---------------------------------------------------------------
+
+    def call_fal(self, endpoint, arguments):
+        with self.semaphores[endpoint]:
+            return fal_subscribe(os.environ["FAL_KEY"], endpoint, arguments=arguments, with_logs=False)
+
+    # --- Stages ------------------------------------------------------------
+
+    def run_thumbnail(self, row):
+        prompt = row.get("scene_detail_1") or row.get("story")
+        result = self.call_fal(THUMBNAIL_ENDPOINT, {
+            "prompt": prompt,
+            "aspect_ratio": row.get("aspect_ratio") or "9:16",
+        })
+        if not result or not result.get("images"):
+            raise RuntimeError(f"No thumbnail returned: {result}")
+        return result["images"][0]["url"]
+
+    def run_video(self, row, thumbnail_url):
+        scene_details = [row.get(f"scene_detail_{i}") for i in range(1, 6)]
+        prompt = " ".join([row.get("story") or ""] + [s for s in scene_details if s])
+        try:
+            duration = min(max(int(float(row.get("duration") or 5)), 2), 12)
+        except ValueError:
+            duration = 5
+        aspect_ratio = row.get("aspect_ratio") or "auto"
+        resolution = row.get("resolution") or "720p"
+        # Thumbnail full-size diperkecil ke resolusi video sebelum dikirim
+        reference = reference_url(
+            thumbnail_url, get_fal_client(os.environ["FAL_KEY"]).upload_file, resolution, aspect_ratio
+        )
+        result = self.call_fal(VIDEO_ENDPOINT, {
+            "prompt": prompt,
+            "aspect_ratio": aspect_ratio,
+            "resolution": resolution,
+            "duration": duration,
+            "reference_image_urls": [reference],
+        })
+        if not result or "video" not in result:
+            raise RuntimeError(f"No video returned: {result}")
+        return result["video"]["url"]
+
+    def run_audio(self, row):
+        result = self.call_fal(AUDIO_ENDPOINT, {
+            "text": row.get("story") or "",
+            "voice": self.voice,
+        })
+        if not result or "audio" not in result:
+            raise RuntimeError(f"No audio returned: {result}")
+        return result["audio"]["url"]
+
+    def run_mux(self, key, video_url, audio_url):
+        row_dir = os.path.join(self.output_dir, f"row_{key}")
+        video_path = os.path.join(row_dir, "video.mp4")
+        audio_path = os.path.join(row_dir, "audio.mp3")
+        if not os.path.exists(video_path):
+            download_to_file(video_url, video_path)
+        if not os.path.exists(audio_path):
+            download_to_file(audio_url, audio_path)
+        return mux_video_audio(video_path, audio_path, row_dir)
+
+    def process_row(self, row):
+        key = row_key(row)
+        # Claim baris supaya runner lain (replica/output dir lain) tidak memproses baris yang sama
+        claim = get_state().try_lock(f"pipeline:row:{os.path.abspath(self.csv_file)}:{key}", ttl=300)
+        if claim is None:
+            self.save_progress(skipped=self.progress["skipped"] + 1)
+            print(f"[row {key}] skipped: claimed by another runner", flush=True)
+            return
+        with claim.keepalive():
+            self._process_row(key, row)
+
+    def _process_row(self, key, row):
+        done = self.state.get(key, {})
+        self.update_status(key, "processing")
+        with self.state_lock:
+            self.progress["in_progress"].append(key)
+        try:
+            thumbnail_url = done.get("thumbnail") or self.run_thumbnail(row)
+            self.save_stage(key, "thumbnail", thumbnail_url)
+
+            video_url = done.get("video") or self.run_video(row, thumbnail_url)
+            self.save_stage(key, "video", video_url)
+
+            audio_url = done.get("audio") or self.run_audio(row)
+            self.save_stage(key, "audio", audio_url)
+
+            muxed_path = done.get("mux")
+            if not muxed_path or not os.path.exists(muxed_path):
+                muxed_path = self.run_mux(key, video_url, audio_url)
+            self.save_stage(key, "mux", muxed_path)
+
+            self.update_status(key, "done")
+            self.finish_row(key, ok=True)
+            print(f"[row {key}] done -> {muxed_path}", flush=True)
+        except Exception as e:
+            self.save_stage(key, "error", str(e))
+            self.update_status(key, "failed")
+            self.finish_row(key, ok=False)
+            print(f"[row {key}] failed: {e}", file=sys.stderr, flush=True)
+
+    def finish_row(self, key, ok):
+        with self.state_lock:
+            self.progress["in_progress"].remove(key)
+        counter = "done" if ok else "failed"
+        self.save_progress(**{counter: self.progress[counter] + 1})
+
+    # --- Main loop ---------------------------------------------------------
+
+    def select_rows(self):
+        """Baris yang perlu diproses. `processing` berarti crash di run sebelumnya."""
+        statuses = {"pending", "processing"}
+        if self.retry_failed:
+            statuses.add("failed")
+        _, rows = read_rows(self.csv_file)
+        selected = [r for r in rows if (r.get("status") or "pending").strip() in statuses]
+        if self.limit:
+            selected = selected[:self.limit]
+        return selected
+
+    def acquire_lock(self):
+        lease = get_state().try_lock(lock_name(self.output_dir), ttl=120, info={"pid": os.getpid()})
+        if lease is None:
+            holder = get_state().lock_holder(lock_name(self.output_dir)) or {}
+            raise RuntimeError(f"Pipeline already running ({holder.get('owner')})")
+        return lease.keepalive()
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self.acquire_lock():
+            self.state = read_json(state_path(self.output_dir), {}) or {}
+            rows = self.select_rows()
+            self.progress = {
+                "started_at": time.time(),
+                "total": len(rows),
+                "done": 0,
+                "failed": 0,
+                "skipped": 0,
+                "in_progress": [],
+            }
+            self.save_progress()
+            print(f"Processing {len(rows)} rows from {self.csv_file}", flush=True)
+
+            with ThreadPoolExecutor(max_workers=self.max_rows) as executor:
+                list(executor.map(self.process_row, rows))
+
+            self.save_progress(finished_at=time.time())
+            print(f"Finished: {self.progress['done']} done, {self.progress['failed']} failed, "
+                  f"{self.progress['rows_per_hour']} rows/hour", flush=True)
+            return self.progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless pipeline for pending rows in n8n.csv")
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--max-rows", type=int, default=2, help="Rows processed in parallel")
+    parser.add_argument("--limit", type=int, default=None, help="Process at most N rows")
+    parser.add_argument("--retry-failed", action="store_true", help="Also retry rows with status 'failed'")
+    parser.add_argument("--thumbnail-concurrency", type=int, default=DEFAULT_CONCURRENCY[THUMBNAIL_ENDPOINT])
+    parser.add_argument("--video-concurrency", type=int, default=DEFAULT_CONCURRENCY[VIDEO_ENDPOINT])
+    parser.add_argument("--audio-concurrency", type=int, default=DEFAULT_CONCURRENCY[AUDIO_ENDPOINT])
+    parser.add_argument("--voice", default="Jennifer", choices=["Jennifer", "Rigon"])
+    parser.add_argument("--fal-key", default=os.environ.get("FAL_KEY", ""))
+    args = parser.parse_args()
+
+    if not args.fal_key:
+        parser.error("FAL_KEY is required (--fal-key or FAL_KEY env)")
+    os.environ["FAL_KEY"] = args.fal_key
+
+    runner = PipelineRunner(
+        csv_file=args.csv,
+        output_dir=args.output_dir,
+        max_rows=args.max_rows,
+        limit=args.limit,
+        retry_failed=args.retry_failed,
+        voice=args.voice,
+        concurrency={
+            THUMBNAIL_ENDPOINT: args.thumbnail_concurrency,
+            VIDEO_ENDPOINT: args.video_concurrency,
+            AUDIO_ENDPOINT: args.audio_concurrency,
+        },
+    )
+    try:
+        runner.run()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
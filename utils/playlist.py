@@ -0,0 +1,282 @@
+"""Antrean putar (queue) untuk Music Player.
+
+Queue berisi daftar lagu + urutan putar (shuffle/repeat) dan disimpan per
+listener di downloads/.queues/<listener>.json, jadi rerun atau reload halaman
+tidak membangun ulang antrean. Lagu berikutnya di-prefetch di background
+(transcode + baca bytes ke memori) supaya perpindahan lagu hampir tanpa jeda.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.mp3 import mp3_info, read_tags
+from utils.profiling import timed
+from utils.shared_state import unique_tmp_path
+from utils.transcode import DOWNLOADS_DIR, PROFILES, get_cached_variant, submit_transcode, transcode
+
+QUEUE_DIR_NAME = ".queues"
+REPEAT_MODES = ["off", "all", "one"]
+PREFETCH_MAX_ITEMS = 3
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+_prefetched = OrderedDict()
+_inflight = {}
+_lock = threading.Lock()
+
+
+@timed("library:scan")
+def list_tracks(download_dir=DOWNLOADS_DIR):
+    """Semua file mp3 di library (termasuk subfolder, kecuali folder tersembunyi)"""
+    tracks = []
+    for root, dirs, files in os.walk(download_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        tracks.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".mp3"))
+    return tracks
+
+
+def group_tracks(tracks, by, download_dir=DOWNLOADS_DIR):
+    """Kelompokkan lagu per 'album' (tag ID3) atau 'folder'. Returns {nama: [path, ...]}"""
+    groups = {}
+    for path in tracks:
+        if by == "album":
+            name = read_tags(path).get("album") or "Unknown album"
+        else:
+            name = os.path.relpath(os.path.dirname(path), download_dir)
+            name = "(root)" if name == "." else name
+        groups.setdefault(name, []).append(path)
+    return dict(sorted(groups.items()))
+
+
+class PlayQueue:
+    """Antrean lagu dengan shuffle dan repeat (off/all/one)"""
+
+    def __init__(self, tracks=None, shuffle=False, repeat="off", source=""):
+        self.tracks = list(tracks or [])
+        self.shuffle = shuffle
+        self.repeat = repeat
+        self.source = source
+        self.order = list(range(len(self.tracks)))
+        self.position = 0
+        # Waktu mulai lagu sekarang, per sesi (tidak disimpan bersama queue)
+        self.started_at = None
+        if shuffle:
+            random.shuffle(self.order)
+
+    @property
+    def current(self):
+        if not self.tracks or self.position >= len(self.order):
+            return None
+        return self.tracks[self.order[self.position]]
+
+    def upcoming(self, limit=10):
+        """Lagu-lagu berikutnya sesuai urutan putar (tanpa wrap)"""
+        return [self.tracks[i] for i in self.order[self.position + 1:self.position + 1 + limit]]
+
+    def _next_position(self, auto):
+        if auto and self.repeat == "one":
+            return self.position
+        if self.position + 1 < len(self.order):
+            return self.position + 1
+        if self.repeat == "all" and self.order:
+            return 0
+        return None
+
+    def peek_next(self):
+        """Lagu yang akan diputar setelah lagu ini (untuk prefetch)"""
+        position = self._next_position(auto=True)
+        return self.tracks[self.order[position]] if position is not None else None
+
+    def advance(self, auto=False):
+        """Pindah ke lagu berikutnya. `auto` = lagu selesai sendiri (repeat one berlaku).
+
+        Returns path lagu baru, atau None kalau antrean habis.
+        """
+        position = self._next_position(auto)
+        if position is None:
+            self.position = len(self.order)
+            self.started_at = None
+            return None
+        self.position = position
+        self.started_at = time.time()
+        return self.current
+
+    def previous(self):
+        if self.position > 0:
+            self.position -= 1
+        self.started_at = time.time()
+        return self.current
+
+    def jump(self, track):
+        """Putar lagu tertentu dari antrean"""
+        index = self.tracks.index(track)
+        self.position = self.order.index(index)
+        self.started_at = time.time()
+        return self.current
+
+    def set_shuffle(self, shuffle):
+        """Ubah shuffle tanpa memutus lagu yang sedang diputar"""
+        if shuffle == self.shuffle:
+            return
+        self.shuffle = shuffle
+        # Lagu yang sudah diputar (dan lagu sekarang) tetap di urutannya; hanya sisanya yang diurutkan ulang
+        played = self.order[:self.position + 1] if self.current else self.order[:self.position]
+        played_set = set(played)
+        rest = [i for i in range(len(self.tracks)) if i not in played_set]
+        if shuffle:
+            random.shuffle(rest)
+        self.order = played + rest
+
+    def remove_missing(self):
+        """Buang lagu yang filenya sudah dihapus"""
+        exists = [os.path.exists(path) for path in self.tracks]
+        if all(exists):
+            return
+        # Index lama -> index baru, supaya tidak perlu list.index per lagu
+        new_index, kept = {}, []
+        for i, path in enumerate(self.tracks):
+            if exists[i]:
+                new_index[i] = len(kept)
+                kept.append(path)
+        current = self.order[self.position] if self.current else None
+        played = self.order[:self.position]
+        order = [new_index[i] for i in self.order if i in new_index]
+        self.tracks, self.order = kept, order
+        if current in new_index:
+            self.position = order.index(new_index[current])
+        else:
+            self.position = sum(1 for i in played if i in new_index)
+            self.started_at = time.time() if self.current else None
+
+    def to_dict(self):
+        return {
+            "tracks": self.tracks,
+            "order": self.order,
+            "position": self.position,
+            "shuffle": self.shuffle,
+            "repeat": self.repeat,
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        queue = cls(source=data.get("source", ""))
+        queue.tracks = data.get("tracks", [])
+        queue.order = data.get("order", list(range(len(queue.tracks))))
+        queue.position = data.get("position", 0)
+        queue.shuffle = data.get("shuffle", False)
+        queue.repeat = data.get("repeat", "off")
+        return queue
+
+
+# --- Simpan per listener ---------------------------------------------------
+
+def queue_path(listener, download_dir=DOWNLOADS_DIR):
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", listener.strip()) or "default"
+    return os.path.join(download_dir, QUEUE_DIR_NAME, f"{slug}.json")
+
+
+def load_queue(listener, download_dir=DOWNLOADS_DIR):
+    """Queue tersimpan untuk listener, atau None"""
+    try:
+        with open(queue_path(listener, download_dir), "r", encoding="utf-8") as f:
+            return PlayQueue.from_dict(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_queue(queue, listener, download_dir=DOWNLOADS_DIR):
+    path = queue_path(listener, download_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(queue.to_dict(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# --- Prefetch ----------------------------------------------------------------
+
+def track_duration(path):
+    """Durasi lagu dalam detik (cache utils.audio_analysis, kalau belum ada dari header MP3), atau None"""
+    from utils.audio_analysis import get_analysis
+
+    analysis = get_analysis(path, DOWNLOADS_DIR)
+    if analysis and analysis.get("duration"):
+        return analysis["duration"]
+    info = mp3_info(path)
+    return info["duration"] if info else None
+
+
+def _prefetch_key(path, profile):
+    stat = os.stat(path)
+    return (os.path.abspath(path), profile, stat.st_size, stat.st_mtime_ns)
+
+
+def _load(path, profile, background=False):
+    """Bytes + mime untuk diputar; kalau varian belum ada atau transcode gagal pakai file asli.
+
+    Di worker prefetch (`background`) varian di-transcode dulu; di jalur request
+    transcode hanya diantrekan (`submit_transcode`), tidak ditunggu.
+    """
+    if profile != "original":
+        try:
+            stream_path = get_cached_variant(path, profile)
+            if stream_path is None and background:
+                stream_path = transcode(path, profile)
+            elif stream_path is None:
+                submit_transcode(path, profile)
+            if stream_path:
+                with open(stream_path, "rb") as f:
+                    return f.read(), PROFILES[profile]["mime"]
+        except Exception:
+            pass
+    with open(path, "rb") as f:
+        return f.read(), "audio/mp3"
+
+
+def _prefetch(key, path, profile):
+    data = _load(path, profile, background=True)
+    with _lock:
+        _prefetched[key] = data
+        _prefetched.move_to_end(key)
+        while len(_prefetched) > PREFETCH_MAX_ITEMS:
+            _prefetched.popitem(last=False)
+    return data
+
+
+def prefetch(path, profile):
+    """Siapkan lagu di background (transcode + baca bytes). Returns Future."""
+    key = _prefetch_key(path, profile)
+    with _lock:
+        future = _inflight.get(key)
+        if future is not None and not future.done():
+            return future
+        future = _executor.submit(_prefetch, key, path, profile)
+        _inflight[key] = future
+    future.add_done_callback(lambda f: _discard_inflight(key, f))
+    return future
+
+
+def _discard_inflight(key, future):
+    with _lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def load_track(path, profile):
+    """Bytes + mime untuk lagu; pakai hasil prefetch kalau ada. Tidak pernah menunggu transcode."""
+    key = _prefetch_key(path, profile)
+    with _lock:
+        data = _prefetched.get(key)
+        if data is not None:
+            _prefetched.move_to_end(key)
+            return data
+        future = _inflight.get(key)
+    if future is not None and future.done() and future.exception() is None:
+        return future.result()
+    # Prefetch belum selesai: varian dari cache kalau ada, selain itu file asli
+    return _load(path, profile)
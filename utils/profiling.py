@@ -0,0 +1,263 @@
+"""Instrumentasi ringan per rerun halaman Streamlit.
+
+`profile_run()` dipasang di app.py di sekitar `pg.run()`: mencatat durasi
+setiap script run per halaman, plus waktu per *section* (`with section("csv:read")`
+atau decorator `@timed("...")` di kode yang sering jadi penyebab lambat:
+glob library, baca CSV, panggilan jaringan). Run yang lebih lama dari
+SLOW_RUN_SECONDS ditulis ke log JSONL yang di-rotate.
+
+Sampling profiler opsional (per sesi, dinyalakan dari halaman Metrics):
+thread kecil mengambil stack thread script setiap SAMPLE_INTERVAL detik,
+jadi kelihatan fungsi mana yang makan waktu tanpa harus menandai section.
+
+Contoh:
+    python -m utils.profiling --slow 20
+"""
+import argparse
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from utils.log_stream import JOB_LOG_DIR, tail_file
+
+SLOW_RUN_SECONDS = float(os.environ.get("SLOW_RUN_SECONDS", "1.0"))
+SLOW_RUN_LOG = os.environ.get("SLOW_RUN_LOG", os.path.join(JOB_LOG_DIR, "slow_runs.jsonl"))
+SLOW_RUN_LOG_BYTES = 5 * 1024 ** 2
+SLOW_RUN_LOG_BACKUPS = 3
+SAMPLE_INTERVAL = 0.005
+RECENT_RUNS = 200
+TOP_N = 10
+
+PROFILE_SESSION_KEY = "_profile_sampling"
+
+_local = threading.local()
+_metrics_lock = threading.Lock()
+_metrics = {}  # page -> {"runs", "seconds", "max", "recent": deque, "sections": Counter}
+_slow_logger = None
+_project_root = os.path.abspath(".")
+
+
+class _Run:
+    def __init__(self, page, sample):
+        self.page = page
+        self.started = time.perf_counter()
+        self.sections = Counter()
+        self.section_calls = Counter()
+        self.sampler = _Sampler(threading.get_ident()) if sample else None
+
+
+class _Sampler(threading.Thread):
+    """Ambil stack thread target secara berkala; hitung fungsi (inklusif) dan leaf (self)"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.inclusive = Counter()
+        self.leaf = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.leaf[_frame_label(frame)] += 1
+            seen = set()
+            while frame is not None:
+                # Inklusif hanya untuk kode project, supaya yang kelihatan fungsi kita sendiri
+                filename = frame.f_code.co_filename
+                if filename.startswith(_project_root) and "site-packages" not in filename:
+                    label = _frame_label(frame, line=False)
+                    if label not in seen:
+                        seen.add(label)
+                        self.inclusive[label] += 1
+                frame = frame.f_back
+
+    def stop(self):
+        self.stopped.set()
+        self.join(timeout=1)
+
+    def report(self, top=TOP_N):
+        """Top fungsi sebagai perkiraan detik (jumlah sample x interval)"""
+        return {
+            "samples": self.samples,
+            "inclusive": [(label, round(count * self.interval, 3)) for label, count in self.inclusive.most_common(top)],
+            "self": [(label, round(count * self.interval, 3)) for label, count in self.leaf.most_common(top)],
+        }
+
+
+def _frame_label(frame, line=True):
+    path = os.path.relpath(frame.f_code.co_filename, _project_root)
+    if path.startswith(".."):
+        path = os.path.basename(frame.f_code.co_filename)
+    location = f"{path}:{frame.f_lineno}" if line else path
+    return f"{frame.f_code.co_name} ({location})"
+
+
+class section:
+    """Catat waktu satu bagian rerun: `with section("library:glob"): ...`
+
+    Di luar `profile_run` (mis. CLI atau thread background) tidak melakukan apa-apa.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        run = getattr(_local, "run", None)
+        if run is not None:
+            run.sections[self.name] += time.perf_counter() - self.started
+            run.section_calls[self.name] += 1
+
+
+def timed(name):
+    """Decorator versi `section`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with section(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class profile_run:
+    """Ukur satu script run halaman. Dipakai di app.py: `with profile_run(pg.title): pg.run()`"""
+
+    def __init__(self, page, sample=False):
+        self.page = page
+        self.sample = sample
+
+    def __enter__(self):
+        self.run = _Run(self.page, self.sample)
+        _local.run = self.run
+        if self.run.sampler:
+            self.run.sampler.start()
+        return self.run
+
+    def __exit__(self, exc_type, exc, tb):
+        run = self.run
+        _local.run = None
+        seconds = time.perf_counter() - run.started
+        if run.sampler:
+            run.sampler.stop()
+        # st.rerun()/st.stop() keluar lewat exception; tetap dicatat sebagai run
+        outcome = "ok" if exc_type is None else exc_type.__name__
+        _record(run, seconds, outcome)
+        return False
+
+
+def _record(run, seconds, outcome):
+    with _metrics_lock:
+        page = _metrics.setdefault(run.page, {
+            "runs": 0, "seconds": 0.0, "max": 0.0, "slow": 0,
+            "recent": deque(maxlen=RECENT_RUNS), "sections": Counter(),
+        })
+        page["runs"] += 1
+        page["seconds"] += seconds
+        page["max"] = max(page["max"], seconds)
+        page["recent"].append(seconds)
+        page["sections"].update(run.sections)
+        if seconds >= SLOW_RUN_SECONDS:
+            page["slow"] += 1
+
+    if seconds >= SLOW_RUN_SECONDS or run.sampler:
+        entry = {
+            "time": time.time(),
+            "page": run.page,
+            "seconds": round(seconds, 3),
+            "outcome": outcome,
+            "sections": {name: round(value, 3) for name, value in run.sections.most_common(TOP_N)},
+            "section_calls": dict(run.section_calls),
+        }
+        if run.sampler:
+            entry["profile"] = run.sampler.report()
+        _log_slow(entry)
+
+
+def _log_slow(entry):
+    global _slow_logger
+    if not SLOW_RUN_LOG:
+        return
+    with _metrics_lock:
+        if _slow_logger is None:
+            os.makedirs(os.path.dirname(SLOW_RUN_LOG) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                SLOW_RUN_LOG, maxBytes=SLOW_RUN_LOG_BYTES, backupCount=SLOW_RUN_LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _slow_logger = logging.getLogger("streamlit_tools.slow_runs")
+            _slow_logger.propagate = False
+            _slow_logger.setLevel(logging.INFO)
+            _slow_logger.addHandler(handler)
+    _slow_logger.info(json.dumps(entry))
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def metrics():
+    """Ringkasan per halaman sejak proses start: runs, p50/p95/max, slow runs, top section"""
+    with _metrics_lock:
+        snapshot = {page: dict(data, recent=list(data["recent"]), sections=Counter(data["sections"]))
+                    for page, data in _metrics.items()}
+    result = {}
+    for page, data in sorted(snapshot.items()):
+        result[page] = {
+            "runs": data["runs"],
+            "avg": round(data["seconds"] / data["runs"], 3),
+            "p50": round(_percentile(data["recent"], 0.5), 3),
+            "p95": round(_percentile(data["recent"], 0.95), 3),
+            "max": round(data["max"], 3),
+            "slow": data["slow"],
+            "top_sections": {name: round(value, 3) for name, value in data["sections"].most_common(5)},
+        }
+    return result
+
+
+def recent_slow_runs(limit=20, log_path=SLOW_RUN_LOG):
+    """Entry terakhir dari log slow run (yang paling baru duluan)"""
+    if not log_path or not os.path.exists(log_path):
+        return []
+    entries = []
+    for line in tail_file(log_path, limit).splitlines():
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            pass
+    return entries[::-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show slow Streamlit reruns")
+    parser.add_argument("--slow", type=int, default=20, help="Number of recent slow runs to show")
+    parser.add_argument("--log", default=SLOW_RUN_LOG)
+    args = parser.parse_args()
+
+    for entry in recent_slow_runs(args.slow, args.log):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"]))
+        sections = ", ".join(f"{name} {value:.2f}s" for name, value in entry["sections"].items())
+        print(f"{stamp} {entry['page']:28} {entry['seconds']:7.2f}s  {sections}")
+        for label, value in (entry.get("profile") or {}).get("inclusive", [])[:5]:
+            print(f"    {value:6.2f}s  {label}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Rate limiter bersama per provider/endpoint (DeepSeek, fal).
+
+Semua sesi Streamlit di proses ini memakai limiter yang sama, jadi beberapa
+user atau bulk fill tidak saling berebut sampai kena 429. Tiap limiter punya:
+- token bucket requests-per-minute (rpm) dan tokens-per-minute (tpm)
+- batas request yang sedang berjalan (max_in_flight)
+- antrian adil per sesi (round-robin), satu sesi dengan 50 request tidak
+  membuat sesi lain menunggu sampai semuanya selesai
+- cooldown bersama dari header `Retry-After` kalau provider tetap membalas 429
+- retry dengan backoff untuk 5xx/408/409 dan error koneksi/timeout (client SDK
+  dibuat tanpa retry sendiri, jadi semua retry lewat sini dan tetap dibatasi)
+
+Batas default dari env (DEEPSEEK_RPM, DEEPSEEK_TPM, DEEPSEEK_MAX_IN_FLIGHT,
+FAL_RPM, FAL_TPM, FAL_MAX_IN_FLIGHT; 0 = tanpa batas). Override per endpoint
+lewat RATE_LIMITS, mis. '{"fal:fal-ai/imagen4/preview": {"rpm": 10}}'.
+
+Contoh:
+    result = call_with_limits("fal", endpoint, lambda: client.subscribe(endpoint, arguments=args))
+"""
+import email.utils
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+PROVIDER_LIMITS = {
+    "deepseek": {
+        "rpm": float(os.environ.get("DEEPSEEK_RPM", "60")),
+        "tpm": float(os.environ.get("DEEPSEEK_TPM", "0")),
+        "max_in_flight": int(os.environ.get("DEEPSEEK_MAX_IN_FLIGHT", "4")),
+    },
+    "fal": {
+        "rpm": float(os.environ.get("FAL_RPM", "30")),
+        "tpm": float(os.environ.get("FAL_TPM", "0")),
+        "max_in_flight": int(os.environ.get("FAL_MAX_IN_FLIGHT", "2")),
+    },
+}
+# Tanda provider kelebihan beban: cooldown untuk semua request ke limiter yang sama
+THROTTLE_STATUS = (429, 503)
+# Gagal sementara untuk request ini saja: retry dengan backoff tanpa menahan sesi lain
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+# Nama class exception koneksi/timeout (openai, httpx, requests, fal_client) tanpa perlu import modulnya
+CONNECTION_ERRORS = {"APIConnectionError", "APITimeoutError", "TransportError", "ConnectionError", "Timeout"}
+MAX_RETRIES = int(os.environ.get("RATE_LIMIT_RETRIES", "4"))
+MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", "300"))
+# Isi bucket maksimum = limit selama BURST_SECONDS (bukan satu menit penuh), supaya
+# request tersebar rata dan tidak meledak di awal menit
+BURST_SECONDS = float(os.environ.get("RATE_LIMIT_BURST_SECONDS", "10"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class RateLimitTimeout(Exception):
+    """Request menunggu di antrian lebih lama dari `max_wait`"""
+
+
+class _Bucket:
+    """Token bucket: terisi `per_minute` per menit, maksimum `per_minute * burst_seconds / 60`"""
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute * burst_seconds / 60) if per_minute else 0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        if self.per_minute:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Detik sampai `amount` tersedia (0 kalau sudah cukup)"""
+        if not self.per_minute:
+            return 0.0
+        # Request lebih besar dari kapasitas tetap boleh jalan saat bucket penuh
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) * 60 / self.per_minute)
+
+    def take(self, amount):
+        if self.per_minute:
+            self.level -= amount
+
+
+class Limiter:
+    """Limiter satu provider/endpoint dengan antrian round-robin per sesi"""
+
+    def __init__(self, name, rpm=0, tpm=0, max_in_flight=0):
+        self.name = name
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.cond = threading.Condition()
+        self.waiting = OrderedDict()  # session -> deque(ticket), urutan = giliran round-robin
+        self.tickets = itertools.count()
+        self.stats = {"granted": 0, "throttled": 0, "wait_seconds": 0.0, "max_wait": 0.0, "last_wait": 0.0}
+
+    def _next_ticket(self):
+        for queue in self.waiting.values():
+            return queue[0]
+        return None
+
+    def _ready_in(self, tokens, now):
+        """Detik sampai request berikutnya boleh jalan, None kalau menunggu slot in-flight"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return None
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.blocked_until - now, self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def _check(self, ticket, tokens):
+        """(boleh jalan sekarang, detik menunggu berikutnya) untuk ticket"""
+        if self._next_ticket() != ticket:
+            return False, 1.0
+        ready_in = self._ready_in(tokens, time.monotonic())
+        if ready_in is None:
+            return False, 1.0
+        return ready_in <= 0, min(ready_in, 1.0)
+
+    def acquire(self, session="default", tokens=0, max_wait=MAX_WAIT, on_wait=None):
+        """Tunggu giliran lalu ambil slot. Returns detik menunggu.
+
+        `on_wait(position, waited)` dipanggil setiap kali masih harus menunggu
+        (mis. untuk menampilkan posisi antrian di UI).
+        """
+        started = time.monotonic()
+        with self.cond:
+            ticket = next(self.tickets)
+            self.waiting.setdefault(session, deque()).append(ticket)
+            try:
+                while True:
+                    ready, timeout = self._check(ticket, tokens)
+                    if ready:
+                        break
+                    waited = time.monotonic() - started
+                    if waited > max_wait:
+                        raise RateLimitTimeout(f"{self.name}: waited {waited:.0f}s in queue")
+                    if on_wait:
+                        # Callback (mis. update UI Streamlit) di luar lock, supaya sesi lain
+                        # tidak ikut menunggu; exception dari callback tetap lewat finally di bawah
+                        position = self.position(ticket)
+                        self.cond.release()
+                        try:
+                            on_wait(position, waited)
+                        finally:
+                            self.cond.acquire()
+                        # Lock sempat dilepas: cek ulang supaya notify yang terlewat tidak ditunggu
+                        ready, timeout = self._check(ticket, tokens)
+                        if ready:
+                            break
+                    self.cond.wait(timeout)
+            finally:
+                queue = self.waiting[session]
+                queue.remove(ticket)
+                # Sesi yang baru dilayani pindah ke belakang antrian
+                del self.waiting[session]
+                if queue:
+                    self.waiting[session] = queue
+                self.cond.notify_all()
+
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            waited = time.monotonic() - started
+            self.stats["granted"] += 1
+            self.stats["wait_seconds"] += waited
+            self.stats["last_wait"] = waited
+            self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+            return waited
+
+    def release(self, estimated_tokens=0, used_tokens=None):
+        """Kembalikan slot; koreksi bucket tpm dengan token yang benar-benar terpakai"""
+        with self.cond:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.take(used_tokens - estimated_tokens)
+            self.cond.notify_all()
+
+    def throttle(self, seconds):
+        """Provider membalas 429: semua request ke limiter ini menunggu `seconds`"""
+        with self.cond:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.stats["throttled"] += 1
+            self.cond.notify_all()
+
+    def position(self, ticket):
+        """Posisi ticket di antrian round-robin (1 = berikutnya)"""
+        queues = [list(queue) for queue in self.waiting.values()]
+        order = [t for rank in itertools.zip_longest(*queues) for t in rank if t is not None]
+        return order.index(ticket) + 1 if ticket in order else 0
+
+    def snapshot(self):
+        with self.cond:
+            queued = sum(len(queue) for queue in self.waiting.values())
+            granted = self.stats["granted"]
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queued": queued,
+                "sessions_waiting": len(self.waiting),
+                "rpm": self.requests.per_minute,
+                "tpm": self.tokens.per_minute,
+                "blocked_for": max(0.0, round(self.blocked_until - time.monotonic(), 1)),
+                "granted": granted,
+                "throttled": self.stats["throttled"],
+                "avg_wait": round(self.stats["wait_seconds"] / granted, 2) if granted else 0.0,
+                "max_wait": round(self.stats["max_wait"], 2),
+                "last_wait": round(self.stats["last_wait"], 2),
+            }
+
+
+def _limits_for(provider, endpoint):
+    limits = dict(PROVIDER_LIMITS.get(provider, {}))
+    try:
+        overrides = json.loads(os.environ.get("RATE_LIMITS", "") or "{}")
+    except json.JSONDecodeError:
+        overrides = {}
+    limits.update(overrides.get(provider, {}))
+    limits.update(overrides.get(f"{provider}:{endpoint}", {}))
+    return limits
+
+
+def get_limiter(provider, endpoint=""):
+    """Limiter bersama (satu per proses) untuk provider/endpoint"""
+    key = f"{provider}:{endpoint}" if endpoint else provider
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = Limiter(key, **_limits_for(provider, endpoint))
+        return _registry[key]
+
+
+def all_limiters():
+    """Snapshot semua limiter yang sudah dipakai, untuk ditampilkan di UI"""
+    with _registry_lock:
+        limiters = dict(_registry)
+    return {key: limiter.snapshot() for key, limiter in sorted(limiters.items())}
+
+
+def current_session():
+    """ID sesi Streamlit yang sedang jalan (atau nama thread di luar Streamlit)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    except ImportError:
+        pass
+    return threading.current_thread().name
+
+
+def _status_and_headers(error):
+    """(status_code, headers) dari exception openai/fal_client/httpx/requests"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(error, "response_headers", None) or getattr(response, "headers", None) or {}
+    return status, headers
+
+
+def is_retryable(error):
+    """(boleh retry, status) untuk exception dari `fn()` di call_with_limits"""
+    status, _ = _status_and_headers(error)
+    if status is not None:
+        return status in RETRY_STATUS or status >= 500, status
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True, None
+    return any(cls.__name__ in CONNECTION_ERRORS for cls in type(error).__mro__), None
+
+
+def retry_after(headers):
+    """Detik dari header Retry-After (angka atau HTTP-date), None kalau tidak ada"""
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_limits(provider, endpoint, fn, tokens=0, used_tokens=None, session=None,
+                     max_retries=MAX_RETRIES, on_wait=None):
+    """Jalankan `fn()` lewat limiter provider/endpoint, retry 429/5xx/error koneksi dengan backoff.
+
+    `tokens` adalah perkiraan token untuk bucket tpm; `used_tokens(result)`
+    (opsional) mengembalikan token sebenarnya supaya bucket dikoreksi.
+    """
+    limiter = get_limiter(provider, endpoint)
+    session = session or current_session()
+    for attempt in range(max_retries + 1):
+        limiter.acquire(session, tokens, on_wait=on_wait)
+        used = None
+        backoff = 0.0
+        try:
+            result = fn()
+            used = used_tokens(result) if used_tokens else None
+            return result
+        except Exception as e:
+            retryable, status = is_retryable(e)
+            if not retryable or attempt >= max_retries:
+                raise
+            delay = retry_after(_status_and_headers(e)[1])
+            if delay is None:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if status in THROTTLE_STATUS:
+                limiter.throttle(delay)
+            else:
+                backoff = delay
+        finally:
+            limiter.release(tokens, used)
+        # Tunggu setelah slot dilepas, supaya request lain tetap jalan selama backoff
+        time.sleep(backoff)
+
+
+def wait_notice(placeholder, label):
+    """Callback `on_wait` yang menampilkan posisi antrian di placeholder Streamlit (st.empty())"""
+    last = {}
+
+    def on_wait(position, waited):
+        shown = (position, int(waited))
+        if last.get("shown") != shown:
+            last["shown"] = shown
+            placeholder.caption(f"⏳ {label}: queue position {position}, waited {waited:.0f}s")
+
+    return on_wait
@@ -0,0 +1,205 @@
+"""Preprocess gambar referensi sebelum dikirim ke Seedance.
+
+Thumbnail Imagen4 dan upload user bisa beberapa MB (PNG full-size), padahal
+Seedance hanya merender 480p/720p. Sebelum dipakai sebagai
+`reference_image_urls`, gambar di-crop tengah ke aspect ratio video, diperkecil
+sampai sisi pendeknya sama dengan resolusi target, lalu disimpan ulang sebagai
+JPEG.
+
+Varian disimpan di generated_files/references/ dengan nama dari hash isi file
+sumber + parameter, jadi gambar yang sama tidak diproses dua kali. URL hasil
+upload ke fal disimpan di state bersama (utils.shared_state) dengan TTL,
+supaya sesi/replica lain yang memakai referensi yang sama tidak upload ulang.
+Varian dan salinan gambar sumber (sources/) dibatasi REFERENCE_MAX_BYTES
+total; yang paling lama tidak dipakai dihapus duluan.
+
+Contoh:
+    python -m utils.reference_images thumb.png --resolution 720p --aspect-ratio 9:16
+"""
+import argparse
+import hashlib
+import os
+
+from utils.media import download_to_file, file_sha256
+from utils.profiling import timed
+from utils.shared_state import get_state, unique_tmp_path
+
+REFERENCE_DIR = os.environ.get("REFERENCE_DIR", os.path.join("generated_files", "references"))
+REFERENCE_PREPROCESS = os.environ.get("REFERENCE_PREPROCESS", "1") != "0"
+REFERENCE_QUALITY = int(os.environ.get("REFERENCE_QUALITY", "85"))
+REFERENCE_URL_TTL = 24 * 3600
+REFERENCE_MAX_BYTES = int(os.environ.get("REFERENCE_MAX_BYTES", str(512 * 1024 ** 2)))
+
+# Sisi pendek per resolusi Seedance
+RESOLUTION_SHORT_SIDE = {"480p": 480, "720p": 720, "1080p": 1080}
+
+
+def parse_ratio(aspect_ratio):
+    """"9:16" -> 0.5625 (lebar/tinggi), "auto" atau tidak valid -> None"""
+    try:
+        width, height = (float(part) for part in aspect_ratio.split(":"))
+        return width / height if width > 0 and height > 0 else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def variant_path(source_hash, resolution, aspect_ratio, quality=REFERENCE_QUALITY, reference_dir=None):
+    ratio = (aspect_ratio or "auto").replace(":", "x")
+    return os.path.join(reference_dir or REFERENCE_DIR, f"{source_hash[:20]}_{resolution}_{ratio}_q{quality}.jpg")
+
+
+@timed("reference:prepare")
+def prepare_reference(path, resolution="720p", aspect_ratio="auto", quality=REFERENCE_QUALITY, reference_dir=None):
+    """Path varian JPEG yang sudah di-crop/resize (dari cache kalau ada).
+
+    Kalau file bukan gambar yang bisa dibuka Pillow, atau hasilnya tidak lebih
+    kecil dari sumber yang memang sudah kecil, path asli dikembalikan.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    target = variant_path(file_sha256(path), resolution, aspect_ratio, quality, reference_dir)
+    if os.path.exists(target):
+        os.utime(target)
+        return target
+
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            changed = False
+
+            ratio = parse_ratio(aspect_ratio)
+            if ratio:
+                width, height = image.size
+                if width / height > ratio + 0.01:
+                    crop_width = round(height * ratio)
+                    left = (width - crop_width) // 2
+                    image = image.crop((left, 0, left + crop_width, height))
+                    changed = True
+                elif width / height < ratio - 0.01:
+                    crop_height = round(width / ratio)
+                    top = (height - crop_height) // 2
+                    image = image.crop((0, top, width, top + crop_height))
+                    changed = True
+
+            short_side = RESOLUTION_SHORT_SIDE.get(resolution)
+            if short_side and min(image.size) > short_side:
+                scale = short_side / min(image.size)
+                image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+                changed = True
+
+            # JPEG tidak punya alpha: tempel di atas background putih
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = unique_tmp_path(target, suffix=".part.jpg")
+            image.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    except (UnidentifiedImageError, OSError):
+        return path
+
+    if not changed and os.path.getsize(tmp_path) >= os.path.getsize(path):
+        os.remove(tmp_path)
+        return path
+    os.replace(tmp_path, target)
+    evict(reference_dir, keep=target)
+    return target
+
+
+def fetch_source(url, reference_dir=None):
+    """Salinan lokal gambar dari URL (di-cache per URL)"""
+    name = hashlib.sha1(url.encode()).hexdigest()[:16] + (os.path.splitext(url.split("?")[0])[1] or ".img")
+    path = os.path.join(reference_dir or REFERENCE_DIR, "sources", name)
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    download_to_file(url, path)
+    evict(reference_dir, keep=path)
+    return path
+
+
+def evict(reference_dir=None, max_bytes=REFERENCE_MAX_BYTES, keep=None):
+    """Hapus varian/sumber yang paling lama tidak dipakai sampai total di bawah max_bytes"""
+    root = reference_dir or REFERENCE_DIR
+    files = []
+    for cache_dir in (root, os.path.join(root, "sources")):
+        try:
+            names = os.listdir(cache_dir)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            path = os.path.join(cache_dir, name)
+            # File .part milik penulis yang sedang berjalan
+            if ".part" in name:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if os.path.isfile(path):
+                files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            removed += size
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def reference_url(source, upload, resolution="720p", aspect_ratio="auto", reference_dir=None):
+    """URL referensi untuk Seedance dari URL atau path lokal.
+
+    `upload(path) -> url`, biasanya `get_fal_client(key).upload_file`. Kalau
+    preprocessing dimatikan (REFERENCE_PREPROCESS=0), URL dikirim apa adanya.
+    """
+    is_url = source.startswith(("http://", "https://"))
+    if not REFERENCE_PREPROCESS:
+        return source if is_url else upload(source)
+
+    path = fetch_source(source, reference_dir) if is_url else source
+    prepared = prepare_reference(path, resolution, aspect_ratio, reference_dir=reference_dir)
+    if prepared == path and is_url:
+        return source  # tidak ada yang diperkecil, pakai URL asli
+
+    state = get_state()
+    key = f"reference:{os.path.basename(prepared) if prepared != path else file_sha256(path)}"
+    cached = state.get(key)
+    if cached:
+        return cached
+    url = upload(prepared)
+    state.set(key, url, ttl=REFERENCE_URL_TTL)
+    return url
+
+
+def reference_urls(sources, upload, resolution="720p", aspect_ratio="auto"):
+    return [reference_url(source, upload, resolution, aspect_ratio) for source in sources]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Downscale and recompress a Seedance reference image")
+    parser.add_argument("path")
+    parser.add_argument("--resolution", default="720p", choices=sorted(RESOLUTION_SHORT_SIDE))
+    parser.add_argument("--aspect-ratio", default="auto")
+    parser.add_argument("--quality", type=int, default=REFERENCE_QUALITY)
+    args = parser.parse_args()
+
+    prepared = prepare_reference(args.path, args.resolution, args.aspect_ratio, args.quality)
+    before, after = os.path.getsize(args.path), os.path.getsize(prepared)
+    print(f"{prepared}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
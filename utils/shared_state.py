@@ -0,0 +1,308 @@
+"""State bersama antar proses/replica: key-value dengan TTL, lock (lease), dan claim job.
+
+Backend dipilih lewat SHARED_STATE_URL:
+- sqlite:///path/ke/shared_state.db (default) - SQLite mode WAL. Taruh di
+  volume yang di-share semua replica di host yang sama (WAL butuh shared
+  memory, jadi jangan di network filesystem).
+- redis://host:6379/0 - Redis atau server yang kompatibel (Valkey, KeyDB,
+  Dragonfly), untuk replica di beberapa host. Butuh paket `redis`.
+
+Lock adalah lease dengan TTL: kalau proses pemegang mati, lock lepas sendiri
+setelah TTL habis. Job yang lama (pipeline) memperpanjang lease lewat
+`keepalive()`. Di SQLite, baris yang sudah expired dihapus sambil lalu saat
+menulis (paling sering sekali per PURGE_INTERVAL detik per proses), jadi
+tabel tidak tumbuh terus walau `--purge` tidak pernah dijalankan.
+
+Contoh:
+    with shared_lock("csv:n8n.csv"):
+        ... baca, ubah, tulis n8n.csv ...
+
+    python -m utils.shared_state --locks
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+SHARED_STATE_URL = os.environ.get(
+    "SHARED_STATE_URL", "sqlite:///" + os.path.join("generated_files", "shared_state.db")
+)
+LOCK_TTL = 60
+LOCK_POLL_INTERVAL = 0.1
+PURGE_INTERVAL = float(os.environ.get("SHARED_STATE_PURGE_INTERVAL", "60"))
+PURGE_BATCH = 1000
+
+_state = None
+_state_lock = threading.Lock()
+
+
+class LockTimeout(Exception):
+    """Lock masih dipegang proses lain setelah `timeout`"""
+
+
+def owner_id():
+    """Identitas pemegang lock: host (nama container), pid, thread, token acak"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    """Lock yang sedang dipegang. Dipakai sebagai context manager."""
+
+    def __init__(self, state, name, owner, ttl):
+        self.state = state
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self._stop = None
+
+    def renew(self):
+        """Perpanjang TTL. Returns False kalau lease sudah hilang (expired dan diambil proses lain)."""
+        return self.state.renew(self.name, self.owner, self.ttl)
+
+    def keepalive(self, interval=None):
+        """Perpanjang lease di background sampai `release()`, untuk job yang lebih lama dari TTL"""
+        self._stop = threading.Event()
+        interval = interval or self.ttl / 3
+
+        def run():
+            while not self._stop.wait(interval):
+                if not self.renew():
+                    break
+
+        threading.Thread(target=run, name=f"lease-{self.name}", daemon=True).start()
+        return self
+
+    def release(self):
+        if self._stop:
+            self._stop.set()
+        self.state.release(self.name, self.owner)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class _StateBase:
+    """Operasi lock di atas `add`/`release`/`renew` milik backend"""
+
+    def lock(self, name, ttl=LOCK_TTL, timeout=None, info=None):
+        """Ambil lock `name`. timeout=None menunggu selamanya, 0 = coba sekali.
+
+        Returns Lease, atau raise LockTimeout.
+        """
+        owner = owner_id()
+        value = {"owner": owner, "acquired_at": time.time(), **(info or {})}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.add(f"lock:{name}", value, ttl):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout(f"Lock {name!r} is held by {(self.lock_holder(name) or {}).get('owner')}")
+            time.sleep(LOCK_POLL_INTERVAL)
+        return Lease(self, name, owner, ttl)
+
+    def try_lock(self, name, ttl=LOCK_TTL, info=None):
+        """Lease kalau lock bebas, None kalau sedang dipegang"""
+        try:
+            return self.lock(name, ttl, timeout=0, info=info)
+        except LockTimeout:
+            return None
+
+    def lock_holder(self, name):
+        """Info pemegang lock (owner, acquired_at, ...) atau None kalau bebas"""
+        return self.get(f"lock:{name}")
+
+
+class SQLiteState(_StateBase):
+    """Backend SQLite (WAL). Satu koneksi per thread."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._next_purge = 0.0
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, json.dumps(value), expires_at),
+        )
+        self._maybe_purge()
+
+    def add(self, key, value, ttl=None):
+        """Set kalau key belum ada (atau sudah expired). Returns True kalau berhasil."""
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+            (key, json.dumps(value), now + ttl if ttl else None, now),
+        )
+        self._maybe_purge()
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def renew(self, name, owner, ttl):
+        cursor = self._conn().execute(
+            "UPDATE kv SET expires_at = ? WHERE key = ? AND json_extract(value, '$.owner') = ? AND expires_at > ?",
+            (time.time() + ttl, f"lock:{name}", owner, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, name, owner):
+        self._conn().execute(
+            "DELETE FROM kv WHERE key = ? AND json_extract(value, '$.owner') = ?", (f"lock:{name}", owner)
+        )
+
+    def keys(self, prefix=""):
+        rows = self._conn().execute(
+            "SELECT key FROM kv WHERE key LIKE ? ESCAPE '\\' AND (expires_at IS NULL OR expires_at > ?) ORDER BY key",
+            (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%", time.time()),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_expired(self, limit=None):
+        """Hapus baris expired (maksimum `limit` baris). Returns jumlah yang dihapus."""
+        if limit is None:
+            cursor = self._conn().execute(
+                "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+        else:
+            cursor = self._conn().execute(
+                "DELETE FROM kv WHERE rowid IN "
+                "(SELECT rowid FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ? LIMIT ?)",
+                (time.time(), limit),
+            )
+        return cursor.rowcount
+
+    def _maybe_purge(self):
+        """Purge sambil lalu setelah write, dibatasi PURGE_INTERVAL dan PURGE_BATCH supaya write tetap cepat"""
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        # Balapan antar thread cukup berakibat purge dobel, tidak perlu lock
+        self._next_purge = now + PURGE_INTERVAL
+        try:
+            self.purge_expired(PURGE_BATCH)
+        except sqlite3.OperationalError:
+            pass  # Database sibuk: coba lagi di interval berikutnya
+
+
+class RedisState(_StateBase):
+    """Backend Redis (atau server kompatibel)"""
+
+    _RENEW = "if cjson.decode(redis.call('GET', KEYS[1]) or '{}').owner == ARGV[1] then " \
+             "return redis.call('PEXPIRE', KEYS[1], ARGV[2]) else return 0 end"
+    _RELEASE = "if cjson.decode(redis.call('GET', KEYS[1]) or '{}').owner == ARGV[1] then " \
+               "return redis.call('DEL', KEYS[1]) else return 0 end"
+
+    def __init__(self, url, prefix="mytools:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self.prefix + key, json.dumps(value), nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def renew(self, name, owner, ttl):
+        return bool(self.client.eval(self._RENEW, 1, f"{self.prefix}lock:{name}", owner, int(ttl * 1000)))
+
+    def release(self, name, owner):
+        self.client.eval(self._RELEASE, 1, f"{self.prefix}lock:{name}", owner)
+
+    def keys(self, prefix=""):
+        return sorted(key.decode()[len(self.prefix):] for key in self.client.scan_iter(f"{self.prefix}{prefix}*"))
+
+    def purge_expired(self, limit=None):
+        return 0  # Redis menghapus key expired sendiri
+
+
+def open_state(url=SHARED_STATE_URL):
+    """Buat backend dari URL (sqlite:///path atau redis://...)"""
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+
+def get_state():
+    """Backend bersama (satu instance per proses)"""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = open_state()
+        return _state
+
+
+def shared_lock(name, ttl=LOCK_TTL, timeout=None, info=None):
+    """Shortcut `get_state().lock(...)`"""
+    return get_state().lock(name, ttl, timeout, info)
+
+
+def unique_tmp_path(path, suffix=".tmp"):
+    """Path tmp untuk atomic write yang unik antar replica (pid saja bisa sama di container lain)"""
+    return f"{path}.{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}{suffix}"
+
+
+def file_lock_name(path):
+    """Nama lock untuk satu file (path absolut, jadi sama di semua proses)"""
+    return f"file:{os.path.abspath(path)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the shared state backend")
+    parser.add_argument("--url", default=SHARED_STATE_URL)
+    parser.add_argument("--locks", action="store_true", help="List held locks")
+    parser.add_argument("--purge", action="store_true", help="Delete expired keys")
+    args = parser.parse_args()
+
+    state = open_state(args.url)
+    print(f"backend: {state.__class__.__name__} ({args.url})")
+    if args.purge:
+        print(f"purged {state.purge_expired()} expired keys")
+    if args.locks:
+        for key in state.keys("lock:"):
+            print(f"{key[len('lock:'):]}: {state.get(key)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Worker spotdl yang tetap hidup (warm) untuk download tanpa start interpreter baru.
+
+Setiap `spotdl <url>` membayar startup Python + import spotdl + setup session
+Spotify/YouTube (beberapa detik). Worker ini memuat spotdl sekali, lalu
+menerima job lewat koneksi lokal (`multiprocessing.connection`, TCP localhost
++ authkey, jalan juga di Windows). Output log dikirim balik per baris.
+
+Worker dijalankan otomatis oleh `run_in_worker()`; alamat, authkey dan pid
+disimpan di downloads/.worker/<host>/state.json supaya proses Streamlit lain bisa
+memakai worker yang sama. Health check (`ping`) dilakukan sebelum job; kalau
+worker mati atau tidak menjawab, worker di-restart. Worker berhenti sendiri
+setelah idle terlalu lama atau setelah sejumlah job (mencegah memory bloat).
+
+Contoh:
+    python -m utils.spotdl_worker serve
+    python -m utils.spotdl_worker ping
+"""
+import argparse
+import json
+import logging
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+# Per host: worker hanya bisa dihubungi dari container/host yang sama (127.0.0.1)
+WORKER_DIR = os.path.join("downloads", ".worker", socket.gethostname())
+STARTUP_TIMEOUT = float(os.environ.get("SPOTDL_WORKER_STARTUP_TIMEOUT", "90"))
+PING_TIMEOUT = 5
+IDLE_TIMEOUT = float(os.environ.get("SPOTDL_WORKER_IDLE_TIMEOUT", "1800"))
+MAX_JOBS = int(os.environ.get("SPOTDL_WORKER_MAX_JOBS", "100"))
+
+_start_lock = threading.Lock()
+
+
+# --- Sisi worker -------------------------------------------------------------
+
+def parse_spotdl_args(args):
+    """Parse argumen gaya CLI yang dipakai utils.spotify: [operation] query [--option [value]]"""
+    args = list(args)
+    operation = args.pop(0) if args and args[0] in ("save", "download") else "download"
+    options = {}
+    positional = []
+    while args:
+        arg = args.pop(0)
+        if arg.startswith("--"):
+            options[arg[2:].replace("-", "_")] = args.pop(0) if args and not args[0].startswith("--") else True
+        else:
+            positional.append(arg)
+    return operation, positional, options
+
+
+class _ConnectionLogHandler(logging.Handler):
+    """Kirim log spotdl ke client selama job berjalan"""
+
+    def __init__(self, conn):
+        super().__init__(logging.INFO)
+        self.conn = conn
+        self.setFormatter(logging.Formatter("%(message)s"))
+
+    def emit(self, record):
+        try:
+            self.conn.send({"type": "log", "line": self.format(record)})
+        except (OSError, EOFError):
+            pass
+
+
+class SpotdlService:
+    """spotdl yang sudah di-load: SpotifyClient + Downloader dibuat sekali"""
+
+    def __init__(self):
+        from spotdl.download.downloader import Downloader
+        from spotdl.utils.config import DOWNLOADER_OPTIONS, SPOTIFY_OPTIONS, create_settings_type, get_config
+        from spotdl.utils.spotify import SpotifyClient
+
+        try:
+            config = get_config()
+        except Exception:
+            config = {}
+        no_args = argparse.Namespace(config=False)
+        spotify_settings = create_settings_type(no_args, config, SPOTIFY_OPTIONS)
+        downloader_settings = create_settings_type(no_args, config, DOWNLOADER_OPTIONS)
+        downloader_settings["simple_tui"] = True
+
+        SpotifyClient.init(**spotify_settings)
+        self.downloader = Downloader(settings=downloader_settings)
+        self.output_template = self.downloader.settings["output"]
+        self.lock = threading.Lock()
+        self.jobs = 0
+
+    def run(self, args, cwd, conn):
+        """Jalankan satu job spotdl. Returns exit code."""
+        from spotdl.console.download import download
+        from spotdl.console.save import save
+
+        operation, query, options = parse_spotdl_args(args)
+        handler = _ConnectionLogHandler(conn)
+        with self.lock:
+            logging.getLogger().addHandler(handler)
+            settings = self.downloader.settings
+            try:
+                # Template output relatif terhadap folder download job ini
+                settings["output"] = os.path.join(cwd, self.output_template)
+                settings["save_errors"] = options.get("save_errors")
+                settings["save_file"] = options.get("save_file")
+                settings["preload"] = bool(options.get("preload"))
+                self.downloader.errors = []
+                if operation == "save":
+                    save(query, self.downloader)
+                else:
+                    download(query, self.downloader)
+                return 0
+            except Exception as e:
+                conn.send({"type": "log", "line": f"{e.__class__.__name__}: {e}"})
+                return 1
+            finally:
+                self.jobs += 1
+                logging.getLogger().removeHandler(handler)
+
+
+def serve(worker_dir=WORKER_DIR, idle_timeout=IDLE_TIMEOUT, max_jobs=MAX_JOBS):
+    """Load spotdl, buka listener, tulis state.json, lalu layani job sampai idle/max_jobs"""
+    authkey = bytes.fromhex(os.environ["SPOTDL_WORKER_AUTHKEY"])
+    logging.getLogger().setLevel(logging.INFO)
+    service = SpotdlService()
+    listener = Listener(("127.0.0.1", 0), authkey=authkey)
+    write_state(worker_dir, {
+        "address": list(listener.address),
+        "authkey": authkey.hex(),
+        "pid": os.getpid(),
+        "started_at": time.time(),
+    })
+
+    state = {"last_activity": time.time(), "busy": 0}
+    state_lock = threading.Lock()
+
+    def handle(conn):
+        with conn:
+            try:
+                request = conn.recv()
+            except (OSError, EOFError):
+                return
+            if request.get("op") == "ping":
+                conn.send({"type": "pong", "pid": os.getpid(), "jobs": service.jobs, "busy": state["busy"]})
+                return
+            with state_lock:
+                state["busy"] += 1
+            try:
+                rc = service.run(request["args"], request["cwd"], conn)
+                conn.send({"type": "done", "rc": rc})
+            except (OSError, EOFError):
+                pass
+            finally:
+                with state_lock:
+                    state["busy"] -= 1
+                    state["last_activity"] = time.time()
+
+    def watchdog():
+        while True:
+            time.sleep(5)
+            with state_lock:
+                idle = not state["busy"] and time.time() - state["last_activity"] > idle_timeout
+                retired = not state["busy"] and service.jobs >= max_jobs
+            if idle or retired:
+                clear_state(worker_dir, os.getpid())
+                os._exit(0)
+
+    threading.Thread(target=watchdog, daemon=True).start()
+    while True:
+        conn = listener.accept()
+        threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+# --- Sisi client -------------------------------------------------------------
+
+def state_path(worker_dir=WORKER_DIR):
+    return os.path.join(worker_dir, "state.json")
+
+
+def write_state(worker_dir, state):
+    os.makedirs(worker_dir, exist_ok=True)
+    path = state_path(worker_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def read_state(worker_dir=WORKER_DIR):
+    try:
+        with open(state_path(worker_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def clear_state(worker_dir=WORKER_DIR, pid=None):
+    state = read_state(worker_dir)
+    if state and (pid is None or state.get("pid") == pid):
+        try:
+            os.remove(state_path(worker_dir))
+        except FileNotFoundError:
+            pass
+
+
+def _connect(state):
+    return Client(tuple(state["address"]), authkey=bytes.fromhex(state["authkey"]))
+
+
+def ping(worker_dir=WORKER_DIR, timeout=PING_TIMEOUT):
+    """Health check. Returns info worker (pid, jobs, busy) atau None kalau tidak sehat."""
+    state = read_state(worker_dir)
+    if not state:
+        return None
+    try:
+        with _connect(state) as conn:
+            conn.send({"op": "ping"})
+            if not conn.poll(timeout):
+                return None
+            return conn.recv()
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+def stop(worker_dir=WORKER_DIR):
+    """Matikan worker (kalau ada)"""
+    state = read_state(worker_dir)
+    if state:
+        try:
+            os.kill(state["pid"], 15)
+        except OSError:
+            pass
+        clear_state(worker_dir)
+
+
+def start(worker_dir=WORKER_DIR, timeout=STARTUP_TIMEOUT):
+    """Start worker baru dan tunggu sampai menjawab ping. Returns True kalau berhasil."""
+    stop(worker_dir)
+    os.makedirs(worker_dir, exist_ok=True)
+    env = dict(os.environ, SPOTDL_WORKER_AUTHKEY=secrets.token_hex(32))
+    with open(os.path.join(worker_dir, "worker.log"), "ab") as log_file:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "utils.spotdl_worker", "serve", "--worker-dir", worker_dir],
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            env=env,
+        )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        state = read_state(worker_dir)
+        if state and state.get("pid") == process.pid and ping(worker_dir):
+            return True
+        time.sleep(0.2)
+    process.kill()
+    return False
+
+
+def ensure_worker(worker_dir=WORKER_DIR):
+    """Pastikan ada worker sehat (restart kalau perlu). Returns True kalau siap."""
+    with _start_lock:
+        if ping(worker_dir):
+            return True
+        return start(worker_dir)
+
+
+def worker_available():
+    """Worker hanya bisa dipakai kalau spotdl terinstal di interpreter ini"""
+    if os.environ.get("SPOTDL_WORKER", "1") == "0":
+        return False
+    from importlib.util import find_spec
+    return find_spec("spotdl") is not None
+
+
+def warm_up(worker_dir=WORKER_DIR):
+    """Start worker di background (mis. saat halaman dibuka) supaya download pertama langsung jalan"""
+    if worker_available() and not _start_lock.locked():
+        threading.Thread(target=ensure_worker, args=(worker_dir,), name="spotdl-warmup", daemon=True).start()
+
+
+def run_in_worker(args, cwd, on_output=None, worker_dir=WORKER_DIR):
+    """Jalankan argumen spotdl di worker. Returns exit code, atau None kalau worker tidak tersedia
+    (caller sebaiknya fallback ke subprocess `spotdl`).
+    """
+    if not worker_available() or not ensure_worker(worker_dir):
+        return None
+    try:
+        with _connect(read_state(worker_dir)) as conn:
+            conn.send({"op": "run", "args": list(args), "cwd": os.path.abspath(cwd)})
+            while True:
+                message = conn.recv()
+                if message["type"] == "log":
+                    if on_output:
+                        on_output(message["line"])
+                elif message["type"] == "done":
+                    return message["rc"]
+    except (OSError, EOFError, TypeError, ValueError):
+        # Worker mati di tengah job; ping berikutnya akan me-restart
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident spotdl worker")
+    parser.add_argument("command", choices=["serve", "start", "ping", "stop"])
+    parser.add_argument("--worker-dir", default=WORKER_DIR)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.worker_dir)
+    elif args.command == "start":
+        print("started" if ensure_worker(args.worker_dir) else "failed to start")
+    elif args.command == "ping":
+        info = ping(args.worker_dir)
+        print(info if info else "not running")
+        sys.exit(0 if info else 1)
+    elif args.command == "stop":
+        stop(args.worker_dir)
+
+
+if __name__ == "__main__":
+    main()
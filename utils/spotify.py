@@ -0,0 +1,232 @@
+"""Core Spotify downloader (spotdl) yang bisa dipakai halaman Streamlit maupun CLI.
+
+Untuk URL Spotify, hasil pencarian metadata + match YouTube disimpan sebagai
+file `.spotdl` (`spotdl save --preload`) di downloads/.matches/, lalu download
+dijalankan dari file itu. Run berikutnya dan retry tidak perlu resolve ulang
+playlist; track yang gagal di-retry dari daftar match yang sama.
+
+Contoh:
+    python -m utils.spotify https://open.spotify.com/track/... --concurrency 2
+    python -m utils.spotify --file urls.txt
+    python -m utils.spotify https://open.spotify.com/playlist/... --refresh-matches
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.media import check_ffmpeg
+from utils.shared_state import get_state, shared_lock, unique_tmp_path
+from utils.spotdl_worker import run_in_worker
+
+DOWNLOAD_DIR = "downloads"
+MATCH_DIR_NAME = ".matches"
+# Playlist bisa berubah; match list di-resolve ulang setelah umur ini
+MATCH_MAX_AGE = float(os.environ.get("SPOTDL_MATCH_MAX_AGE", str(7 * 24 * 3600)))
+RETRY_PASSES = 1
+SPOTIFY_TRACK_URL = re.compile(r"https://open\.spotify\.com/track/\w+")
+
+
+def _run(command, cwd, on_output=None):
+    """Jalankan command, kirim setiap baris output ke `on_output`. Returns exit code."""
+    process = subprocess.Popen(
+        command,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True
+    )
+
+    while True:
+        output = process.stdout.readline()
+        if output == '' and process.poll() is not None:
+            break
+        if output and on_output:
+            on_output(output.strip())
+
+    return process.poll()
+
+
+def _spotdl(args, cwd, on_output=None):
+    """Jalankan spotdl lewat worker yang sudah warm; fallback ke proses `spotdl` baru"""
+    rc = run_in_worker(args, cwd, on_output)
+    if rc is None:
+        rc = _run(["spotdl", *args], cwd, on_output)
+    return rc
+
+
+def match_cache_path(spotify_url, download_dir=DOWNLOAD_DIR):
+    """Lokasi file .spotdl untuk URL (query string seperti ?si=... diabaikan)"""
+    key = hashlib.sha256(spotify_url.split("?")[0].encode()).hexdigest()[:16]
+    return os.path.join(os.path.abspath(download_dir), MATCH_DIR_NAME, f"{key}.spotdl")
+
+
+def load_matches(path):
+    """Daftar lagu dari file .spotdl (entry null = gagal match saat save)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [song for song in json.load(f) if song]
+
+
+def _write_matches(songs, path):
+    tmp_path = unique_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(songs, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def save_matches(spotify_url, download_dir=DOWNLOAD_DIR, on_output=None, refresh=False):
+    """Resolve URL ke file .spotdl (pakai cache kalau masih baru). Returns path, atau None kalau gagal."""
+    path = match_cache_path(spotify_url, download_dir)
+    if not refresh and os.path.exists(path) and time.time() - os.path.getmtime(path) < MATCH_MAX_AGE:
+        if on_output:
+            on_output(f"Using cached match list ({len(load_matches(path))} tracks): {path}")
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = unique_tmp_path(path, ".part.spotdl")
+    rc = _spotdl(["save", spotify_url, "--save-file", tmp_path, "--preload"], download_dir, on_output)
+    if rc != 0 or not os.path.exists(tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+    return path
+
+
+def _failed_urls(errors_path):
+    """URL track yang gagal dari file --save-errors spotdl"""
+    if not os.path.exists(errors_path):
+        return set()
+    with open(errors_path, "r", encoding="utf-8") as f:
+        return set(SPOTIFY_TRACK_URL.findall(f.read()))
+
+
+def download_matches(path, download_dir=DOWNLOAD_DIR, on_output=None):
+    """Download semua lagu di file .spotdl, retry yang gagal dari match list yang sama.
+
+    Returns the spotdl exit code of the last pass.
+    """
+    errors_path = f"{path}.errors.txt"
+    query_path = path
+    rc = 0
+    for attempt in range(RETRY_PASSES + 1):
+        if os.path.exists(errors_path):
+            os.remove(errors_path)
+        rc = _spotdl(["download", query_path, "--save-errors", errors_path], download_dir, on_output)
+        failed = _failed_urls(errors_path)
+        if not failed:
+            break
+
+        songs = load_matches(path)
+        if attempt == RETRY_PASSES:
+            # Match YouTube yang terus gagal dibuang, run berikutnya hanya resolve ulang lagu ini
+            for song in songs:
+                if song.get("url") in failed:
+                    song["download_url"] = None
+            _write_matches(songs, path)
+            rc = rc or 1
+            break
+        if on_output:
+            on_output(f"Retrying {len(failed)} failed track(s) from cached matches")
+        query_path = f"{path}.retry.spotdl"
+        _write_matches([song for song in songs if song.get("url") in failed], query_path)
+
+    for leftover in (errors_path, f"{path}.retry.spotdl"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return rc
+
+
+def run_spotdl(spotify_url, download_dir=DOWNLOAD_DIR, on_output=None, use_cache=True, refresh=False):
+    """Jalankan spotdl untuk satu URL. Setiap baris output dikirim ke `on_output`.
+
+    URL Spotify memakai match cache (.spotdl); URL lain atau kalau `spotdl save`
+    gagal langsung memakai `spotdl <url>`.
+
+    Returns the spotdl exit code.
+    """
+    os.makedirs(download_dir, exist_ok=True)
+
+    # URL yang sama dari sesi/replica lain: tunggu selesai dulu (file yang sudah ada di-skip spotdl)
+    lock_name = f"spotdl:{os.path.abspath(download_dir)}:{spotify_url.split('?')[0]}"
+    lease = get_state().try_lock(lock_name, ttl=120)
+    if lease is None:
+        if on_output:
+            on_output("Another download of this URL is running, waiting for it to finish...")
+        lease = shared_lock(lock_name, ttl=120)
+    with lease.keepalive():
+        if use_cache and spotify_url.startswith("https://open.spotify.com/"):
+            path = save_matches(spotify_url, download_dir, on_output, refresh=refresh)
+            if path:
+                return download_matches(path, download_dir, on_output)
+            if on_output:
+                on_output("Could not save match list, downloading directly")
+
+        # We run it in the downloads directory so files are saved there
+        return _spotdl([spotify_url], download_dir, on_output)
+
+
+def latest_download(download_dir=DOWNLOAD_DIR):
+    """Path mp3 yang paling baru dibuat, atau None"""
+    list_of_files = glob.glob(os.path.join(download_dir, '*.mp3'))
+    if not list_of_files:
+        return None
+    return max(list_of_files, key=os.path.getctime)
+
+
+def download_many(urls, download_dir=DOWNLOAD_DIR, concurrency=1, use_cache=True, refresh=False):
+    """Download beberapa URL secara paralel. Returns {url: exit_code}."""
+    def download(url):
+        return url, run_spotdl(
+            url, download_dir, on_output=lambda line: print(f"[{url}] {line}", flush=True),
+            use_cache=use_cache, refresh=refresh
+        )
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(executor.map(download, urls))
+
+
+def read_url_list(path):
+    """Baca daftar URL dari file (satu per baris, '#' untuk komentar)"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk Spotify downloader (spotdl)")
+    parser.add_argument("urls", nargs="*", help="Spotify URLs (song, album, or playlist)")
+    parser.add_argument("--file", help="File with one URL per line")
+    parser.add_argument("--output-dir", default=DOWNLOAD_DIR)
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of spotdl processes in parallel")
+    parser.add_argument("--no-match-cache", action="store_true", help="Run plain 'spotdl <url>' without .spotdl match files")
+    parser.add_argument("--refresh-matches", action="store_true", help="Re-resolve cached match lists")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        urls += read_url_list(args.file)
+    if not urls:
+        parser.error("No URLs given")
+    if not check_ffmpeg():
+        print("FFmpeg is not installed or not found in PATH.", file=sys.stderr)
+        sys.exit(1)
+
+    results = download_many(
+        urls, args.output_dir, args.concurrency,
+        use_cache=not args.no_match_cache, refresh=args.refresh_matches
+    )
+    failed = [url for url, rc in results.items() if rc != 0]
+    print(f"Finished: {len(results) - len(failed)} ok, {len(failed)} failed")
+    for url in failed:
+        print(f"FAILED: {url}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
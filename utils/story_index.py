@@ -0,0 +1,261 @@
+"""Index near-duplicate untuk kolom `story` di n8n.csv (MinHash + LSH).
+
+Setiap story dipecah jadi shingle (3 kata berurutan), lalu diringkas jadi
+signature MinHash. Signature dibagi ke beberapa band (LSH), jadi cek story
+baru hanya membandingkan kandidat yang satu bucket, bukan semua baris.
+Signature disimpan di <csv>.stories.json dan hanya dihitung untuk story yang
+belum pernah di-index, jadi cek tetap murah walau dataset bertambah. Index
+juga menyimpan posisi change feed (utils.change_feed) terakhir, jadi sync
+hanya membaca entry sejak posisi itu; CSV penuh baru dibaca ulang kalau feed
+diganti/dipadatkan (generasi baru) atau belum ada.
+
+Story tanpa kata sama sekali (kosong, hanya tanda baca/emoji) tidak di-index
+dan tidak pernah dianggap duplikat.
+
+Contoh:
+    python -m utils.story_index --check "A fox runs through the snowy forest at dawn"
+    python -m utils.story_index --duplicates
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import unicodedata
+
+from utils.change_feed import feed_position, read_changes
+from utils.profiling import section
+from utils.shared_state import unique_tmp_path
+
+CSV_FILE = "n8n.csv"
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+# Naikkan kalau cara membuat shingle berubah: signature lama di disk dibuang
+SHINGLE_VERSION = 2
+DUPLICATE_THRESHOLD = float(os.environ.get("STORY_DUP_THRESHOLD", "0.7"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Set n-gram kata (NFKC + casefold, tanpa tanda baca, semua aksara)"""
+    words = re.findall(r"\w+", unicodedata.normalize("NFKC", str(text)).casefold())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text):
+    """Signature MinHash (NUM_PERM nilai), None kalau story tidak punya shingle"""
+    hashes = [
+        struct.unpack("<Q", hashlib.blake2b(shingle.encode(), digest_size=8).digest())[0]
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return None
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(signature_a, signature_b):
+    """Perkiraan Jaccard similarity dari dua signature"""
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / NUM_PERM
+
+
+def story_key(text):
+    return hashlib.sha1(str(text).strip().encode("utf-8")).hexdigest()[:16]
+
+
+class StoryIndex:
+    """Index MinHash/LSH untuk story, disinkronkan dengan CSV"""
+
+    def __init__(self, csv_file=CSV_FILE, threshold=DUPLICATE_THRESHOLD, feed_dir=None):
+        self.csv_file = csv_file
+        self.path = f"{csv_file}.stories.json"
+        self.threshold = threshold
+        self.feed_dir = feed_dir
+        self.feed = None  # {"generation": g, "offset": n} posisi change feed yang sudah diterapkan
+        self.entries = {}  # story_key -> {"row": row_number, "story": str, "sig": [...]}
+        self.buckets = {}  # (band, hash band) -> set(story_key)
+
+    # --- Persistensi -------------------------------------------------------
+
+    @classmethod
+    def load(cls, csv_file=CSV_FILE, threshold=DUPLICATE_THRESHOLD, feed_dir=None):
+        """Load index dari disk lalu sinkronkan dengan isi CSV saat ini"""
+        index = cls(csv_file, threshold, feed_dir)
+        try:
+            with open(index.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        if data.get("shingle_version") == SHINGLE_VERSION:
+            index.feed = data.get("feed")
+            for key, entry in data.get("entries", {}).items():
+                index._insert(key, entry)
+        with section("story_index:sync"):
+            if index.sync():
+                index.save()
+        return index
+
+    def save(self):
+        tmp_path = unique_tmp_path(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"num_perm": NUM_PERM, "shingle_version": SHINGLE_VERSION, "feed": self.feed,
+                       "entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def sync(self):
+        """Terapkan perubahan CSV sejak sync terakhir. Returns True kalau index berubah."""
+        if self.feed is not None:
+            entries, next_offset, generation = read_changes(
+                self.csv_file, self.feed["offset"], limit=None, feed_dir=self.feed_dir,
+                generation=self.feed["generation"],
+            )
+            if generation == self.feed["generation"] and next_offset >= self.feed["offset"]:
+                return self._apply_changes(entries, next_offset)
+        return self._sync_csv()
+
+    def _apply_changes(self, entries, next_offset):
+        """Sync incremental dari entry change feed (append/update per row_number)"""
+        changed = next_offset != self.feed["offset"]
+        self.feed = {**self.feed, "offset": next_offset}
+        by_row = {str(entry["row"]): key for key, entry in self.entries.items()}
+        for change in entries:
+            row_number = change.get("row_number")
+            story = str((change.get("row") or {}).get("story") or "").strip()
+            old_key = by_row.get(str(row_number))
+            new_key = story_key(story) if story else None
+            if old_key == new_key:
+                continue
+            if old_key is not None and old_key in self.entries:
+                self._remove(old_key)
+                del by_row[str(row_number)]
+            if new_key is not None and new_key not in self.entries and self.add(story, row_number):
+                by_row[str(row_number)] = new_key
+            changed = True
+        return changed
+
+    def _sync_csv(self):
+        """Sync penuh: tambah story baru dan buang story yang sudah tidak ada di CSV"""
+        # Posisi feed diambil sebelum membaca CSV: perubahan sesudahnya diterapkan lagi di sync berikutnya
+        generation, offset = feed_position(self.csv_file, self.feed_dir)
+        feed = None if generation is None else {"generation": generation, "offset": offset}
+        try:
+            with open(self.csv_file, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        except FileNotFoundError:
+            rows = []
+        current = {}
+        for row in rows:
+            story = (row.get("story") or "").strip()
+            if story:
+                current[story_key(story)] = (row.get("row_number"), story)
+
+        changed = feed != self.feed
+        self.feed = feed
+        for key in set(self.entries) - set(current):
+            self._remove(key)
+            changed = True
+        for key, (row_number, story) in current.items():
+            if key not in self.entries and self.add(story, row_number):
+                changed = True
+        return changed
+
+    # --- Index -------------------------------------------------------------
+
+    def _bands(self, signature):
+        rows = NUM_PERM // BANDS
+        for band in range(BANDS):
+            yield band, hash(tuple(signature[band * rows:(band + 1) * rows]))
+
+    def _insert(self, key, entry):
+        self.entries[key] = entry
+        for bucket in self._bands(entry["sig"]):
+            self.buckets.setdefault(bucket, set()).add(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        for bucket in self._bands(entry["sig"]):
+            self.buckets.get(bucket, set()).discard(key)
+
+    def find_duplicate(self, story, signature=None):
+        """Story paling mirip yang melewati threshold. Returns (entry, similarity) atau None."""
+        signature = signature or minhash(story)
+        if signature is None:
+            return None
+        key = story_key(story)
+        if key in self.entries:
+            return self.entries[key], 1.0
+        candidates = set()
+        for bucket in self._bands(signature):
+            candidates |= self.buckets.get(bucket, set())
+        best = None
+        for candidate in candidates:
+            score = similarity(signature, self.entries[candidate]["sig"])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (self.entries[candidate], score)
+        return best
+
+    def add(self, story, row_number=None):
+        """Masukkan story ke index. Returns False kalau story tidak punya shingle (tidak di-index)."""
+        key = story_key(story)
+        if key in self.entries:
+            return True
+        signature = minhash(story)
+        if signature is None:
+            return False
+        self._insert(key, {"row": row_number, "story": str(story).strip(), "sig": signature})
+        return True
+
+    def filter_new(self, stories):
+        """Pisahkan story baru jadi unik vs duplikat (terhadap index dan sesama batch).
+
+        Returns (list index yang unik, {index: (entry, similarity)} untuk duplikat).
+        Index tidak diubah; panggil `add` setelah baris benar-benar disimpan.
+        """
+        batch = StoryIndex(self.csv_file, self.threshold)
+        batch.entries, batch.buckets = dict(self.entries), {k: set(v) for k, v in self.buckets.items()}
+        unique, duplicates = [], {}
+        for i, story in enumerate(stories):
+            match = batch.find_duplicate(story)
+            if match:
+                duplicates[i] = match
+            else:
+                unique.append(i)
+                batch.add(story, row_number=f"new #{i + 1}")
+        return unique, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate story index for n8n.csv")
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument("--check", help="Story text to check against the index")
+    parser.add_argument("--duplicates", action="store_true", help="List near-duplicate pairs already in the CSV")
+    args = parser.parse_args()
+
+    index = StoryIndex.load(args.csv, args.threshold)
+    print(f"{len(index.entries)} stories indexed ({index.path})")
+    if args.check:
+        match = index.find_duplicate(args.check)
+        if match:
+            print(f"DUPLICATE of row {match[0]['row']} ({match[1]:.0%}): {match[0]['story']}")
+        else:
+            print("unique")
+    if args.duplicates:
+        seen = StoryIndex(args.csv, args.threshold)
+        for entry in index.entries.values():
+            match = seen.find_duplicate(entry["story"], entry["sig"])
+            if match:
+                print(f"row {entry['row']} ~ row {match[0]['row']} ({match[1]:.0%})")
+            seen._insert(story_key(entry["story"]), entry)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Core TikTok downloader (tanpa watermark) yang bisa dipakai halaman Streamlit maupun CLI.
+
+Contoh:
+    python -m utils.tiktok https://www.tiktok.com/@user/video/123 --concurrency 4
+    python -m utils.tiktok --file urls.txt --output-dir tiktok
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils.media import download_to_file, probe_url
+
+DOWNLOAD_DIR = "tiktok_downloads"
+
+# Budget ukuran video: HD dipakai kalau muat, kalau tidak SD. 0 = tanpa batas.
+# Budget bandwidth = perkiraan bytes/detik x maksimal detik download.
+TIKTOK_MAX_BYTES = int(os.environ.get("TIKTOK_MAX_BYTES", "0"))
+TIKTOK_BANDWIDTH_BPS = float(os.environ.get("TIKTOK_BANDWIDTH_BPS", "0"))
+TIKTOK_MAX_SECONDS = float(os.environ.get("TIKTOK_MAX_SECONDS", "0"))
+
+# Alternative free API endpoints (bisa di-override lewat env, mis. untuk benchmark offline)
+API_ENDPOINTS = [
+    os.environ.get("TIKWM_API_URL", "https://www.tikwm.com/api/"),
+    os.environ.get("TIKLYDOWN_API_URL", "https://api.tiklydown.eu.org/api/download")
+]
+
+
+# Function to extract video ID from TikTok URL
+def extract_video_id(url):
+    """Extract video ID from TikTok URL"""
+    try:
+        # Handle different TikTok URL formats
+        if "vm.tiktok.com" in url or "vt.tiktok.com" in url:
+            return url
+        elif "/video/" in url:
+            return url
+        else:
+            return url
+    except:
+        return None
+
+
+def size_budget(max_bytes=TIKTOK_MAX_BYTES, bandwidth=TIKTOK_BANDWIDTH_BPS, max_seconds=TIKTOK_MAX_SECONDS):
+    """Batas ukuran download dalam bytes, atau None kalau tidak dibatasi"""
+    budgets = [max_bytes] if max_bytes else []
+    if bandwidth and max_seconds:
+        budgets.append(bandwidth * max_seconds)
+    return min(budgets) if budgets else None
+
+
+def choose_variant(candidates, budget=None):
+    """Pilih varian video dari [(label, url, size_hint), ...] (urut preferensi, HD duluan).
+
+    Semua kandidat di-probe paralel (HEAD: Content-Length + Accept-Ranges).
+    Varian pertama yang muat budget dipilih; kalau tidak ada yang muat, yang
+    terkecil. Returns (label, url, probe).
+    """
+    candidates = [(label, url, hint) for label, url, hint in candidates if url]
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        probes = list(executor.map(lambda c: probe_url(c[1]), candidates))
+    for probe, (_, _, hint) in zip(probes, candidates):
+        if probe["size"] is None and hint:
+            probe["size"] = int(hint)
+
+    pairs = list(zip(candidates, probes))
+    for (label, url, _), probe in pairs:
+        if budget is None or probe["size"] is None or probe["size"] <= budget:
+            return label, url, probe
+    (label, url, _), probe = min(pairs, key=lambda pair: pair[1]["size"])
+    return label, url, probe
+
+
+def _with_variant(result, candidates):
+    """Tambahkan varian terpilih (download_url, variant, download_size, download_probe) ke result"""
+    candidates = [c for c in candidates if c[1]]
+    if len({c[1] for c in candidates}) > 1:
+        label, url, probe = choose_variant(candidates, size_budget())
+    elif candidates:
+        label, url, probe = candidates[0][0], candidates[0][1], None
+    else:
+        label, url, probe = None, None, None
+    result.update({
+        "download_url": url,
+        "variant": label,
+        "download_size": probe["size"] if probe else None,
+        "download_probe": probe,
+    })
+    return result
+
+
+# Function to download TikTok video without watermark
+def download_tiktok_video(url, on_warning=None):
+    """Download TikTok video without watermark using API"""
+    try:
+        # Try the first free API (tikwm.com)
+        try:
+            response = requests.post(
+                API_ENDPOINTS[0],
+                data={
+                    "url": url,
+                    "hd": 1
+                },
+                headers={
+                    "Content-Type": "application/x-www-form-urlencoded"
+                },
+                timeout=30
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                if data.get("code") == 0:
+                    video = data["data"]
+                    return _with_variant({
+                        "success": True,
+                        "video_url": video["play"],
+                        "cover": video["cover"],
+                        "title": video["title"],
+                        "author": video["author"]["unique_id"],
+                        "duration": video["duration"],
+                    }, [
+                        ("HD", video.get("hdplay"), video.get("hd_size")),
+                        ("SD", video["play"], video.get("size")),
+                    ])
+        except Exception as e:
+            if on_warning:
+                on_warning("Primary API failed, trying alternative...")
+
+        # Try second alternative API
+        try:
+            response = requests.get(
+                API_ENDPOINTS[1],
+                params={"url": url},
+                timeout=30
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                if data.get("status") == "success":
+                    video_data = data.get("video", {})
+                    return _with_variant({
+                        "success": True,
+                        "video_url": video_data.get("noWatermark"),
+                        "cover": data.get("cover"),
+                        "title": data.get("title", "TikTok Video"),
+                        "author": data.get("author", {}).get("username", "Unknown"),
+                        "duration": data.get("duration", 0),
+                    }, [("HD", video_data.get("noWatermark"), None)])
+        except Exception as e:
+            pass
+
+        return {
+            "success": False,
+            "error": "All API endpoints failed. Please try again later."
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error: {str(e)}"
+        }
+
+
+def video_file_name(result, url):
+    """Nama file unik per video: id dari URL (/video/<id>), kalau tidak ada hash URL"""
+    match = re.search(r"/video/(\d+)", url)
+    video_id = match.group(1) if match else hashlib.sha1(url.encode()).hexdigest()[:12]
+    return f"tiktok_{result['author']}_{result['duration']}s_{video_id}.mp4"
+
+
+def save_tiktok_video(url, download_dir=DOWNLOAD_DIR):
+    """Resolve URL lalu simpan video ke disk. Returns result dict dengan key `path`."""
+    result = download_tiktok_video(url)
+    if not result["success"]:
+        return result
+    try:
+        path = os.path.join(download_dir, video_file_name(result, url))
+        download_to_file(result["download_url"], path, timeout=30, probe=result.get("download_probe"))
+        result["path"] = path
+    except Exception as e:
+        return {"success": False, "error": f"Error: {str(e)}"}
+    return result
+
+
+def download_many(urls, download_dir=DOWNLOAD_DIR, concurrency=4):
+    """Download beberapa video secara paralel. Returns {url: result}."""
+    def download(url):
+        result = save_tiktok_video(url, download_dir)
+        if result["success"]:
+            print(f"[{url}] saved -> {result['path']}", flush=True)
+        else:
+            print(f"[{url}] {result['error']}", file=sys.stderr, flush=True)
+        return url, result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(executor.map(download, urls))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk TikTok downloader (no watermark)")
+    parser.add_argument("urls", nargs="*", help="TikTok video URLs")
+    parser.add_argument("--file", help="File with one URL per line")
+    parser.add_argument("--output-dir", default=DOWNLOAD_DIR)
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of downloads in parallel")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            urls += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not urls:
+        parser.error("No URLs given")
+
+    results = download_many(urls, args.output_dir, args.concurrency)
+    failed = [url for url, result in results.items() if not result["success"]]
+    print(f"Finished: {len(results) - len(failed)} ok, {len(failed)} failed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
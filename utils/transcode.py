@@ -0,0 +1,227 @@
+"""Varian streaming bitrate rendah untuk Music Player.
+
+File asli di downloads/ (termasuk subfolder) di-transcode sekali ke varian
+kecil (mis. Opus 96 kbps) dan disimpan di satu cache untuk seluruh library,
+downloads/.streaming/. Cache dibatasi ukurannya (TRANSCODE_MAX_BYTES total;
+yang paling lama tidak diputar dihapus duluan), dan lagu yang baru
+ditambahkan bisa di-transcode duluan di background.
+
+Kalau lagu sudah dianalisis (utils.audio_analysis), loudness varian
+disamakan lewat filter volume FFmpeg (LOUDNESS_NORMALIZE=0 untuk mematikan).
+
+Contoh:
+    python -m utils.transcode prewarm --limit 50
+    python -m utils.transcode transcode "downloads/Artist - Title.mp3" --profile aac96
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.media import check_ffmpeg
+from utils.shared_state import shared_lock, unique_tmp_path
+
+DOWNLOADS_DIR = "downloads"
+TRANSCODE_DIR_NAME = ".streaming"
+TRANSCODE_MAX_BYTES = int(os.environ.get("TRANSCODE_MAX_BYTES", str(1024 ** 3)))
+LOUDNESS_NORMALIZE = os.environ.get("LOUDNESS_NORMALIZE", "1") != "0"
+# Transcode yang gagal dicoba lagi paling cepat setelah sekian detik
+TRANSCODE_RETRY_SECONDS = 60
+
+PROFILES = {
+    "opus96": {
+        "label": "Opus 96 kbps",
+        "ext": ".ogg",
+        "mime": "audio/ogg",
+        "args": ["-c:a", "libopus", "-b:a", "96k", "-vbr", "on"],
+    },
+    "aac96": {
+        "label": "AAC 96 kbps (iPhone/Safari)",
+        "ext": ".m4a",
+        "mime": "audio/mp4",
+        "args": ["-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart"],
+    },
+}
+DEFAULT_PROFILE = "opus96"
+
+# Transcode di background, satu per satu supaya tidak mengganggu pemutaran
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcode")
+_inflight = {}
+_failed = {}  # (path, profile) -> (waktu gagal, Future)
+_inflight_lock = threading.Lock()
+
+
+def transcode_dir(download_dir=DOWNLOADS_DIR):
+    """Satu cache untuk seluruh library (downloads/.streaming), juga untuk lagu di subfolder"""
+    return os.path.join(download_dir, TRANSCODE_DIR_NAME)
+
+
+def normalization_gain(source_path):
+    """Gain loudness (dB) dari cache analisis, atau None kalau belum dianalisis/dimatikan"""
+    if not LOUDNESS_NORMALIZE:
+        return None
+    # Import di sini: utils.audio_analysis memakai DOWNLOADS_DIR dari modul ini
+    from utils.audio_analysis import playback_gain
+
+    return playback_gain(source_path, DOWNLOADS_DIR)
+
+
+def variant_path(source_path, profile=DEFAULT_PROFILE, gain=None):
+    """Path varian untuk file sumber. Berubah kalau file sumber berubah (ukuran/mtime) atau gain berubah."""
+    stat = os.stat(source_path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()
+    ).hexdigest()[:16]
+    # Nama dari path relatif (subfolder ikut), keunikan dari hash
+    name = os.path.splitext(os.path.relpath(source_path, DOWNLOADS_DIR))[0]
+    name = name.replace(os.sep, "__").replace("..", "_")[-60:]
+    suffix = f".g{gain:+.1f}" if gain else ""
+    return os.path.join(transcode_dir(), f"{name}.{key}.{profile}{suffix}{PROFILES[profile]['ext']}")
+
+
+def get_cached_variant(source_path, profile=DEFAULT_PROFILE):
+    """Path varian kalau sudah ada di cache (dan tandai baru dipakai), atau None"""
+    path = variant_path(source_path, profile, normalization_gain(source_path))
+    if not os.path.exists(path):
+        return None
+    os.utime(path)
+    return path
+
+
+def transcode(source_path, profile=DEFAULT_PROFILE):
+    """Transcode file (kalau belum ada di cache). Returns path varian."""
+    path = get_cached_variant(source_path, profile)
+    if path:
+        return path
+    if not check_ffmpeg():
+        raise RuntimeError("FFmpeg is not installed or not found in PATH.")
+
+    gain = normalization_gain(source_path)
+    path = variant_path(source_path, profile, gain)
+    # Replica lain bisa sedang transcode varian yang sama: tunggu, lalu pakai hasilnya
+    with shared_lock(f"transcode:{os.path.abspath(path)}", ttl=120).keepalive():
+        cached = get_cached_variant(source_path, profile)
+        if cached:
+            return cached
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = unique_tmp_path(path, f".part{PROFILES[profile]['ext']}")
+        command = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", source_path,
+            "-map", "0:a:0", "-vn",
+            *(["-af", f"volume={gain}dB"] if gain else []),
+            *PROFILES[profile]["args"],
+            tmp_path,
+        ]
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+        os.replace(tmp_path, path)
+        evict(os.path.dirname(path), keep=path)
+    return path
+
+
+def evict(cache_dir, max_bytes=TRANSCODE_MAX_BYTES, keep=None):
+    """Hapus varian yang paling lama tidak dipakai sampai total di bawah max_bytes"""
+    files = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if ".part" in name or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            removed += size
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def submit_transcode(source_path, profile=DEFAULT_PROFILE):
+    """Transcode di background. Request yang sama selama masih berjalan memakai Future yang sama.
+
+    Transcode yang baru gagal mengembalikan Future gagal itu (supaya halaman bisa
+    menampilkan error-nya) sampai TRANSCODE_RETRY_SECONDS lewat, lalu dicoba lagi.
+    """
+    key = (os.path.abspath(source_path), profile)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        failed_at, failed = _failed.get(key, (0, None))
+        if failed is not None and time.monotonic() - failed_at < TRANSCODE_RETRY_SECONDS:
+            return failed
+        future = _executor.submit(transcode, source_path, profile)
+        _inflight[key] = future
+        future.add_done_callback(lambda f: _discard_inflight(key, f))
+        return future
+
+
+def _discard_inflight(key, future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+        if future.exception() is not None:
+            _failed[key] = (time.monotonic(), future)
+        else:
+            _failed.pop(key, None)
+
+
+def recent_tracks(download_dir=DOWNLOADS_DIR, limit=20):
+    """File mp3 yang paling baru ditambahkan (seluruh library, sama seperti list_tracks)"""
+    # Import di sini: utils.playlist memakai modul ini
+    from utils.playlist import list_tracks
+
+    return sorted(list_tracks(download_dir), key=os.path.getctime, reverse=True)[:limit]
+
+
+def prewarm_recent(download_dir=DOWNLOADS_DIR, profile=DEFAULT_PROFILE, limit=20):
+    """Antrekan transcode untuk lagu terbaru yang belum punya varian. Returns jumlah yang diantrekan."""
+    if not check_ffmpeg():
+        return 0
+    queued = 0
+    for path in recent_tracks(download_dir, limit):
+        if not os.path.exists(variant_path(path, profile, normalization_gain(path))):
+            submit_transcode(path, profile)
+            queued += 1
+    return queued
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Low-bitrate streaming variants for the music library")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prewarm_parser = subparsers.add_parser("prewarm", help="Transcode recently added tracks")
+    prewarm_parser.add_argument("--download-dir", default=DOWNLOADS_DIR)
+    prewarm_parser.add_argument("--limit", type=int, default=20)
+    prewarm_parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+
+    transcode_parser = subparsers.add_parser("transcode", help="Transcode a single file")
+    transcode_parser.add_argument("source")
+    transcode_parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+
+    args = parser.parse_args()
+    if args.command == "prewarm":
+        for path in recent_tracks(args.download_dir, args.limit):
+            print(transcode(path, args.profile))
+    elif args.command == "transcode":
+        print(transcode(args.source, args.profile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Export beberapa lagu sebagai ZIP yang di-stream langsung dari disk.
+
+`st.download_button` menyimpan seluruh data di memori server, jadi untuk
+album berukuran GB dipakai route HTTP sendiri (server.py, `st.App`):
+
+    GET /exports/<token>
+
+Halaman Music Player membuat export (daftar file + nama ZIP) di state
+bersama (utils.shared_state) dengan TTL dan menampilkan link ke route itu.
+ZIP ditulis dengan mode store (MP3 sudah terkompresi) ke stream yang tidak
+bisa di-seek: zipfile memakai data descriptor dan ZIP64 kalau perlu, dan
+setiap chunk langsung dikirim ke client, jadi memori tetap konstan
+berapa pun ukuran pilihan.
+
+Contoh:
+    python -m utils.zip_export downloads/Album/*.mp3 --output album.zip
+"""
+import argparse
+import os
+import re
+import secrets
+import time
+import unicodedata
+import zipfile
+from urllib.parse import quote
+
+from utils.shared_state import get_state
+
+EXPORT_TTL = 3600
+EXPORT_CHUNK_SIZE = 1024 * 1024
+# Tanpa server.py (streamlit run app.py) ZIP dibuat di memori; hanya untuk pilihan kecil
+EXPORT_MEMORY_LIMIT = int(os.environ.get("EXPORT_MEMORY_LIMIT_MB", "200")) * 1024 ** 2
+EXPORT_ROUTE = "/exports"
+
+# True kalau proses ini dijalankan lewat server.py (route export terpasang)
+route_enabled = False
+
+
+class _ChunkBuffer:
+    """File object tulis-saja untuk zipfile; isinya diambil per chunk lewat `take()`"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def archive_names(paths, base_dir):
+    """Nama di dalam ZIP: path relatif terhadap library, unik"""
+    names, seen = [], set()
+    for path in paths:
+        name = os.path.relpath(path, base_dir).replace(os.sep, "/")
+        if name.startswith("../"):
+            name = os.path.basename(path)
+        stem, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in seen:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+        seen.add(candidate)
+        names.append(candidate)
+    return names
+
+
+def stream_zip(paths, base_dir, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generator bytes ZIP (mode store) untuk `paths`. File yang hilang dilewati."""
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for path, name in zip(paths, archive_names(paths, base_dir)):
+            try:
+                source = open(path, "rb")
+            except OSError:
+                continue
+            with source:
+                info = zipfile.ZipInfo.from_file(path, name)
+                info.compress_type = zipfile.ZIP_STORED
+                with archive.open(info, "w") as dest:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
+
+
+def safe_paths(paths, base_dir):
+    """Hanya file di dalam `base_dir` (token bocor tidak bisa dipakai membaca file lain)"""
+    root = os.path.realpath(base_dir)
+    return [path for path in paths
+            if os.path.commonpath([root, os.path.realpath(path)]) == root and os.path.isfile(path)]
+
+
+def create_export(paths, base_dir, name="songs.zip"):
+    """Daftarkan export dan return token untuk `/exports/<token>`"""
+    token = secrets.token_urlsafe(16)
+    get_state().set(f"export:{token}", {
+        "paths": [os.path.abspath(path) for path in paths],
+        "base_dir": os.path.abspath(base_dir),
+        "name": name,
+        "created_at": time.time(),
+    }, ttl=EXPORT_TTL)
+    return token
+
+
+def export_url(token):
+    return f"{EXPORT_ROUTE}/{token}"
+
+
+def zip_in_memory(paths, base_dir):
+    """Fallback tanpa route export (mis. `streamlit run app.py`)"""
+    return b"".join(stream_zip(paths, base_dir))
+
+
+def content_disposition(filename):
+    """Header Content-Disposition untuk nama file apa pun (nama album bisa non-latin).
+
+    `filename=` berisi fallback ASCII untuk client lama, `filename*=` (RFC 5987)
+    nama asli dalam UTF-8. CR/LF, kutip, dan backslash dibuang supaya header tidak bisa disisipi.
+    """
+    filename = re.sub(r'[\x00-\x1f\x7f"\\]', "", filename).strip() or "export.zip"
+    fallback = "".join(c for c in unicodedata.normalize("NFKD", filename) if not unicodedata.combining(c))
+    fallback = re.sub(r"[^A-Za-z0-9._ ()\[\]-]+", "_", fallback)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def export_routes():
+    """Route Starlette untuk server.py"""
+    global route_enabled
+    from starlette.responses import PlainTextResponse, StreamingResponse
+    from starlette.routing import Route
+
+    def download(request):
+        export = get_state().get(f"export:{request.path_params['token']}")
+        if export is None:
+            return PlainTextResponse("Export expired or not found", status_code=404)
+        paths = safe_paths(export["paths"], export["base_dir"])
+        return StreamingResponse(
+            stream_zip(paths, export["base_dir"]),
+            media_type="application/zip",
+            headers={"Content-Disposition": content_disposition(export["name"]), "Cache-Control": "no-store"},
+        )
+
+    route_enabled = True
+    return [Route(EXPORT_ROUTE + "/{token}", download, methods=["GET"])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a store-mode ZIP of audio files")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--base-dir", default="downloads")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    with open(args.output, "wb") as f:
+        for chunk in stream_zip(args.paths, args.base_dir):
+            f.write(chunk)
+    print(f"{args.output}: {os.path.getsize(args.output) / 1024 ** 2:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()